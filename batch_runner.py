@@ -0,0 +1,403 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+from streamlit_app import (
+    ANALYSIS_TYPES,
+    MAX_CONCURRENT_REQUESTS,
+    SCORES_ANALYSIS,
+    LLMOptions,
+    ReactionScores,
+    analyze_segment_reaction,
+    enhance_content_for_segments,
+    generate_iraqi_arabic_content,
+    get_segment_catalog,
+    run_concurrently,
+    score_segment_reaction,
+    segment_profile,
+)
+
+# Columns accepted as the post text / identifier in input files
+CONTENT_FIELDS = ["content", "post", "text"]
+ID_FIELDS = ["post_id", "id"]
+
+# Typed columns added to scores-only reaction rows
+SCORE_FIELDS = list(ReactionScores.model_fields)
+
+# Rows buffered before a Parquet row group is flushed
+PARQUET_BATCH_SIZE = 50
+
+
+def _post_id(record, content):
+    for field in ID_FIELDS:
+        if record.get(field) not in (None, ""):
+            return str(record[field])
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+
+
+def _normalize_post(record):
+    for field in CONTENT_FIELDS:
+        content = record.get(field)
+        if content:
+            return {"post_id": _post_id(record, content), "content": content}
+    return None
+
+
+def load_posts(path):
+    """Read posts from a CSV or JSONL file into [{"post_id", "content"}]"""
+
+    posts = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+
+        for record in records:
+            post = _normalize_post(record)
+            if post:
+                posts.append(post)
+    return posts
+
+
+def task_id(post_id, content, analysis_type, segment):
+    """Stable identifier used to checkpoint a single batch task"""
+
+    fingerprint = json.dumps([post_id, content, analysis_type, segment])
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:24]
+
+
+def build_tasks(posts, segments, analysis_types, api_key, options, scores_only=False):
+    """Expand posts x segments x analysis types into keyed generator calls
+
+    Content Enhancement rewrites a post for the whole segment selection, so
+    it yields one task per post rather than one per segment. scores_only
+    swaps reaction prose for the compact scores-only JSON.
+    """
+
+    tasks = {}
+    for post in posts:
+        content = post["content"]
+        for analysis_type in analysis_types:
+            if analysis_type == "Content Enhancement":
+                targets = [", ".join(segments)]
+            else:
+                targets = segments
+
+            for segment in targets:
+                label = analysis_type
+                if analysis_type == "Reaction Analysis" and scores_only:
+                    label = SCORES_ANALYSIS
+                    call = partial(
+                        score_segment_reaction,
+                        segment,
+                        segment_profile(segment),
+                        content,
+                        api_key,
+                        options=options,
+                    )
+                elif analysis_type == "Reaction Analysis":
+                    call = partial(
+                        analyze_segment_reaction,
+                        segment,
+                        segment_profile(segment),
+                        content,
+                        api_key,
+                        options=options,
+                    )
+                elif analysis_type == "Content Enhancement":
+                    call = partial(
+                        enhance_content_for_segments,
+                        content,
+                        segments,
+                        api_key,
+                        options=options,
+                    )
+                else:
+                    call = partial(
+                        generate_iraqi_arabic_content,
+                        content,
+                        segment,
+                        api_key,
+                        options=options,
+                    )
+
+                key = task_id(post["post_id"], content, label, segment)
+                tasks[key] = (
+                    {
+                        "task_id": key,
+                        "post_id": post["post_id"],
+                        "content": content,
+                        "analysis_type": label,
+                        "segment": segment,
+                    },
+                    call,
+                )
+    return tasks
+
+
+def _timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - started
+
+
+def score_columns(row):
+    """Typed score columns of a scores-only row; None where there are none"""
+
+    columns = dict.fromkeys(SCORE_FIELDS)
+    if row["analysis_type"] == SCORES_ANALYSIS and row["status"] == "ok":
+        columns.update(ReactionScores.model_validate_json(row["result"]).model_dump())
+    return columns
+
+
+def load_checkpoint(path):
+    """Completed rows from a previous run, keyed by task id"""
+
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if row.get("status") == "ok":
+                completed[row["task_id"]] = row
+    return completed
+
+
+def compact_jsonl(path):
+    """Rewrite a JSONL output keeping only the last row of each task
+
+    A task that failed and then succeeded on a rerun has both rows in the
+    checkpoint; the deliverable should hold one.
+    """
+
+    rows = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            rows.pop(row["task_id"], None)
+            rows[row["task_id"]] = row
+
+    partial_path = path + ".partial"
+    with open(partial_path, "w", encoding="utf-8") as f:
+        for row in rows.values():
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(partial_path, path)
+
+
+def _parquet_schema(pa, scores_only):
+    """Fixed column types, so a row group of errors can't type the score
+    columns as null for the rest of the file"""
+
+    fields = [
+        pa.field(name, pa.string())
+        for name in ("task_id", "post_id", "content", "analysis_type", "segment")
+    ]
+    fields += [
+        pa.field("status", pa.string()),
+        pa.field("result", pa.string()),
+        pa.field("elapsed_seconds", pa.float64()),
+        pa.field("completed_at", pa.string()),
+    ]
+    if scores_only:
+        fields += [
+            pa.field(name, pa.int64() if field.annotation is int else pa.string())
+            for name, field in ReactionScores.model_fields.items()
+        ]
+    return pa.schema(fields)
+
+
+class _ParquetSink:
+    """Write rows to Parquet in row groups, publishing the file on close"""
+
+    def __init__(self, path, scores_only=False):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.partial_path = path + ".partial"
+        self.schema = _parquet_schema(pa, scores_only)
+        self._writer = None
+        self._buffer = []
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= PARQUET_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.partial_path, self.schema)
+        self._writer.write_table(table)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self.partial_path, self.path)
+
+
+def run_batch(
+    posts,
+    output_path,
+    api_key,
+    segments=None,
+    analysis_types=("Reaction Analysis",),
+    max_workers=MAX_CONCURRENT_REQUESTS,
+    options=None,
+    progress=None,
+    scores_only=False,
+):
+    """Score posts against segments and analysis types, streaming rows to output_path
+
+    Output is JSONL or Parquet depending on the file extension. Every finished
+    task is appended to a JSONL checkpoint (the output itself for JSONL), so
+    rerunning with the same arguments only spends tokens on unfinished tasks;
+    a JSONL output is compacted to one row per task at the end.
+    With scores_only, reactions come back as compact scores with typed
+    columns for them, at a fraction of the prose analysis's tokens.
+    """
+
+    catalog = get_segment_catalog()
+    segments = list(segments or catalog.segments)
+    unknown = [s for s in segments if s not in catalog]
+    if unknown:
+        raise ValueError(f"Unknown segments: {', '.join(unknown)}")
+    unknown = [a for a in analysis_types if a not in ANALYSIS_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown analysis types: {', '.join(unknown)}")
+
+    options = options or LLMOptions()
+    use_parquet = output_path.endswith(".parquet")
+    checkpoint_path = output_path + ".checkpoint.jsonl" if use_parquet else output_path
+
+    tasks = build_tasks(posts, segments, analysis_types, api_key, options, scores_only)
+    completed = load_checkpoint(checkpoint_path)
+    pending = {
+        key: partial(_timed, call)
+        for key, (_, call) in tasks.items()
+        if key not in completed
+    }
+
+    sink = _ParquetSink(output_path, scores_only) if use_parquet else None
+    if sink:
+        for key, row in completed.items():
+            if key in tasks:
+                sink.write(row)
+
+    summary = {
+        "total": len(tasks),
+        "skipped": len(tasks) - len(pending),
+        "ok": 0,
+        "error": 0,
+    }
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        for key, (result, elapsed) in run_concurrently(pending, max_workers):
+            status = "error" if result.startswith("Error:") else "ok"
+            row = dict(
+                tasks[key][0],
+                status=status,
+                result=result,
+                elapsed_seconds=round(elapsed, 3),
+                completed_at=datetime.now(timezone.utc).isoformat(),
+            )
+            if scores_only:
+                row.update(score_columns(row))
+            checkpoint.write(json.dumps(row, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            if sink:
+                sink.write(row)
+
+            summary[status] += 1
+            if progress:
+                progress(row, summary)
+
+    if sink:
+        sink.close()
+    else:
+        compact_jsonl(output_path)
+    return summary
+
+
+def _print_progress(row, summary):
+    done = summary["skipped"] + summary["ok"] + summary["error"]
+    print(
+        f"[{done}/{summary['total']}] {row['status']:5} {row['post_id']} | "
+        f"{row['analysis_type']} | {row['segment']} ({row['elapsed_seconds']}s)",
+        file=sys.stderr,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score a file of posts against Iraqi remittance segments"
+    )
+    parser.add_argument("input", help="CSV or JSONL file with a 'content' column")
+    parser.add_argument("output", help="Destination .jsonl or .parquet file")
+    parser.add_argument(
+        "--segments",
+        nargs="+",
+        help="Segment names to score against (default: all)",
+    )
+    parser.add_argument(
+        "--analysis-types",
+        nargs="+",
+        default=["Reaction Analysis"],
+        choices=ANALYSIS_TYPES,
+    )
+    parser.add_argument(
+        "--scores-only",
+        action="store_true",
+        help="Return reactions as verdicts and 0-100 scores only: much faster and cheaper",
+    )
+    parser.add_argument("--max-workers", type=int, default=MAX_CONCURRENT_REQUESTS)
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"))
+    parser.add_argument("--base-url", default=LLMOptions.base_url)
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Skip response cache lookups"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or OPENAI_API_KEY)")
+
+    posts = load_posts(args.input)
+    options = LLMOptions(use_cache=not args.no_cache, base_url=args.base_url)
+    summary = run_batch(
+        posts,
+        args.output,
+        args.api_key,
+        segments=args.segments,
+        analysis_types=args.analysis_types,
+        max_workers=args.max_workers,
+        options=options,
+        progress=_print_progress,
+        scores_only=args.scores_only,
+    )
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
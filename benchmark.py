@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from build_info import git_revision
+from hedging import quantile
+from mock_openai_server import (
+    MockOpenAIServer,
+    add_settings_arguments,
+    settings_from_args,
+)
+
+# Benchmark runs must not share the app's on-disk cache and call log, or
+# hit its org budgets
+_SCRATCH = tempfile.mkdtemp()
+os.environ["LLM_CACHE_PATH"] = os.path.join(_SCRATCH, "bench_cache.sqlite3")
+os.environ["METRICS_LOG_PATH"] = os.path.join(_SCRATCH, "bench_calls.jsonl")
+os.environ.pop("METRICS_PROMETHEUS_PATH", None)
+os.environ.setdefault("OPENAI_RPM_LIMIT", "1000000")
+os.environ.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+
+import streamlit_app as app  # noqa: E402
+
+SAMPLE_POST = "Support your family back home while building your future abroad. Fast, secure, affordable. 🏠❤️"
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        "p50": round(quantile(values, 0.5), 4),
+        "p95": round(quantile(values, 0.95), 4),
+        "p99": round(quantile(values, 0.99), 4),
+        "mean": round(sum(values) / len(values), 4),
+    }
+
+
+def run_once(analysis_type, segments, options, max_workers, stream, scores=False):
+    """One end-to-end run through the same dispatch path main() uses"""
+
+    first_token = []
+    lock = threading.Lock()
+
+    def on_token(key, delta):
+        with lock:
+            if not first_token:
+                first_token.append(time.perf_counter())
+
+    started = time.perf_counter()
+    results = dict(
+        app.run_concurrently(
+            app.analysis_tasks(
+                analysis_type,
+                segments,
+                SAMPLE_POST,
+                "sk-benchmark",
+                options,
+                scores=scores,
+            ),
+            max_workers,
+            on_token=on_token if stream else None,
+        )
+    )
+    elapsed = time.perf_counter() - started
+    ttft = first_token[0] - started if first_token else None
+    errors = sum(result.startswith("Error:") for result in results.values())
+    return elapsed, ttft, errors
+
+
+def hedging_summary(records):
+    """Hedge rate and per-call TTFT p99 with and without hedging"""
+
+    started = [r for r in records if r.ttft_seconds is not None and not r.error]
+    if not started:
+        return None
+    hedged = [r for r in records if r.hedged]
+    ttft_p99 = quantile([r.ttft_seconds for r in started], 0.99)
+    # A cancelled first attempt's wait is a lower bound on its TTFT
+    unhedged_p99 = quantile(
+        [r.unhedged_ttft_seconds or r.ttft_seconds for r in started], 0.99
+    )
+    return {
+        "hedge_rate": round(len(hedged) / len(records), 4),
+        "hedges_won": sum(r.hedge_won for r in hedged),
+        "ttft_p99": round(ttft_p99, 4),
+        "unhedged_ttft_p99_at_least": round(unhedged_p99, 4),
+        "p99_saved_at_least": round(unhedged_p99 - ttft_p99, 4),
+    }
+
+
+def cascade_summary(records):
+    """Per-tier call latency and the fast tier's escalation rate"""
+
+    tiers = {}
+    for tier in ("fast", "large"):
+        calls = [r for r in records if r.tier == tier]
+        if calls:
+            tiers[tier] = {
+                "calls": len(calls),
+                "wall_seconds": summarize([r.wall_seconds for r in calls]),
+            }
+    if not tiers:
+        return None
+    fast = [r for r in records if r.tier == "fast"]
+    if fast:
+        tiers["escalation_rate"] = round(sum(r.escalated for r in fast) / len(fast), 4)
+    return tiers
+
+
+def usage_summary(records, runs):
+    """Mean completion tokens and cost of one run"""
+
+    tokens = [r.completion_tokens for r in records if r.completion_tokens]
+    costs = [r.cost_usd for r in records if r.cost_usd is not None]
+    return {
+        "completion_tokens_per_run": round(sum(tokens) / runs, 1),
+        "cost_usd_per_run": round(sum(costs) / runs, 6) if costs else None,
+    }
+
+
+def run_scenario(server, analysis_type, segment_count, args, options):
+    segments = list(app.AUDIENCE_SEGMENTS.keys())[:segment_count]
+    latencies, ttfts, calls, errors = [], [], [], 0
+    scores = args.scores_only and analysis_type == "Reaction Analysis"
+
+    for _ in range(args.warmup):
+        run_once(
+            analysis_type, segments, options, args.max_workers, args.stream, scores
+        )
+
+    measured_from = time.time()
+    for _ in range(args.iterations):
+        before = server.stats.snapshot()["requests"] if server else 0
+        elapsed, ttft, failed = run_once(
+            analysis_type, segments, options, args.max_workers, args.stream, scores
+        )
+        after = server.stats.snapshot()["requests"] if server else 0
+        latencies.append(elapsed)
+        if ttft is not None:
+            ttfts.append(ttft)
+        calls.append(after - before)
+        errors += failed
+
+    measured = [
+        r for r in app.get_call_metrics().records() if r.timestamp >= measured_from
+    ]
+    return {
+        "analysis_type": app.SCORES_ANALYSIS if scores else analysis_type,
+        "segments": segment_count,
+        "iterations": args.iterations,
+        "latency_seconds": summarize(latencies),
+        "ttft_seconds": summarize(ttfts),
+        "calls_per_run": round(sum(calls) / len(calls), 2) if server else None,
+        "errors": errors,
+        **usage_summary(measured, args.iterations),
+        "hedging": hedging_summary(measured),
+        "cascade": cascade_summary(measured),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark analysis latency against a local mock OpenAI server"
+    )
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--analysis-types",
+        nargs="+",
+        default=app.ANALYSIS_TYPES,
+        choices=app.ANALYSIS_TYPES,
+    )
+    parser.add_argument("--min-segments", type=int, default=1)
+    parser.add_argument("--max-segments", type=int, default=len(app.AUDIENCE_SEGMENTS))
+    parser.add_argument("--max-workers", type=int, default=app.MAX_CONCURRENT_REQUESTS)
+    parser.add_argument(
+        "--scores-only",
+        action="store_true",
+        help="Run Reaction Analysis in the compact scores-only mode",
+    )
+    parser.add_argument(
+        "--no-stream", dest="stream", action="store_false", help="Use blocking calls"
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        default=app.HEDGE_REQUESTS,
+        help="Send a duplicate request when a call is slow to start",
+    )
+    parser.add_argument(
+        "--base-url",
+        help="Benchmark an already running server instead of starting the mock",
+    )
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        server = MockOpenAIServer(settings=settings_from_args(args)).start()
+        base_url = server.base_url
+
+    # Every run must reach the server, so cache lookups are always bypassed
+    options = app.LLMOptions(use_cache=False, base_url=base_url, hedge=args.hedge)
+    scenarios = []
+    try:
+        for analysis_type in args.analysis_types:
+            for count in range(args.min_segments, args.max_segments + 1):
+                result = run_scenario(server, analysis_type, count, args, options)
+                scenarios.append(result)
+                latency = result["latency_seconds"]
+                print(
+                    f"{result['analysis_type']:26} segments={count} "
+                    f"p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s "
+                    f"p99={latency['p99']:.3f}s calls/run={result['calls_per_run']}",
+                    file=sys.stderr,
+                )
+    finally:
+        if server:
+            server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "base_url": None if server else base_url,
+            "stream": args.stream,
+            "hedge": args.hedge,
+            "scores_only": args.scores_only,
+            "max_workers": args.max_workers,
+            "mock": (
+                None
+                if not server
+                else {
+                    "ttft_ms": args.ttft_ms,
+                    "ttft_sigma": args.ttft_sigma,
+                    "tokens_per_second": args.tokens_per_second,
+                    "completion_tokens": args.completion_tokens,
+                    "error_rate": args.error_rate,
+                    "rate_limit_rate": args.rate_limit_rate,
+                    "seed": args.seed,
+                    "malformed_rate": args.malformed_rate,
+                }
+            ),
+        },
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_revision():
+    """Short hash of the checked-out commit, or None without git"""
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=REPO_DIR,
+        ).stdout.strip()
+    except OSError:
+        return None
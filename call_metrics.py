@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+# Where per-call records are written; set METRICS_PROMETHEUS_PATH to also
+# maintain a Prometheus textfile-collector file
+METRICS_LOG_PATH = os.environ.get(
+    "METRICS_LOG_PATH", os.path.join(".cache", "llm_calls.jsonl")
+)
+METRICS_LOG_MAX_BYTES = int(os.environ.get("METRICS_LOG_MAX_BYTES", str(10 * 2**20)))
+METRICS_LOG_BACKUPS = int(os.environ.get("METRICS_LOG_BACKUPS", "5"))
+METRICS_PROMETHEUS_PATH = os.environ.get("METRICS_PROMETHEUS_PATH") or None
+
+# USD per million tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-4": (30.0, 30.0, 60.0),
+    "gpt-4-turbo": (10.0, 10.0, 30.0),
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "gpt-4o-mini": (0.15, 0.075, 0.6),
+    "gpt-4.1": (2.0, 0.5, 8.0),
+    "gpt-4.1-mini": (0.4, 0.1, 1.6),
+    "gpt-3.5-turbo": (0.5, 0.5, 1.5),
+}
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of one call, or None for unknown models or usage"""
+
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Dated snapshots such as gpt-4o-2024-08-06 share the base price
+        prices = next(
+            (p for name, p in MODEL_PRICES.items() if model.startswith(name + "-")),
+            None,
+        )
+    if prices is None or prompt_tokens is None or completion_tokens is None:
+        return None
+
+    input_price, cached_price, output_price = prices
+    uncached = prompt_tokens - cached_tokens
+    return (
+        uncached * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+@dataclass
+class CallRecord:
+    """Everything measured about one LLM call"""
+
+    function: str
+    model: str
+    session_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+    wall_seconds: float = 0.0
+    ttft_seconds: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_prompt_tokens: int = 0
+    static_prompt_tokens: int = 0
+    variable_prompt_tokens: int = 0
+    cost_usd: Optional[float] = None
+    cache_hit: bool = False
+    retries: int = 0
+    error: Optional[str] = None
+    speculative: bool = False
+    # A duplicate request was raced against a slow first attempt
+    hedged: bool = False
+    hedge_won: bool = False
+    unhedged_ttft_seconds: Optional[float] = None
+    # Cascade tier ("fast" or "large") and whether a rejected fast answer
+    # was escalated to the next tier
+    tier: Optional[str] = None
+    escalated: bool = False
+    # Served by an identical call another session already had in flight
+    coalesced: bool = False
+
+
+class CallMetrics:
+    """Process-wide sink for CallRecords: in-memory history, rotating JSONL
+    log and optional Prometheus text exposition"""
+
+    def __init__(
+        self,
+        log_path=METRICS_LOG_PATH,
+        prometheus_path=METRICS_PROMETHEUS_PATH,
+        max_records=5000,
+    ):
+        self.prometheus_path = prometheus_path
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._latency = {}
+
+        self._logger = None
+        if log_path:
+            directory = os.path.dirname(log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = RotatingFileHandler(
+                log_path,
+                maxBytes=METRICS_LOG_MAX_BYTES,
+                backupCount=METRICS_LOG_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            self._logger.addHandler(handler)
+
+    def record(self, record):
+        """Store a finished call and update every exporter"""
+
+        with self._lock:
+            self._records.append(record)
+            self._aggregate(record)
+            if self.prometheus_path:
+                self._write_prometheus(self.prometheus_text())
+
+        if self._logger:
+            self._logger.info(json.dumps(asdict(record), ensure_ascii=False))
+
+    def records(self, session_id=None):
+        """Recorded calls, oldest first, optionally for one session only"""
+
+        with self._lock:
+            records = list(self._records)
+        if session_id is None:
+            return records
+        return [r for r in records if r.session_id == session_id]
+
+    def _bump(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def _aggregate(self, record):
+        labels = {
+            "function": record.function,
+            "model": record.model,
+            "cache": (
+                "hit" if record.cache_hit else "shared" if record.coalesced else "miss"
+            ),
+            "status": (
+                "escalated" if record.escalated else "error" if record.error else "ok"
+            ),
+            "tier": record.tier or "",
+            "speculative": "true" if record.speculative else "false",
+        }
+        self._bump("llm_calls_total", labels)
+        self._bump("llm_retries_total", {"function": record.function}, record.retries)
+        if record.escalated:
+            self._bump("llm_escalations_total", {"function": record.function})
+        if record.coalesced:
+            self._bump("llm_coalesced_total", {"function": record.function})
+        if record.hedged:
+            self._bump(
+                "llm_hedges_total",
+                {
+                    "function": record.function,
+                    "outcome": "won" if record.hedge_won else "lost",
+                },
+            )
+        for kind, value in (
+            ("prompt", record.prompt_tokens),
+            ("completion", record.completion_tokens),
+            ("cached_prompt", record.cached_prompt_tokens),
+        ):
+            if value and not record.cache_hit:
+                self._bump(
+                    "llm_tokens_total",
+                    {
+                        "model": record.model,
+                        "type": kind,
+                        "speculative": labels["speculative"],
+                    },
+                    value,
+                )
+        if record.cost_usd and not record.cache_hit:
+            self._bump(
+                "llm_cost_usd_total",
+                {"model": record.model, "speculative": labels["speculative"]},
+                record.cost_usd,
+            )
+
+        histogram = self._latency.setdefault(
+            record.function,
+            {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0},
+        )
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if record.wall_seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += record.wall_seconds
+        histogram["count"] += 1
+
+    def prometheus_text(self):
+        """Current aggregates in Prometheus text exposition format"""
+
+        def format_labels(labels):
+            if not labels:
+                return ""
+            inner = ",".join(f'{name}="{value}"' for name, value in labels)
+            return "{" + inner + "}"
+
+        lines = []
+        for name in sorted({name for name, _ in self._counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+        lines.append("# TYPE llm_call_duration_seconds histogram")
+        for function, histogram in sorted(self._latency.items()):
+            for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                lines.append(
+                    f'llm_call_duration_seconds_bucket{{function="{function}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'llm_call_duration_seconds_bucket{{function="{function}",le="+Inf"}} {histogram["count"]}'
+            )
+            lines.append(
+                f'llm_call_duration_seconds_sum{{function="{function}"}} {histogram["sum"]}'
+            )
+            lines.append(
+                f'llm_call_duration_seconds_count{{function="{function}"}} {histogram["count"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+    def _write_prometheus(self, text):
+        # Write-then-rename so the collector never reads a half-written file
+        partial_path = self.prometheus_path + ".tmp"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(partial_path, self.prometheus_path)
@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional
+
+# A duplicate request is sent once a call has waited longer than this
+# quantile of recent time-to-first-token, at most for HEDGE_MAX_RATE of calls
+HEDGE_QUANTILE = float(os.environ.get("HEDGE_QUANTILE", "0.9"))
+HEDGE_MAX_RATE = float(os.environ.get("HEDGE_MAX_RATE", "0.15"))
+HEDGE_MIN_DELAY = float(os.environ.get("HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = 200
+HEDGE_WORKERS = int(os.environ.get("HEDGE_WORKERS", "32"))
+
+
+class DeadlineExceeded(Exception):
+    """A call ran past its own or the page's deadline"""
+
+
+class HedgeLost(Exception):
+    """The other attempt of a hedged call produced its first token first"""
+
+
+def quantile(values, q):
+    """Linear-interpolated quantile (0..1) of a non-empty sequence"""
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+@dataclass
+class HedgeOutcome:
+    """Result of a hedged call and what hedging did for it"""
+
+    result: str
+    hedged: bool = False
+    hedge_won: bool = False
+    # First-token time of the original attempt; when it was cancelled before
+    # producing one, the time it had waited, a lower bound
+    unhedged_ttft: Optional[float] = None
+
+
+class _Race:
+    """First-token race between the attempts of one call"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.winner = None
+        # When each attempt actually began running, after any executor queue
+        self.begun = {}
+        self.first_tokens = {}
+        self.progress = threading.Event()
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, attempt, fn):
+        with self._lock:
+            self.begun[attempt] = time.perf_counter()
+        return fn(self.stop, partial(self.claim, attempt))
+
+    def waited(self, attempt):
+        """Seconds attempt has been running, not counting time spent queued"""
+
+        with self._lock:
+            begun = self.begun.get(attempt)
+        return time.perf_counter() - (begun if begun is not None else self.started)
+
+    def claim(self, attempt):
+        """Called at an attempt's first token; False means it lost and must stop"""
+
+        with self._lock:
+            begun = self.begun.get(attempt, self.started)
+            self.first_tokens[attempt] = time.perf_counter() - begun
+            if self.winner is None:
+                self.winner = attempt
+            self.progress.set()
+            return self.winner == attempt
+
+
+class HedgePolicy:
+    """Adaptive request hedging: a call with no first token after the recent
+    p90 (per function and model) gets a duplicate, and the slower is cancelled"""
+
+    def __init__(
+        self,
+        quantile=HEDGE_QUANTILE,
+        max_rate=HEDGE_MAX_RATE,
+        min_delay=HEDGE_MIN_DELAY,
+        min_samples=HEDGE_MIN_SAMPLES,
+        max_workers=HEDGE_WORKERS,
+    ):
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hedge"
+        )
+        self._samples = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedges_won = 0
+
+    def delay(self, key):
+        """Seconds to wait for a first token before hedging, or None while
+        there are too few samples to know what slow is"""
+
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, quantile(samples, self.quantile))
+
+    def _observe(self, key, ttft):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=HEDGE_WINDOW)).append(ttft)
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedged + 1 > self.max_rate * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def run(self, key, attempt):
+        """Run attempt(stop, claim) and, if it is slow to start, a duplicate
+
+        attempt must call claim() at its first token and give up with
+        HedgeLost when it returns False, and should abandon the request once
+        stop is set. The first attempt to finish successfully wins.
+        """
+
+        with self._lock:
+            self.calls += 1
+        race = _Race()
+        delay = self.delay(key)
+        if delay is None:
+            result = race.run(0, attempt)
+            self._observe(key, race.first_tokens.get(0, race.waited(0)))
+            return HedgeOutcome(result, unhedged_ttft=race.first_tokens.get(0))
+
+        futures = {self._executor.submit(race.run, 0, attempt): 0}
+        primary = next(iter(futures))
+        primary.add_done_callback(lambda _: race.progress.set())
+        race.progress.wait(delay)
+        while race.winner is None and not primary.done() and race.waited(0) < delay:
+            # The primary sat in the executor queue; give it its full delay
+            race.progress.wait(delay - race.waited(0))
+        if race.winner is None and not primary.done() and self._may_hedge():
+            hedge = self._executor.submit(race.run, 1, attempt)
+            futures[hedge] = 1
+
+        error = None
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except HedgeLost:
+                        continue
+                    except Exception as e:
+                        # The original attempt's error wins over the hedge's
+                        if error is None or futures[future] == 0:
+                            error = e
+                        continue
+                    return self._finish(
+                        key, race, result, futures[future], len(futures) > 1
+                    )
+            raise error
+        finally:
+            race.stop.set()
+
+    def _finish(self, key, race, result, attempt, hedged):
+        # TTFT samples are timed from when the attempt started running, so
+        # time queued behind other hedges does not raise the threshold
+        unhedged = race.first_tokens.get(0, race.waited(0))
+        self._observe(key, unhedged)
+        if hedged and attempt == 1:
+            with self._lock:
+                self.hedges_won += 1
+        return HedgeOutcome(
+            result,
+            hedged=hedged,
+            hedge_won=hedged and attempt == 1,
+            unhedged_ttft=unhedged,
+        )
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Location of the persistent queue and how many jobs run at once
+JOB_QUEUE_PATH = os.environ.get(
+    "JOB_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite3")
+)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def owner_of(api_key):
+    """Stable, non-reversible tag tying jobs to the API key that queued them"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class Job:
+    """One queued analysis and its progress"""
+
+    id: str
+    owner: str
+    spec: dict
+    status: str
+    total: int
+    done: int = 0
+    failed: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+
+class JobQueue:
+    """Persistent queue of analysis jobs run by a pool of worker threads
+
+    runner(job, api_key, done, cancel_event) runs one job: done maps the
+    steps checkpointed so far to their results, and it yields
+    (step, result, seconds) as further steps finish. Every successful step
+    is checkpointed, so an interrupted or restarted job resumes where it
+    stopped. API keys are only ever kept in memory; a job interrupted by a
+    restart waits for resume() to supply one again.
+    """
+
+    def __init__(self, runner, path=JOB_QUEUE_PATH, max_workers=JOB_WORKERS):
+        self.runner = runner
+        self.path = path
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._keys = {}
+        self._cancel_events = {}
+        # Jobs a worker is inside of, including cancelled ones still stopping
+        self._running = set()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                spec TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_steps (
+                job_id TEXT NOT NULL,
+                step TEXT NOT NULL,
+                result TEXT NOT NULL,
+                ok INTEGER NOT NULL,
+                seconds REAL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (job_id, step)
+            );
+            """
+        )
+        # Jobs running when the process stopped pick up from their checkpoints
+        self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, spec, total, api_key):
+        """Queue a job of total steps described by the JSON-serializable spec"""
+
+        job_id = uuid.uuid4().hex[:8]
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (id, owner, spec, status, total, created_at)
+                VALUES (?, ?, ?, 'queued', ?, ?)
+                """,
+                (job_id, owner_of(api_key), json.dumps(spec), total, time.time()),
+            )
+            self._keys[job_id] = api_key
+            self._wake.notify()
+        return job_id
+
+    def resume(self, job_id, api_key):
+        """Supply the API key for a job left waiting by a restart, or requeue
+        a failed or cancelled job; finished steps are not run again
+
+        Returns False, changing nothing, for a finished job or one whose
+        worker has not stopped yet.
+        """
+
+        with self._lock:
+            if job_id in self._running:
+                return False
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET status = 'queued', finished_at = NULL, error = NULL
+                WHERE id = ? AND status IN ('queued', 'failed', 'cancelled')
+                """,
+                (job_id,),
+            )
+            if not cursor.rowcount:
+                return False
+            self._keys[job_id] = api_key
+            self._wake.notify()
+            return True
+
+    def cancel(self, job_id):
+        """Stop a job; steps already finished stay checkpointed"""
+
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE jobs SET status = 'cancelled', finished_at = ?
+                WHERE id = ? AND status IN ('queued', 'running')
+                """,
+                (time.time(), job_id),
+            )
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+
+    def waiting_for_key(self, job_id):
+        """True for a queued job no worker can start until resume() is called"""
+
+        with self._lock:
+            return job_id not in self._keys
+
+    def _job(self, row):
+        job_id, owner, spec, status, total, created, started, finished, error = row
+        done, failed = self._conn.execute(
+            "SELECT COALESCE(SUM(ok), 0), COUNT(*) - COALESCE(SUM(ok), 0) "
+            "FROM job_steps WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        return Job(
+            job_id,
+            owner,
+            json.loads(spec),
+            status,
+            total,
+            done,
+            failed,
+            created,
+            started,
+            finished,
+            error,
+        )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return self._job(row) if row else None
+
+    def jobs(self, owner, limit=20):
+        """The owner's most recent jobs, newest first"""
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?",
+                (owner, limit),
+            ).fetchall()
+            return [self._job(row) for row in rows]
+
+    def results(self, job_id):
+        """{step: result} checkpointed so far, in the order they finished"""
+
+        with self._lock:
+            return dict(
+                self._conn.execute(
+                    "SELECT step, result FROM job_steps WHERE job_id = ? "
+                    "ORDER BY finished_at",
+                    (job_id,),
+                ).fetchall()
+            )
+
+    def _claim(self):
+        # Oldest queued job whose API key is known; caller holds the lock
+        rows = self._conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+        ).fetchall()
+        for (job_id,) in rows:
+            if job_id in self._keys:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', "
+                    "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (time.time(), job_id),
+                )
+                self._cancel_events[job_id] = threading.Event()
+                self._running.add(job_id)
+                return job_id
+        return None
+
+    def _work(self):
+        while True:
+            with self._lock:
+                job_id = self._claim()
+                while job_id is None:
+                    self._wake.wait()
+                    job_id = self._claim()
+                cancel_event = self._cancel_events[job_id]
+                api_key = self._keys[job_id]
+            try:
+                self._run(job_id, api_key, cancel_event)
+            except Exception as e:
+                self._finish(job_id, "failed", str(e))
+            finally:
+                with self._lock:
+                    if self._cancel_events.get(job_id) is cancel_event:
+                        del self._cancel_events[job_id]
+                    self._running.discard(job_id)
+                    # The key is only needed again if the job is resumed,
+                    # and resume() supplies it
+                    (status,) = self._conn.execute(
+                        "SELECT status FROM jobs WHERE id = ?", (job_id,)
+                    ).fetchone()
+                    if status != "queued":
+                        self._keys.pop(job_id, None)
+
+    def _run(self, job_id, api_key, cancel_event):
+        job = self.get(job_id)
+        with self._lock:
+            done = dict(
+                self._conn.execute(
+                    "SELECT step, result FROM job_steps WHERE job_id = ? AND ok",
+                    (job_id,),
+                ).fetchall()
+            )
+
+        for step, result, seconds in self.runner(job, api_key, done, cancel_event):
+            if cancel_event.is_set():
+                break
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO job_steps VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        job_id,
+                        step,
+                        result,
+                        not result.startswith("Error:"),
+                        seconds,
+                        time.time(),
+                    ),
+                )
+
+        if cancel_event.is_set():
+            return
+        failed = self.get(job_id).failed
+        if failed:
+            self._finish(job_id, "failed", f"{failed} steps failed; resume to retry")
+        else:
+            self._finish(job_id, "done")
+
+    def _finish(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, finished_at = ?, error = ?
+                WHERE id = ? AND status = 'running'
+                """,
+                (status, time.time(), error, job_id),
+            )
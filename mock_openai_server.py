@@ -0,0 +1,412 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned completion bodies shaped like the app's expected output sections
+REACTION_TEMPLATE = """ENGAGEMENT LEVEL: {engagement}
+EMOTIONAL RESPONSE: {emotion}
+
+REACTION ANALYSIS:
+{filler}
+
+KEY TRIGGERS:
+- Family support messaging
+- Fast transfer promise
+- Low fees
+
+SEGMENT-SPECIFIC INSIGHTS:
+{filler}
+
+IMPROVEMENT SUGGESTIONS:
+- Add a testimonial
+- Mention delivery confirmation
+"""
+
+ENHANCEMENT_TEMPLATE = """ENHANCED CONTENT:
+{filler}
+
+ENHANCEMENT RATIONALE:
+{filler}
+
+IRAQI ARABIC HOOKS:
+- حوالتك توصل بسرعة
+- أهلك أولاً
+
+PLATFORM-SPECIFIC ADAPTATIONS:
+{filler}
+"""
+
+ARABIC_TEMPLATE = """IRAQI ARABIC CONTENT:
+دز فلوس لأهلك بالعراق بسرعة وأمان
+
+CULTURAL ADAPTATION NOTES:
+{filler}
+
+EMOTIONAL TRIGGERS:
+- Family connection
+- Pride in supporting home
+
+ENGAGEMENT TIPS:
+{filler}
+"""
+
+SEGMENT_NAMES = re.compile(r"Use exactly these segment names as keys: (\[.*?\])")
+
+FILLER_WORDS = (
+    "this segment values reliable transfers and family connection so the post "
+    "lands well when it speaks to trust speed and cost"
+).split()
+
+
+class MockSettings:
+    """Latency, throughput and fault-injection knobs for the mock server"""
+
+    def __init__(
+        self,
+        ttft_median_ms=400.0,
+        ttft_sigma=0.5,
+        tokens_per_second=50.0,
+        completion_tokens=200,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        retry_after_seconds=1.0,
+        seed=None,
+        malformed_rate=0.0,
+    ):
+        self.ttft_median_ms = ttft_median_ms
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        # Fraction of completions that are plain filler, which the app's
+        # validators reject
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+
+
+class MockStats:
+    """Thread-safe request counters exposed at GET /stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def increment(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "errors": self.errors,
+            }
+
+
+def _completion_text(messages, settings, max_tokens):
+    """Build a plausible completion for whichever app prompt was sent"""
+
+    prompt = "\n".join(message.get("content") or "" for message in messages)
+    rng = settings.random
+    budget = max(
+        1, min(max_tokens or settings.completion_tokens, settings.completion_tokens)
+    )
+    filler = " ".join(rng.choice(FILLER_WORDS) for _ in range(max(1, budget // 3)))
+    if rng.random() < settings.malformed_rate:
+        return filler
+
+    names = SEGMENT_NAMES.search(prompt)
+    if names:
+        segments = json.loads(names.group(1))
+        return json.dumps(
+            {
+                name: {
+                    "engagement_level": rng.choice(["High", "Medium", "Low"]),
+                    "emotional_response": rng.choice(["Positive", "Mixed"]),
+                    "reaction_analysis": filler,
+                    "key_triggers": ["Family support", "Speed"],
+                    "segment_specific_insights": ["Trust matters"],
+                    "improvement_suggestions": ["Add a testimonial"],
+                }
+                for name in segments
+            },
+            ensure_ascii=False,
+        )
+
+    if "CONTENT TO SCORE" in prompt:
+        return json.dumps(
+            {
+                "score": rng.randint(1, 10),
+                "engagement_level": rng.choice(["High", "Medium", "Low"]),
+                "reason": filler,
+            }
+        )
+
+    if '"engagement_score"' in prompt:
+        return json.dumps(
+            {
+                "engagement_level": rng.choice(["High", "Medium", "Low"]),
+                "emotional_response": rng.choice(["Positive", "Mixed", "Negative"]),
+                "engagement_score": rng.randint(0, 100),
+                "sentiment_score": rng.randint(0, 100),
+                "top_trigger": rng.choice(["Family support", "Speed", "Low fees"]),
+            }
+        )
+
+    if "SUBSEGMENT:" in prompt:
+        return json.dumps(
+            {
+                "engagement_level": rng.choice(["High", "Medium", "Low"]),
+                "emotional_response": rng.choice(["Positive", "Mixed", "Negative"]),
+                "summary": filler,
+                "key_triggers": rng.sample(["Family support", "Speed", "Low fees"], 2),
+            }
+        )
+
+    if "ENGAGEMENT LEVEL" in prompt:
+        return REACTION_TEMPLATE.format(
+            engagement=rng.choice(["High", "Medium", "Low"]),
+            emotion=rng.choice(["Positive", "Neutral", "Mixed"]),
+            filler=filler,
+        )
+    if "ENHANCED CONTENT" in prompt:
+        return ENHANCEMENT_TEMPLATE.format(filler=filler)
+    if "IRAQI ARABIC CONTENT" in prompt:
+        return ARABIC_TEMPLATE.format(filler=filler)
+    return filler
+
+
+def _usage(messages, completion):
+    prompt_tokens = sum(len((m.get("content") or "").split()) for m in messages)
+    completion_tokens = len(completion.split())
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = None
+    stats = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.stats.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        settings, stats = self.settings, self.stats
+        stats.increment("requests")
+
+        roll = settings.random.random()
+        if roll < settings.rate_limit_rate:
+            stats.increment("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                {"Retry-After": str(settings.retry_after_seconds)},
+            )
+            return
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            stats.increment("errors")
+            self._send_json(500, {"error": {"message": "Injected server error"}})
+            return
+
+        messages = body.get("messages", [])
+        completion = _completion_text(messages, settings, body.get("max_tokens"))
+        stop = body.get("stop") or []
+        for sequence in [stop] if isinstance(stop, str) else stop:
+            # Like the API: generation ends before the stop sequence
+            completion = completion.split(sequence, 1)[0]
+        ttft = (
+            settings.ttft_median_ms
+            / 1000
+            * math.exp(settings.random.gauss(0, settings.ttft_sigma))
+        )
+        time.sleep(ttft)
+
+        if body.get("stream"):
+            try:
+                self._stream(body, messages, completion)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client hung up mid-stream, e.g. a cancelled prefetch
+                self.close_connection = True
+        else:
+            # Non-streamed responses still pay for generating every token
+            time.sleep(len(completion.split()) / settings.tokens_per_second)
+            self._send_json(
+                200,
+                {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": completion},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": _usage(messages, completion),
+                },
+            )
+
+    def _stream(self, body, messages, completion):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(payload):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+        }
+        delay = 1.0 / self.settings.tokens_per_second
+        for i, word in enumerate(completion.split(" ")):
+            text = word if i == 0 else " " + word
+            send(
+                dict(
+                    chunk,
+                    choices=[
+                        {"index": 0, "delta": {"content": text}, "finish_reason": None}
+                    ],
+                )
+            )
+            time.sleep(delay)
+
+        send(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send(dict(chunk, choices=[], usage=_usage(messages, completion)))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer:
+    """Local chat-completions stand-in, usable as a context manager"""
+
+    def __init__(self, host="127.0.0.1", port=0, settings=None):
+        self.settings = settings or MockSettings()
+        self.stats = MockStats()
+        handler = type(
+            "MockHandler", (_Handler,), {"settings": self.settings, "stats": self.stats}
+        )
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_settings_arguments(parser):
+    """Shared CLI flags for configuring MockSettings"""
+
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--ttft-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+
+
+def settings_from_args(args):
+    return MockSettings(
+        ttft_median_ms=args.ttft_ms,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_seconds=args.retry_after,
+        seed=args.seed,
+        malformed_rate=args.malformed_rate,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve a local OpenAI-compatible chat-completions mock"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockOpenAIServer(args.host, args.port, settings_from_args(args))
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import json
+import os
+
+# The two tiers of the cascade: a fast, cheap model tried first and the
+# large model it escalates to
+FAST_MODEL = os.environ.get("FAST_MODEL", "gpt-4o-mini")
+LARGE_MODEL = os.environ.get("LARGE_MODEL", "gpt-4")
+
+CASCADE = "cascade"
+
+# LLM function -> model name, or CASCADE for fast-then-large. Structured
+# verdicts and scores are checked cheaply, so they start on the fast
+# model. Streamed prose (single-segment reactions, enhancement and Arabic
+# copy) goes straight to the large one: a cascade cannot stream its draft
+DEFAULT_ROUTES = {
+    "analyze_segment_reaction": LARGE_MODEL,
+    "analyze_segments_combined": CASCADE,
+    "analyze_subsegment_reaction": CASCADE,
+    "score_variant": CASCADE,
+    "score_segment_reaction": CASCADE,
+    "enhance_content_for_segments": LARGE_MODEL,
+    "generate_iraqi_arabic_content": LARGE_MODEL,
+}
+
+# JSON object overriding individual DEFAULT_ROUTES entries
+MODEL_ROUTES = os.environ.get("MODEL_ROUTES") or None
+
+
+class ModelRouter:
+    """Chooses the model, or fast-then-large cascade, for each LLM function"""
+
+    def __init__(
+        self, routes=MODEL_ROUTES, fast_model=FAST_MODEL, large_model=LARGE_MODEL
+    ):
+        self.fast_model = fast_model
+        self.large_model = large_model
+        self.routes = dict(DEFAULT_ROUTES)
+        if isinstance(routes, str):
+            routes = json.loads(routes)
+        for function, route in (routes or {}).items():
+            if not isinstance(route, str) or not route:
+                raise ValueError(
+                    f"Route for {function} must be a model name or 'cascade'"
+                )
+            self.routes[function] = route
+
+    def tier(self, model):
+        return "fast" if model == self.fast_model else "large"
+
+    def tiers(self, function, high_quality=False):
+        """[(tier, model), ...] to try in order; later ones are escalations"""
+
+        if high_quality:
+            return [("large", self.large_model)]
+        route = self.routes.get(function, self.large_model)
+        if route == CASCADE:
+            return [("fast", self.fast_model), ("large", self.large_model)]
+        return [(self.tier(route), route)]
+
+    def label(self, function, high_quality=False):
+        """Short description of the route, e.g. 'gpt-4o-mini→gpt-4'"""
+        return "→".join(model for _, model in self.tiers(function, high_quality))
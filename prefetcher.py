@@ -0,0 +1,117 @@
+import dataclasses
+import os
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from functools import partial
+
+from request_scheduler import TokenBucket
+
+# Background workers and the hourly token allowance for speculative calls
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "4"))
+PREFETCH_TOKENS_PER_HOUR = int(os.environ.get("PREFETCH_TOKENS_PER_HOUR", "60000"))
+
+
+class PrefetchCancelled(Exception):
+    """A speculative call was abandoned: inputs changed or the budget ran out"""
+
+
+class _Speculation:
+    def __init__(self, keys, cancel_event):
+        self.keys = keys
+        self.cancel_event = cancel_event
+        self.futures = {}
+
+
+class SpeculativePrefetcher:
+    """Runs likely analyses ahead of the Analyze button so their results are
+    already in the response cache, one cancellable speculation per session"""
+
+    def __init__(
+        self, max_workers=PREFETCH_WORKERS, tokens_per_hour=PREFETCH_TOKENS_PER_HOUR
+    ):
+        self.budget = TokenBucket(tokens_per_hour, tokens_per_hour / 3600.0)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        )
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.cancelled = 0
+
+    def spend(self, tokens):
+        """Charge a speculative call to the budget; False if it cannot afford it"""
+        return self.budget.try_acquire(tokens)
+
+    def prefetch(self, session_id, tasks, options):
+        """Speculatively run {key: task}, each called with options=...
+
+        Calling again with the same keys is a no-op; different keys cancel
+        whatever the session was speculating on before.
+        """
+
+        keys = frozenset(tasks)
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is not None and current.keys == keys:
+                return
+            if current is not None:
+                self._cancel(current)
+
+            speculation = _Speculation(keys, threading.Event())
+            speculative = dataclasses.replace(
+                options, speculative=True, cancel_event=speculation.cancel_event
+            )
+            for key, task in tasks.items():
+                speculation.futures[key] = self._executor.submit(
+                    task, options=speculative
+                )
+            self.started += len(tasks)
+            self._sessions[session_id] = speculation
+
+    def _cancel(self, speculation):
+        speculation.cancel_event.set()
+        for future in speculation.futures.values():
+            if not future.done():
+                self.cancelled += 1
+                future.cancel()
+
+    def cancel(self, session_id):
+        """Abandon the session's speculation, including calls in flight"""
+
+        with self._lock:
+            speculation = self._sessions.pop(session_id, None)
+            if speculation is not None:
+                self._cancel(speculation)
+
+    def adopt(self, session_id, tasks):
+        """Swap tasks whose speculative call is still running for a wait on it
+
+        Finished speculations need no help: their results are in the cache.
+        A speculation that ends in an error falls back to the real task.
+        """
+
+        with self._lock:
+            speculation = self._sessions.get(session_id)
+            if speculation is None:
+                return tasks
+            futures = speculation.futures
+
+        def adopted(future, task, on_token=None):
+            try:
+                result = future.result()
+            except CancelledError:
+                result = None
+            if result is None or result.startswith("Error:"):
+                return task(on_token=on_token)
+            if on_token:
+                on_token(result)
+            return result
+
+        return {
+            key: (
+                partial(adopted, futures[key], task)
+                if key in futures and not futures[key].done()
+                else task
+            )
+            for key, task in tasks.items()
+        }
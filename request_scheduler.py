@@ -0,0 +1,203 @@
+import email.utils
+import os
+import threading
+import time
+
+from tenacity import (
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+# Organisation-level budgets the scheduler keeps every LLM call under
+DEFAULT_RPM_LIMIT = int(os.environ.get("OPENAI_RPM_LIMIT", "500"))
+DEFAULT_TPM_LIMIT = int(os.environ.get("OPENAI_TPM_LIMIT", "40000"))
+DEFAULT_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "5"))
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("OPENAI_MAX_IN_FLIGHT", "16"))
+
+# Upper bound on a single backoff sleep, whatever Retry-After says
+MAX_BACKOFF_SECONDS = 60.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Continuously refilling token bucket; acquire blocks until capacity is free"""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated) * self.refill_per_second,
+        )
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """Take amount tokens, sleeping until the bucket has refilled enough"""
+
+        # A single request larger than the whole budget waits for a full bucket
+        amount = min(float(amount), self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                self._cond.wait((amount - self._tokens) / self.refill_per_second)
+
+    def try_acquire(self, amount=1):
+        """Take amount tokens if available right now; never blocks"""
+
+        with self._cond:
+            self._refill()
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+
+class AdaptiveLimiter:
+    """Concurrency cap that halves on throttling and grows back by one on success"""
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit // 2)
+            elif self.limit < self.max_limit:
+                self.limit += 1
+            self._cond.notify_all()
+
+
+def is_retryable(exc):
+    """Rate limits, timeouts, dropped connections and transient 5xx are retried"""
+
+    import openai  # loaded by the client before any call can fail
+
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def retry_after_seconds(exc):
+    """Server-requested delay from Retry-After / retry-after-ms headers, if any"""
+
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                retry_at = email.utils.parsedate_to_datetime(value)
+                return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class RequestScheduler:
+    """Central gate for LLM calls: RPM/TPM token buckets, adaptive concurrency
+    and jittered exponential-backoff retries that honour Retry-After"""
+
+    def __init__(
+        self,
+        rpm=DEFAULT_RPM_LIMIT,
+        tpm=DEFAULT_TPM_LIMIT,
+        max_retries=DEFAULT_MAX_RETRIES,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    ):
+        self.max_retries = max_retries
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.limiter = AdaptiveLimiter(max_in_flight)
+        self._backoff = wait_random_exponential(multiplier=0.5, max=MAX_BACKOFF_SECONDS)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.retries = 0
+
+    def _wait(self, retry_state):
+        exc = retry_state.outcome.exception()
+        delay = self._backoff(retry_state)
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, MAX_BACKOFF_SECONDS))
+            # Every other caller should hold off too, not just this one
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def _attempt(self, fn, estimated_tokens):
+        import openai  # deferred like the client itself, to keep startup light
+
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+
+        self.limiter.acquire()
+        throttled = False
+        try:
+            self.requests.acquire(1)
+            self.tokens.acquire(estimated_tokens)
+            return fn()
+        except openai.RateLimitError:
+            throttled = True
+            with self._lock:
+                self.throttled += 1
+            raise
+        finally:
+            self.limiter.release(throttled=throttled)
+
+    def call(self, fn, estimated_tokens=1, on_retry=None):
+        """Run fn under the rate budgets, retrying retryable failures
+
+        on_retry(attempt_number, exception) is invoked before each retry sleep.
+        The last exception is re-raised once retries are exhausted.
+        """
+
+        def before_sleep(retry_state):
+            with self._lock:
+                self.retries += 1
+            if on_retry:
+                on_retry(retry_state.attempt_number, retry_state.outcome.exception())
+
+        retrying = Retrying(
+            retry=retry_if_exception(is_retryable),
+            stop=stop_after_attempt(self.max_retries + 1),
+            wait=self._wait,
+            before_sleep=before_sleep,
+            reraise=True,
+        )
+        for attempt in retrying:
+            with attempt:
+                return self._attempt(fn, estimated_tokens)
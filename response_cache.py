@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Location and eviction limits for the on-disk response cache
+DEFAULT_CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3")
+)
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+DEFAULT_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Prebuilt read-only responses consulted on a cache miss (see warm_start.py)
+DEFAULT_SNAPSHOT_PATH = os.environ.get("LLM_WARM_START_PATH", "warm_start.sqlite3")
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+def make_cache_key(function, model, temperature, max_tokens, prompt, base_url=None):
+    """Content-addressed key for one LLM call
+
+    base_url is part of the key, so answers from a mock or other custom
+    endpoint are never served to sessions talking to the default API.
+    """
+
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    endpoint = (base_url or "").rstrip("/")
+    fingerprint = json.dumps(
+        [function, model, temperature, max_tokens, prompt_hash, endpoint]
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def open_snapshot(path):
+    """Read-only connection to a warm-start snapshot, or None when the file
+    is missing or was written by an incompatible version"""
+
+    if not path or not os.path.exists(path):
+        return None
+
+    conn = sqlite3.connect(
+        Path(path).resolve().as_uri() + "?mode=ro",
+        uri=True,
+        check_same_thread=False,
+    )
+    try:
+        row = conn.execute(
+            "SELECT value FROM meta WHERE name = 'format_version'"
+        ).fetchone()
+    except sqlite3.DatabaseError:
+        row = None
+    if row is None or int(row[0]) != SNAPSHOT_FORMAT_VERSION:
+        conn.close()
+        return None
+    return conn
+
+
+def write_snapshot(path, rows, meta):
+    """Write (key, function, model, response) rows and meta to a new snapshot"""
+
+    partial_path = path + ".partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    conn = sqlite3.connect(partial_path)
+    with conn:
+        conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(
+            """
+            CREATE TABLE responses (
+                key TEXT PRIMARY KEY,
+                function TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL
+            )
+            """
+        )
+        meta = dict(meta, format_version=SNAPSHOT_FORMAT_VERSION)
+        conn.executemany(
+            "INSERT INTO meta (name, value) VALUES (?, ?)",
+            [(name, str(value)) for name, value in meta.items()],
+        )
+        conn.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", rows)
+    conn.close()
+    os.replace(partial_path, path)
+
+
+class ResponseCache:
+    """SQLite-backed LLM response cache with LRU size and TTL eviction"""
+
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+        snapshot_path=DEFAULT_SNAPSHOT_PATH,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._snapshot_opened = False
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One shared connection guarded by a lock; Streamlit sessions and
+        # the segment worker pool all hit the cache from different threads
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                function TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+        )
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss or expiry"""
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return self._snapshot_get(key, now)
+
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return response
+
+    def _snapshot_get(self, key, now):
+        # Opened on the first miss, so startup never waits on the snapshot
+        if not self._snapshot_opened:
+            self._snapshot = open_snapshot(self.snapshot_path)
+            self._snapshot_opened = True
+        if self._snapshot is None:
+            return None
+
+        row = self._snapshot.execute(
+            "SELECT function, model, response FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        # Promote into the live cache so later hits skip the snapshot
+        function, model, response = row
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO responses
+                (key, function, model, response, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (key, function, model, response, now, now),
+        )
+        return response
+
+    def rows(self):
+        """Every live (key, function, model, response), for building snapshots"""
+
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, function, model, response FROM responses"
+            ).fetchall()
+
+    def set(self, key, response, function="", model=""):
+        """Store a response and evict anything past the TTL or size limit"""
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (key, function, model, response, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, function, model, response, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if self.max_entries and count > self.max_entries:
+            # Least recently used entries go first
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        """Drop every cached response"""
+
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
@@ -0,0 +1,248 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from text_folding import strip_marks
+
+# Location of the append-only store of every analysis result
+DEFAULT_HISTORY_PATH = os.environ.get(
+    "RUN_HISTORY_PATH", os.path.join(".cache", "run_history.sqlite3")
+)
+
+ENGAGEMENT_LEVELS = ("High", "Medium", "Low")
+
+# Searches ignore Arabic diacritics and tatweel, and spelling variants of
+# alef, yeh and teh marbuta that the model and users write interchangeably
+_ARABIC_VARIANTS = str.maketrans(
+    {
+        "\u0623": "\u0627",  # alef with hamza above
+        "\u0625": "\u0627",  # alef with hamza below
+        "\u0622": "\u0627",  # alef with madda
+        "\u0671": "\u0627",  # alef wasla
+        "\u0649": "\u064a",  # alef maksura
+        "\u0629": "\u0647",  # teh marbuta
+    }
+)
+_WORD = re.compile(r"\w+")
+
+
+def fold(text):
+    """Case-, width- and Arabic-spelling-insensitive form of text for search"""
+
+    return strip_marks(text).translate(_ARABIC_VARIANTS)
+
+
+def match_query(keyword):
+    """FTS5 query matching every word of keyword as a prefix, or None"""
+
+    words = _WORD.findall(fold(keyword))
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+@dataclass
+class Run:
+    """One stored analysis result"""
+
+    id: int
+    created_at: float
+    content: str
+    segment: str
+    analysis_type: str
+    model: str
+    output: str
+    engagement_level: Optional[str]
+    emotional_response: Optional[str]
+    seconds: Optional[float]
+
+
+class RunHistory:
+    """Append-only SQLite store of analysis runs with indexed filters and
+    FTS5 search over posts and outputs"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                post_hash TEXT NOT NULL,
+                content TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                analysis_type TEXT NOT NULL,
+                model TEXT NOT NULL,
+                output TEXT NOT NULL,
+                engagement_level TEXT,
+                emotional_response TEXT,
+                seconds REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at);
+            -- Index entries end in the rowid, so filtered pages come out in id order
+            CREATE INDEX IF NOT EXISTS idx_runs_engagement ON runs (engagement_level);
+            CREATE INDEX IF NOT EXISTS idx_runs_type ON runs (analysis_type);
+            -- Enhancements cover several segments, so filters go through here
+            CREATE TABLE IF NOT EXISTS run_segments (
+                segment TEXT NOT NULL,
+                run_id INTEGER NOT NULL,
+                PRIMARY KEY (segment, run_id)
+            ) WITHOUT ROWID;
+            -- Contentless: holds only the index of the folded text
+            CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(
+                content, output, content='', tokenize='unicode61 remove_diacritics 2'
+            );
+            """
+        )
+
+    def add(
+        self,
+        post_hash,
+        content,
+        segments,
+        analysis_type,
+        model,
+        output,
+        engagement_level=None,
+        emotional_response=None,
+        seconds=None,
+    ):
+        """Append one result; segments lists every segment it covers"""
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute(
+                    """
+                    INSERT INTO runs (created_at, post_hash, content, segment,
+                                      analysis_type, model, output,
+                                      engagement_level, emotional_response, seconds)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        time.time(),
+                        post_hash,
+                        content,
+                        ", ".join(segments),
+                        analysis_type,
+                        model,
+                        output,
+                        engagement_level,
+                        emotional_response,
+                        seconds,
+                    ),
+                )
+                run_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO run_segments VALUES (?, ?)",
+                    [(segment, run_id) for segment in segments],
+                )
+                self._conn.execute(
+                    "INSERT INTO runs_fts (rowid, content, output) VALUES (?, ?, ?)",
+                    (run_id, fold(content), fold(output)),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return run_id
+
+    @staticmethod
+    def _where(segments, since, until, engagement_level, analysis_type, keyword):
+        clauses, params = [], []
+        if segments:
+            clauses.append(
+                "id IN (SELECT run_id FROM run_segments WHERE segment IN (%s))"
+                % ", ".join("?" * len(segments))
+            )
+            params.extend(segments)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if engagement_level:
+            clauses.append("engagement_level = ?")
+            params.append(engagement_level)
+        if analysis_type:
+            clauses.append("analysis_type = ?")
+            params.append(analysis_type)
+        query = match_query(keyword) if keyword else None
+        if query:
+            clauses.append("id IN (SELECT rowid FROM runs_fts WHERE runs_fts MATCH ?)")
+            params.append(query)
+        return " AND ".join(clauses) or "1", params
+
+    def search(
+        self,
+        segments=None,
+        since=None,
+        until=None,
+        engagement_level=None,
+        analysis_type=None,
+        keyword=None,
+        before_id=None,
+        limit=50,
+    ):
+        """Newest matching runs, paged by id: pass the last id of a page as
+        before_id to get the next one
+
+        since and until are Unix times; keyword matches words of the post or
+        output by prefix, in English or Arabic.
+        """
+
+        where, params = self._where(
+            segments, since, until, engagement_level, analysis_type, keyword
+        )
+        if before_id is not None:
+            where += " AND id < ?"
+            params.append(before_id)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT id, created_at, content, segment, analysis_type, model,
+                       output, engagement_level, emotional_response, seconds
+                FROM runs WHERE {where} ORDER BY id DESC LIMIT ?
+                """,
+                (*params, limit),
+            ).fetchall()
+        return [Run(*row) for row in rows]
+
+    def count(
+        self,
+        segments=None,
+        since=None,
+        until=None,
+        engagement_level=None,
+        analysis_type=None,
+        keyword=None,
+    ):
+        """Number of runs matching the same filters as search"""
+
+        where, params = self._where(
+            segments, since, until, engagement_level, analysis_type, keyword
+        )
+        with self._lock:
+            (count,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM runs WHERE {where}", params
+            ).fetchone()
+        return count
+
+    def __len__(self):
+        return self.count()
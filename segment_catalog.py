@@ -0,0 +1,157 @@
+import bisect
+import json
+import os
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+# External catalog replacing the built-in segments; JSON, YAML or Parquet
+SEGMENT_CATALOG_PATH = os.environ.get("SEGMENT_CATALOG_PATH") or None
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+class SegmentProfile(BaseModel):
+    """Schema for one catalog entry; list fields may be omitted"""
+
+    name: str
+    description: str
+    age_range: str
+    corridor: Optional[str] = None
+    subsegments: List[str] = []
+    motivations: List[str] = []
+    traits: List[str] = []
+    key_concerns: List[str] = []
+    platforms: List[str] = []
+    keywords: List[str] = []
+
+
+_CATALOG_SCHEMA = TypeAdapter(List[SegmentProfile])
+
+
+def _read_records(path):
+    """Raw catalog entries from a JSON, YAML or Parquet file"""
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path).to_pylist()
+
+    with open(path, encoding="utf-8") as f:
+        if extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML segment catalogs")
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"Invalid YAML segment catalog: {e}") from e
+        elif extension == ".json":
+            data = json.load(f)
+        else:
+            raise ValueError(f"Unsupported segment catalog format: {extension}")
+
+    # Either a list of entries or a {name: profile} mapping like AUDIENCE_SEGMENTS
+    if isinstance(data, dict):
+        return [{"name": name, **profile} for name, profile in data.items()]
+    return data
+
+
+def _terms(text):
+    return {word.casefold() for word in _WORDS.findall(text)}
+
+
+class SegmentCatalog:
+    """Segment profiles with inverted indexes for sidebar filtering and search"""
+
+    def __init__(self, segments):
+        # name -> profile dict, the shape the prompt builders expect
+        self.segments = segments
+        self.by_trait = {}
+        self.by_platform = {}
+        # Casefolded words from names, descriptions, subsegments, traits,
+        # platforms and keywords -> segments, for free-text search
+        self.by_term = {}
+
+        for name, info in segments.items():
+            for trait in info.get("traits", ()):
+                self.by_trait.setdefault(trait, set()).add(name)
+            for platform in info.get("platforms", ()):
+                self.by_platform.setdefault(platform, set()).add(name)
+
+            searchable = " ".join(
+                [name, info.get("description", ""), info.get("corridor") or ""]
+                + list(info.get("subsegments", ()))
+                + list(info.get("traits", ()))
+                + list(info.get("platforms", ()))
+                + list(info.get("keywords", ()))
+            )
+            for term in _terms(searchable):
+                self.by_term.setdefault(term, set()).add(name)
+
+        self._sorted_terms = sorted(self.by_term)
+
+    @classmethod
+    def from_mapping(cls, segments):
+        """Catalog over an in-memory {name: profile} dict, used as-is"""
+
+        return cls(dict(segments))
+
+    @classmethod
+    def from_records(cls, records):
+        """Validate raw entries against the schema and build the catalog"""
+
+        profiles = _CATALOG_SCHEMA.validate_python(records)
+        segments = {}
+        for profile in profiles:
+            if profile.name in segments:
+                raise ValueError(f"Duplicate segment name: {profile.name}")
+            segments[profile.name] = profile.model_dump(exclude={"name"})
+        return cls(segments)
+
+    def _matching_term(self, prefix):
+        """Segments with any indexed word starting with prefix"""
+
+        names = set()
+        terms = self._sorted_terms
+        index = bisect.bisect_left(terms, prefix)
+        while index < len(terms) and terms[index].startswith(prefix):
+            names |= self.by_term[terms[index]]
+            index += 1
+        return names
+
+    def search(self, query="", traits=(), platforms=()):
+        """Segment names, in catalog order, matching every query word (by
+        prefix) and at least one of each selected trait and platform"""
+
+        candidates = None
+
+        def narrow(names):
+            nonlocal candidates
+            candidates = names if candidates is None else candidates & names
+
+        for word in _terms(query):
+            narrow(self._matching_term(word))
+        if traits:
+            narrow(set().union(*(self.by_trait.get(t, set()) for t in traits)))
+        if platforms:
+            narrow(set().union(*(self.by_platform.get(p, set()) for p in platforms)))
+
+        if candidates is None:
+            return list(self.segments)
+        return [name for name in self.segments if name in candidates]
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __contains__(self, name):
+        return name in self.segments
+
+
+def load_catalog(path):
+    """Read and validate an external segment catalog file"""
+
+    return SegmentCatalog.from_records(_read_records(path))
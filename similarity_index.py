@@ -0,0 +1,261 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from text_folding import strip_marks
+
+# Location of the on-disk index; how alike two posts must be to share
+# results is the app's NEAR_DUPLICATE_THRESHOLD
+DEFAULT_INDEX_PATH = os.environ.get(
+    "NEAR_DUPLICATE_INDEX_PATH", os.path.join(".cache", "post_index.sqlite3")
+)
+
+NUM_PERMUTATIONS = 128
+SHINGLE_SIZE = 5
+# LSH banding: posts sharing any 4-slot band are scored, which catches
+# Jaccard 0.8 pairs with >99.9% probability and 0.5 pairs ~87% of the time
+BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Bump when signatures change so stored ones are rebuilt rather than compared
+SIGNATURE_VERSION = 2
+
+# Universal hashing (a * x + b) mod p over the Mersenne prime 2**61 - 1,
+# with a and b drawn from the whole field so the permutations are independent
+_PRIME = (1 << 61) - 1
+_MERSENNE_PRIME = np.uint64(_PRIME)
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_LOW_31 = np.uint64((1 << 31) - 1)
+_LOW_30 = np.uint64((1 << 30) - 1)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Case-, width- and diacritic-insensitive form of a post"""
+
+    return _WHITESPACE.sub(" ", strip_marks(text)).strip()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Distinct character n-grams of the normalized text"""
+
+    text = normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+def _shingle_hash(shingle):
+    digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % _PRIME
+
+
+def _permute(x):
+    """(a * x + b) mod 2**61 - 1 for every shingle hash x and every (a, b)
+
+    a * x needs up to 122 bits, so both are split into 31-bit halves and the
+    partial products folded with 2**61 = 1 (mod p), keeping every
+    intermediate below 2**64.
+    """
+
+    x = x[:, None]
+    a_hi, a_lo = _A >> np.uint64(31), _A & _LOW_31
+    x_hi, x_lo = x >> np.uint64(31), x & _LOW_31
+    # a * x = hi * 2**62 + mid * 2**31 + lo, and 2**62 = 2 (mod p)
+    hi = a_hi * x_hi
+    mid = a_hi * x_lo + a_lo * x_hi
+    lo = a_lo * x_lo
+    # mid * 2**31 = (mid >> 30) * 2**61 + (mid & (2**30 - 1)) * 2**31
+    mid = (mid >> np.uint64(30)) + ((mid & _LOW_30) << np.uint64(31))
+    return (hi * np.uint64(2) + mid + lo + _B) % _MERSENNE_PRIME
+
+
+def minhash(text):
+    """MinHash signature of a post's character shingles"""
+
+    hashes = np.fromiter((_shingle_hash(s) for s in shingles(text)), dtype=np.uint64)
+    # Keeping the low 32 bits of each minimum costs ~2**-32 false agreements
+    return (_permute(hashes).min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+@dataclass
+class NearDuplicate:
+    """Closest previously analyzed post and the result stored for it"""
+
+    similarity: float
+    content: str
+    result: str
+    created_at: float
+
+
+def _band_keys(signature):
+    return [
+        signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND].tobytes()
+        for band in range(BANDS)
+    ]
+
+
+class _Group:
+    """Signatures and LSH buckets for one (segment, profile, analysis type,
+    model)"""
+
+    def __init__(self):
+        self.ids = []
+        self.signatures = np.empty((16, NUM_PERMUTATIONS), dtype=np.uint32)
+        self.buckets = [{} for _ in range(BANDS)]
+
+    def add(self, row_id, signature):
+        position = len(self.ids)
+        if position == len(self.signatures):
+            grown = np.empty((position * 2, NUM_PERMUTATIONS), dtype=np.uint32)
+            grown[:position] = self.signatures
+            self.signatures = grown
+        self.signatures[position] = signature
+        self.ids.append(row_id)
+        for buckets, key in zip(self.buckets, _band_keys(signature)):
+            buckets.setdefault(key, []).append(position)
+
+    def best_match(self, signature):
+        """(row id, estimated Jaccard) of the closest candidate, or None"""
+
+        candidates = set()
+        for buckets, key in zip(self.buckets, _band_keys(signature)):
+            candidates.update(buckets.get(key, ()))
+        if not candidates:
+            return None
+
+        positions = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+        # Fraction of agreeing MinHash slots estimates shingle Jaccard
+        agreeing = np.count_nonzero(self.signatures[positions] == signature, axis=1)
+        best = int(agreeing.argmax())
+        return self.ids[positions[best]], agreeing[best] / NUM_PERMUTATIONS
+
+
+class NearDuplicateIndex:
+    """Offline MinHash index over analyzed posts, persisted in SQLite and
+    scored in memory with NumPy"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._known = set()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != SIGNATURE_VERSION:
+            # Older tables lack the profile key or hold signatures computed
+            # with different hash functions; neither can be matched safely
+            self._conn.execute("DROP TABLE IF EXISTS posts")
+            self._conn.execute(f"PRAGMA user_version = {SIGNATURE_VERSION}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY,
+                post_hash TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                analysis_type TEXT NOT NULL,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (post_hash, segment, profile, analysis_type, model)
+            )
+            """
+        )
+
+        rows = self._conn.execute(
+            "SELECT id, segment, profile, analysis_type, model, signature "
+            "FROM posts ORDER BY id"
+        )
+        for row_id, segment, profile, analysis_type, model, signature in rows:
+            self._insert((segment, profile, analysis_type, model), row_id, signature)
+
+    def _insert(self, group_key, row_id, signature):
+        # Re-analyzing a known post only refreshes its stored result
+        if row_id in self._known:
+            return
+        self._known.add(row_id)
+        group = self._groups.setdefault(group_key, _Group())
+        group.add(row_id, np.frombuffer(signature, dtype=np.uint32))
+
+    def add(self, content, segment, profile, analysis_type, model, result):
+        """Remember the result of analyzing content for one segment
+
+        profile identifies the segment definition the analysis used (e.g. a
+        hash of it), so editing a segment stops its old results matching.
+        """
+
+        post_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        signature = minhash(content).tobytes()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO posts (post_hash, segment, profile, analysis_type,
+                                   model, content, signature, result, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (post_hash, segment, profile, analysis_type, model)
+                DO UPDATE SET result = excluded.result,
+                              created_at = excluded.created_at
+                """,
+                (
+                    post_hash,
+                    segment,
+                    profile,
+                    analysis_type,
+                    model,
+                    content,
+                    signature,
+                    result,
+                    time.time(),
+                ),
+            )
+            (row_id,) = self._conn.execute(
+                """
+                SELECT id FROM posts WHERE post_hash = ? AND segment = ?
+                    AND profile = ? AND analysis_type = ? AND model = ?
+                """,
+                (post_hash, segment, profile, analysis_type, model),
+            ).fetchone()
+            self._insert((segment, profile, analysis_type, model), row_id, signature)
+
+    def lookup(self, content, segment, profile, analysis_type, model, threshold):
+        """Most similar stored post at or above threshold, or None"""
+
+        signature = minhash(content)
+        with self._lock:
+            group = self._groups.get((segment, profile, analysis_type, model))
+            match = group.best_match(signature) if group else None
+            if match is None or match[1] < threshold:
+                return None
+            row_id, similarity = match
+            row = self._conn.execute(
+                "SELECT content, result, created_at FROM posts WHERE id = ?",
+                (row_id,),
+            ).fetchone()
+
+        content, result, created_at = row
+        return NearDuplicate(float(similarity), content, result, created_at)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._known)
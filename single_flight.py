@@ -0,0 +1,119 @@
+import threading
+
+
+class _Flight:
+    """One upstream call in progress and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.parts = []
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def emit(self, delta):
+        with self._lock:
+            self.parts.append(delta)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(delta)
+
+    def join(self, on_token):
+        # Late joiners first get everything streamed so far, under the lock
+        # so no delta can overtake it
+        with self._lock:
+            if self.parts:
+                on_token("".join(self.parts))
+            self.listeners.append(on_token)
+
+
+class _Output:
+    """A caller's on_token across the flights it tries: each flight's text is
+    passed on only past what earlier ones already delivered, so a retry after
+    a leader's personal error does not repeat text"""
+
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.delivered = 0
+        self.position = 0
+
+    def restart(self):
+        self.position = 0
+
+    def __call__(self, delta):
+        start = self.position
+        self.position += len(delta)
+        if self.position > self.delivered:
+            self.on_token(delta[max(0, self.delivered - start) :])
+            self.delivered = self.position
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls across threads: the first caller
+    for a key makes the call and everyone arriving before it finishes shares
+    its result, streamed tokens included"""
+
+    def __init__(self, poll_interval=0.05):
+        self.poll_interval = poll_interval
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.saved = 0
+
+    def run(self, key, fn, on_token=None, check=None, personal=()):
+        """Return (fn(on_token) or the in-flight call's result, shared)
+
+        fn is called with an on_token callback when on_token is given, or
+        None. Waiting callers call check() every poll_interval so they can
+        give up on their own deadline or cancellation by raising. A leader's
+        error is shared too, except those of the personal exception types
+        (its own cancellation or deadline): then waiters try again.
+        """
+
+        output = _Output(on_token) if on_token else None
+        while True:
+            if output:
+                output.restart()
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self.calls += 1
+            if leader:
+                return self._lead(key, flight, fn, output), False
+
+            if output:
+                flight.join(output)
+            while not flight.done.wait(self.poll_interval):
+                if check:
+                    check()
+
+            error = flight.error
+            if error is not None:
+                if isinstance(error, personal) or not isinstance(error, Exception):
+                    continue
+                raise error
+
+            with self._lock:
+                self.saved += 1
+            streamed = "".join(flight.parts)
+            if output and len(flight.result) > len(streamed):
+                # The leader was not streaming, or stopped short of the end
+                output(flight.result[len(streamed) :])
+            return flight.result, True
+
+    def _lead(self, key, flight, fn, on_token):
+        if on_token:
+            flight.listeners.append(on_token)
+        try:
+            flight.result = fn(flight.emit if on_token else None)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+from build_info import git_revision
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter, so nothing is already imported or cached
+FIRST_RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+started = time.perf_counter()
+at = AppTest.from_file("streamlit_app.py", default_timeout=60)
+at.run()
+first = time.perf_counter() - started
+started = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - started
+json.dump({"first_render": first, "rerun": rerun, "exceptions": len(at.exception)}, sys.stdout)
+"""
+
+
+def _isolated_env():
+    # Cold starts must not see caches or indexes left behind by earlier runs
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.update(
+        {
+            "LLM_CACHE_PATH": os.path.join(scratch, "cache.sqlite3"),
+            "NEAR_DUPLICATE_INDEX_PATH": os.path.join(scratch, "index.sqlite3"),
+            "METRICS_LOG_PATH": os.path.join(scratch, "calls.jsonl"),
+            "RUN_HISTORY_PATH": os.path.join(scratch, "history.sqlite3"),
+            "JOB_QUEUE_PATH": os.path.join(scratch, "jobs.sqlite3"),
+            "PYTHONPATH": APP_DIR,
+        }
+    )
+    return env
+
+
+def parse_importtime(stderr):
+    """{module: cumulative microseconds} from python -X importtime output"""
+
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:") :].split("|")
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue  # header row
+        name = fields[2].strip()
+        modules[name] = max(cumulative, modules.get(name, 0))
+    return modules
+
+
+def measure_import():
+    """Cumulative import time of streamlit_app and its top-level modules"""
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import streamlit_app"],
+        capture_output=True,
+        text=True,
+        cwd=APP_DIR,
+        env=_isolated_env(),
+    )
+    if completed.returncode:
+        raise RuntimeError(f"import streamlit_app failed:\n{completed.stderr}")
+    return parse_importtime(completed.stderr)
+
+
+def measure_first_render():
+    """Headless first script run and one rerun, as a new visitor triggers"""
+
+    completed = subprocess.run(
+        [sys.executable, "-c", FIRST_RENDER_SCRIPT],
+        capture_output=True,
+        text=True,
+        cwd=APP_DIR,
+        env=_isolated_env(),
+    )
+    if completed.returncode:
+        raise RuntimeError(f"Headless app run failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark cold-start import and first-render time of the app"
+    )
+    parser.add_argument("--output", default="startup_bench_output.json")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--top", type=int, default=15, help="Slowest imported modules to report"
+    )
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-first-render-ms", type=float)
+    parser.add_argument(
+        "--baseline", help="Earlier report to compare the medians against"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown against --baseline as a fraction (default: 0.2)",
+    )
+    args = parser.parse_args(argv)
+
+    import_ms, first_render_ms, rerun_ms, module_ms = [], [], [], {}
+    for run in range(1, args.runs + 1):
+        modules = measure_import()
+        import_ms.append(modules["streamlit_app"] / 1000)
+        for name, micros in modules.items():
+            module_ms.setdefault(name, []).append(micros / 1000)
+
+        render = measure_first_render()
+        if render["exceptions"]:
+            print("The app raised during the headless run", file=sys.stderr)
+            return 1
+        first_render_ms.append(render["first_render"] * 1000)
+        rerun_ms.append(render["rerun"] * 1000)
+        print(
+            f"[{run}/{args.runs}] import={import_ms[-1]:.0f}ms "
+            f"first_render={first_render_ms[-1]:.0f}ms rerun={rerun_ms[-1]:.0f}ms",
+            file=sys.stderr,
+        )
+
+    medians = {
+        "import_ms": round(statistics.median(import_ms), 1),
+        "first_render_ms": round(statistics.median(first_render_ms), 1),
+        "rerun_ms": round(statistics.median(rerun_ms), 1),
+    }
+    slowest = sorted(
+        ((name, statistics.median(times)) for name, times in module_ms.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "runs": args.runs,
+        },
+        "median": medians,
+        "samples": {
+            "import_ms": import_ms,
+            "first_render_ms": first_render_ms,
+            "rerun_ms": rerun_ms,
+        },
+        "slowest_imports_ms": {
+            name: round(ms, 1)
+            for name, ms in slowest[: args.top]
+            if name != "streamlit_app"
+        },
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(
+        f"import={medians['import_ms']}ms first_render={medians['first_render_ms']}ms "
+        f"rerun={medians['rerun_ms']}ms; wrote {args.output}",
+        file=sys.stderr,
+    )
+
+    limits = {
+        "import_ms": args.max_import_ms,
+        "first_render_ms": args.max_first_render_ms,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["median"]
+        for metric in limits:
+            allowed = baseline[metric] * (1 + args.max_regression)
+            limits[metric] = min(filter(None, (limits[metric], allowed)))
+
+    regressions = [
+        f"{metric} {medians[metric]} > {limit:.1f}"
+        for metric, limit in limits.items()
+        if limit is not None and medians[metric] > limit
+    ]
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
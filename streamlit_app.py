@@ -1,15 +1,151 @@
 import streamlit as st
-import openai
+import hashlib
 import json
-from typing import List, Dict
-import pandas as pd
-
-# Configure Streamlit page
-st.set_page_config(
-    page_title="Iraqi Remittance Segments - Social Media Reaction Simulator",
-    page_icon="📱",
-    layout="wide",
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import List, Dict, Literal
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from call_metrics import CallMetrics, CallRecord, estimate_cost
+from hedging import DeadlineExceeded, HedgeLost, HedgePolicy, quantile
+from job_queue import JobQueue, owner_of
+from model_router import ModelRouter
+from prefetcher import PrefetchCancelled, SpeculativePrefetcher
+from request_scheduler import RequestScheduler
+from response_cache import ResponseCache, make_cache_key
+from run_history import ENGAGEMENT_LEVELS, RunHistory
+from segment_catalog import SEGMENT_CATALOG_PATH, SegmentCatalog, load_catalog
+from single_flight import SingleFlight
+from token_counter import count_message_tokens, count_tokens
+from variant_tournament import split_variants, successive_halving
+
+# Upper bound on simultaneous OpenAI requests when fanning out across segments
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("MAX_CONCURRENT_REQUESTS", "6"))
+
+# Endpoint, connection pool and timeout settings for the shared OpenAI clients
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10")
 )
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "120"))
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_REQUEST_TIMEOUT = float(os.environ.get("OPENAI_REQUEST_TIMEOUT", "120"))
+# Wall-clock limit for one call including retries and hedges, and for a whole
+# Analyze run; whatever is unfinished at the page deadline is marked timed out
+OPENAI_CALL_DEADLINE = float(os.environ.get("OPENAI_CALL_DEADLINE", "90"))
+PAGE_DEADLINE_SECONDS = float(os.environ.get("PAGE_DEADLINE_SECONDS", "120"))
+# Hedging is opt-in: duplicates add load, which is what slows first tokens
+HEDGE_REQUESTS = os.environ.get("HEDGE_REQUESTS", "0") == "1"
+
+
+# Sample content suggestions based on Iraqi context
+SAMPLE_POSTS = [
+    "أرسل فلوس لأهلك بالعراق بسرعة وأمان! رسوم قليلة للطلاب. Send money home instantly! 🇮🇶💙",
+    "Support your family back home while building your future abroad. Fast, secure, affordable. 🏠❤️",
+    "من العراق للعالم - نربط المسافات بكل حوالة. From Iraq to the world - bridging distances. 🌍",
+    "Your success abroad means everything to family back home. Quick remittances for Iraqis worldwide. 🎓",
+    "Pay suppliers instantly. Grow your business. Iraq to global markets made simple. 💼🚀",
+    "Freelancers - get paid faster from international clients. USD to IQD in minutes. 💻💰",
+]
+
+# Default for the sidebar reuse slider; see similarity_index.py
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+# Results each session remembers across reruns; the oldest are dropped first
+MAX_REMEMBERED_RESULTS = int(os.environ.get("MAX_REMEMBERED_RESULTS", "200"))
+
+# Segments preselected in the multiselect
+DEFAULT_SEGMENTS = ["Iraqi Students Abroad", "Iraqi Workers Abroad"]
+
+# Parallel calls for deep analysis, which fans out one call per subsegment
+SUBSEGMENT_CONCURRENCY = int(os.environ.get("SUBSEGMENT_CONCURRENCY", "12"))
+
+# Steps each background job runs at once; JOB_WORKERS jobs run side by side
+JOB_STEP_CONCURRENCY = int(
+    os.environ.get("JOB_STEP_CONCURRENCY", str(MAX_CONCURRENT_REQUESTS))
+)
+# How often the jobs panel refreshes while a job is queued or running
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "2"))
+# Step name prefix of a Full Campaign job's Arabic adaptations
+ARABIC_STEP = "Arabic: "
+
+# Runs per page of the history view
+HISTORY_PAGE_SIZE = 50
+
+# Segment detail expanders rendered in the sidebar at once
+SEGMENT_DETAILS_LIMIT = 10
+
+# Static tips panel; kept at module level so reruns only send one element
+MARKETING_TIPS = """
+### Segment-Specific Strategy:
+
+**🎓 Iraqi Students Abroad**
+- Focus on family emotional connection and educational dreams
+- Highlight fast transfers for tuition deadlines
+- Use mix of Arabic and English to show cultural bridge
+- Emphasize security and parental peace of mind
+
+**👷 Iraqi Workers Abroad**
+- Stress reliability and family obligation fulfillment
+- Show impact on family back home (medical care, education)
+- Use traditional values and community pride messaging
+- Highlight low fees and delivery confirmation
+
+**🏠 Iraqi Diaspora Community**
+- Focus on cultural preservation and community events
+- Emphasize long-term relationships and trust
+- Show support for cultural institutions and traditions
+- Use community testimonials and success stories
+
+**💻 Freelancers & Remote Workers**
+- Highlight speed of USD access and conversion
+- Focus on business growth and global opportunities
+- Emphasize modern, tech-forward solutions
+- Show integration with freelance platforms
+
+**🏢 Business Owners & Importers**
+- Stress efficiency and business continuity
+- Focus on supplier relationships and growth
+- Highlight compliance and security features
+- Show cost savings and time benefits
+
+**🛒 Digital Entrepreneurs**
+- Focus on scaling online business and market access
+- Highlight payment processing and international sales
+- Emphasize modern solutions for modern businesses
+- Show integration with e-commerce platforms
+
+### Cultural Considerations:
+- **Family Values**: Always emphasize family support and connection
+- **Trust**: Use testimonials from Iraqi community members
+- **Religious Sensitivity**: Ensure halal/Islamic compliance messaging
+- **Language**: Mix Arabic phrases with English for authentic feel
+- **Visuals**: Use Iraqi flag colors, cultural symbols, family imagery
+- **Timing**: Consider Iraqi holidays, Ramadan, and cultural events
+"""
+
+ANALYSIS_TYPES = ["Reaction Analysis", "Content Enhancement", "Iraqi Arabic Adaptation"]
+
+# Pipeline mode running reactions, enhancement and Arabic adaptation of the
+# enhanced post as one dependency graph; offered next to ANALYSIS_TYPES
+FULL_CAMPAIGN = "Full Campaign"
+
+# LLM function behind each analysis type, which decides its model route
+ANALYSIS_FUNCTIONS = {
+    "Reaction Analysis": "analyze_segment_reaction",
+    "Content Enhancement": "enhance_content_for_segments",
+    "Iraqi Arabic Adaptation": "generate_iraqi_arabic_content",
+}
 
 # Define comprehensive audience segments based on your document
 AUDIENCE_SEGMENTS = {
@@ -273,149 +409,2483 @@ AUDIENCE_SEGMENTS = {
 }
 
 
-def analyze_segment_reaction(segment_name, segment_info, content, api_key):
-    """Analyze how a specific segment would react to content"""
+@dataclass(frozen=True)
+class LLMOptions:
+    """Per-run settings passed from the sidebar into every LLM call"""
+
+    use_cache: bool = True
+    base_url: str = OPENAI_BASE_URL
+    request_timeout: float = OPENAI_REQUEST_TIMEOUT
+    session_id: str = None
+    # Set by the prefetcher: speculative calls are budgeted and reported
+    # apart; they, like background jobs, abort as soon as cancel_event is set
+    speculative: bool = False
+    cancel_event: threading.Event = None
+    hedge: bool = HEDGE_REQUESTS
+    call_deadline: float = OPENAI_CALL_DEADLINE
+    # time.monotonic() by which the whole Analyze run must finish
+    deadline: float = None
+    # Skip the cascade's fast tier and always use the large model
+    high_quality: bool = False
+
+
+DEFAULT_OPTIONS = LLMOptions()
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Process-wide response cache shared by every session"""
+    return ResponseCache()
+
+
+def _http2_available():
+    """HTTP/2 needs the optional h2 package"""
+
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key, base_url=None):
+    """Shared OpenAI client per API key and endpoint with a pooled keep-alive transport"""
+
+    # Deferred to the first call: openai and httpx add ~0.5 s to a cold start
+    import httpx
+    import openai
+
+    http_client = httpx.Client(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(OPENAI_REQUEST_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    )
+    # Retries are owned by the request scheduler, not the SDK
+    return openai.OpenAI(
+        api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_post_index():
+    """Process-wide near-duplicate index of analyzed posts"""
+
+    # NumPy is only imported once a result is stored or looked up
+    from similarity_index import NearDuplicateIndex
+
+    return NearDuplicateIndex()
+
+
+@st.cache_resource(show_spinner=False)
+def get_run_history():
+    """Process-wide searchable store of every analysis result"""
+    return RunHistory()
+
+
+@st.cache_resource(show_spinner=False)
+def get_call_metrics():
+    """Process-wide per-call latency, token and cost metrics"""
+    return CallMetrics()
+
+
+@st.cache_resource(show_spinner=False)
+def get_request_scheduler():
+    """Process-wide rate-limit scheduler that every LLM call goes through"""
+    return RequestScheduler()
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_router():
+    """Process-wide model choice per LLM function, from MODEL_ROUTES"""
+    return ModelRouter()
+
+
+@st.cache_resource(show_spinner=False)
+def get_hedge_policy():
+    """Process-wide hedging thresholds and the threads hedged calls run on"""
+    return HedgePolicy()
+
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight():
+    """Process-wide coalescing of identical in-flight LLM calls"""
+    return SingleFlight()
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Process-wide persistent queue and worker pool for background analyses"""
+    return JobQueue(run_job)
 
-    prompt = f"""
-    You are an expert in social media marketing and audience analysis for Iraqi remittance segments. Analyze how the following audience segment would react to a social media post.
-
-    AUDIENCE SEGMENT: {segment_name}
-    Description: {segment_info['description']}
-    Age Range: {segment_info['age_range']}
-    Subsegments: {', '.join(segment_info['subsegments'])}
-    Key Motivations: {', '.join(segment_info['motivations'])}
-    Key Traits: {', '.join(segment_info['traits'])}
-    Main Concerns: {', '.join(segment_info['key_concerns'])}
-    Preferred Platforms: {', '.join(segment_info['platforms'])}
-
-    SOCIAL MEDIA CONTENT TO ANALYZE:
-    "{content}"
-
-    Please provide a detailed analysis in the following format:
-
-    ENGAGEMENT LEVEL: [High/Medium/Low]
-    EMOTIONAL RESPONSE: [Positive/Neutral/Negative/Mixed]
-    
-    REACTION ANALYSIS:
-    [3-4 sentences explaining how this segment would likely react to the content, considering their motivations and concerns]
-    
-    KEY TRIGGERS:
-    [List 3-4 specific elements that would trigger positive or negative responses for this segment]
-    
-    SEGMENT-SPECIFIC INSIGHTS:
-    [2-3 insights about why this particular Iraqi segment would react this way, considering their cultural and financial context]
-    
-    IMPROVEMENT SUGGESTIONS:
-    [3-4 specific suggestions to make the content more engaging for this segment]
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher():
+    """Process-wide background worker for speculative analyses"""
+    return SpeculativePrefetcher()
+
+
+@st.cache_resource(show_spinner=False)
+def _builtin_catalog():
+    """The hard-coded AUDIENCE_SEGMENTS, indexed like an external catalog"""
+    return SegmentCatalog.from_mapping(AUDIENCE_SEGMENTS)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_segment_catalog(path, mtime):
+    # mtime is part of the cache key, so saving the file reloads the catalog
+    return load_catalog(path)
+
+
+def get_segment_catalog():
+    """External catalog from SEGMENT_CATALOG_PATH, or the built-in segments"""
+
+    if not SEGMENT_CATALOG_PATH:
+        return _builtin_catalog()
+    return _load_segment_catalog(
+        SEGMENT_CATALOG_PATH, os.path.getmtime(SEGMENT_CATALOG_PATH)
+    )
+
+
+def segment_profile(segment_name):
+    """Profile of a segment in the active catalog"""
+    return get_segment_catalog().segments[segment_name]
+
+
+def segment_overview_markdown(name, catalog):
+    """Sidebar summary of one segment as a single markdown block"""
+
+    info = catalog.segments[name]
+    return "\n\n".join(
+        [
+            f"**Description:** {info['description']}",
+            f"**Subsegments:** {', '.join(info['subsegments'][:3])}...",
+            f"**Key Motivations:** {', '.join(info['motivations'][:2])}...",
+            f"**Preferred Platforms:** {', '.join(info['platforms'][:3])}...",
+        ]
+    )
+
+
+def _chat_completion(
+    function,
+    messages,
+    api_key,
+    max_tokens,
+    temperature=0.7,
+    model=None,
+    options=None,
+    on_token=None,
+    validate=None,
+    accept=None,
+    stop=None,
+):
+    """Run a chat completion, serving repeats from the response cache
+
+    When on_token is given the completion is streamed and each text delta is
+    passed to it as it arrives; the full text is still returned and cached.
+    validate(content) may raise to reject a completion before it is cached.
+    stop sequences end generation early and are not part of the text.
+
+    Without an explicit model the call is routed by function name. In a
+    cascade the fast model answers first and the large model is asked only
+    when validate or accept(content) raises ValueError for that answer, or
+    the fast model's call fails. Drafts are not streamed: a cascade delivers
+    its answer to on_token in one piece.
     """
 
+    options = options or DEFAULT_OPTIONS
+    if model is not None:
+        return _recorded_completion(
+            function,
+            messages,
+            api_key,
+            max_tokens,
+            temperature,
+            model,
+            options,
+            on_token,
+            validate,
+            stop=stop,
+        )
+
+    router = get_model_router()
+    *drafts, final = router.tiers(function, options.high_quality)
+
+    def check(content):
+        if validate:
+            validate(content)
+        if accept:
+            accept(content)
+
+    cache = get_response_cache()
+    for tier, model in drafts:
+        # A draft rejected for this exact request is not paid for again
+        rejected_key = make_cache_key(
+            f"{function}:rejected",
+            model,
+            temperature,
+            max_tokens,
+            json.dumps(messages, ensure_ascii=False),
+            base_url=options.base_url,
+        )
+        if options.use_cache and cache.get(rejected_key) is not None:
+            continue
+        try:
+            # Drafts are not streamed, so a rejected one never reaches the UI
+            content = _recorded_completion(
+                function,
+                messages,
+                api_key,
+                max_tokens,
+                temperature,
+                model,
+                options,
+                None,
+                check,
+                tier=tier,
+                escalates=True,
+                stop=stop,
+            )
+        except (PrefetchCancelled, DeadlineExceeded):
+            raise
+        except ValueError as e:
+            cache.set(rejected_key, str(e), function=function, model=model)
+            continue
+        except Exception:
+            # e.g. the fast model is not enabled for this account, or kept
+            # failing through retries; the next tier may still answer
+            continue
+        if on_token:
+            on_token(content)
+        return content
+
+    tier, model = final
+    return _recorded_completion(
+        function,
+        messages,
+        api_key,
+        max_tokens,
+        temperature,
+        model,
+        options,
+        on_token,
+        validate,
+        tier=tier,
+        stop=stop,
+    )
+
+
+def _recorded_completion(
+    function,
+    messages,
+    api_key,
+    max_tokens,
+    temperature,
+    model,
+    options,
+    on_token,
+    validate,
+    tier=None,
+    escalates=False,
+    stop=None,
+):
+    """One model's completion, measured into a CallRecord
+
+    With escalates set, any failure other than cancellation or a deadline
+    marks the call as escalated to the next tier of the cascade.
+    """
+
+    record = CallRecord(
+        function=function,
+        model=model,
+        session_id=options.session_id,
+        speculative=options.speculative,
+        tier=tier,
+    )
+    started = time.perf_counter()
     try:
-        client = openai.OpenAI(api_key=api_key)
+        return _instrumented_completion(
+            record,
+            started,
+            function,
+            messages,
+            api_key,
+            max_tokens,
+            temperature,
+            model,
+            options,
+            on_token,
+            validate,
+            stop,
+        )
+    except Exception as e:
+        record.error = str(e)
+        record.escalated = escalates and not isinstance(
+            e, (PrefetchCancelled, DeadlineExceeded)
+        )
+        raise
+    finally:
+        record.wall_seconds = time.perf_counter() - started
+        if record.ttft_seconds is None and record.error is None:
+            # Blocking calls and cache hits deliver every token at once
+            record.ttft_seconds = record.wall_seconds
+        get_call_metrics().record(record)
+
+
+def _instrumented_completion(
+    record,
+    started,
+    function,
+    messages,
+    api_key,
+    max_tokens,
+    temperature,
+    model,
+    options,
+    on_token,
+    validate,
+    stop=None,
+):
+    cache = get_response_cache()
+    key = make_cache_key(
+        function,
+        model,
+        temperature,
+        max_tokens,
+        json.dumps(messages, ensure_ascii=False),
+        base_url=options.base_url,
+    )
+
+    prompt_tokens = count_message_tokens(messages)
+    record.static_prompt_tokens = (
+        count_tokens(messages[0]["content"]) if len(messages) > 1 else 0
+    )
+    record.variable_prompt_tokens = prompt_tokens - record.static_prompt_tokens
+
+    if options.use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            record.cache_hit = True
+            if on_token:
+                on_token(cached)
+            return cached
+
+    deadline = time.monotonic() + options.call_deadline
+    if options.deadline is not None:
+        deadline = min(deadline, options.deadline)
+
+    def check_waiting():
+        if options.cancel_event is not None and options.cancel_event.is_set():
+            raise PrefetchCancelled("Inputs changed")
+        if time.monotonic() >= deadline:
+            raise DeadlineExceeded(
+                f"Timed out after {time.perf_counter() - started:.0f}s"
+            )
+
+    # Sessions asking the same thing at the same time share one upstream call;
+    # the API key is part of the key so nobody receives another key's errors
+    api_key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    content, record.coalesced = get_single_flight().run(
+        (key, options.base_url, api_key_hash),
+        partial(
+            _upstream_completion,
+            record,
+            started,
+            function,
+            messages,
+            api_key,
+            max_tokens,
+            temperature,
+            model,
+            options,
+            validate,
+            key,
+            prompt_tokens,
+            deadline,
+            stop,
+        ),
+        on_token=on_token,
+        check=check_waiting,
+        personal=(PrefetchCancelled, DeadlineExceeded),
+    )
+    return content
+
+
+def _upstream_completion(
+    record,
+    started,
+    function,
+    messages,
+    api_key,
+    max_tokens,
+    temperature,
+    model,
+    options,
+    validate,
+    key,
+    prompt_tokens,
+    deadline,
+    stop_sequences,
+    on_token,
+):
+    cancel_event = options.cancel_event
+    if options.speculative and not get_prefetcher().spend(prompt_tokens + max_tokens):
+        raise PrefetchCancelled("Speculative token budget exhausted")
+
+    client = get_openai_client(api_key, options.base_url)
+    import httpx  # already loaded by get_openai_client
+
+    usage = {}
+
+    def remaining_time():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(
+                f"Timed out after {time.perf_counter() - started:.0f}s"
+            )
+        return remaining
+
+    def request(stop=None, claim=None):
+        if cancel_event is not None and cancel_event.is_set():
+            raise PrefetchCancelled("Inputs changed")
+        remaining = remaining_time()
+
+        # Speculative and hedged calls stream too, so they can be stopped
+        # mid-response and hedges can race on the first token
+        stream = on_token is not None or cancel_event is not None or claim is not None
+        extra = {"stream_options": {"include_usage": True}} if stream else {}
+        if stop_sequences:
+            extra["stop"] = stop_sequences
         response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=stream,
+            timeout=httpx.Timeout(
+                min(options.request_timeout, remaining),
+                connect=min(OPENAI_CONNECT_TIMEOUT, remaining),
+            ),
+            **extra,
+        )
+
+        if not stream:
+            usage["usage"] = response.usage
+            return response.choices[0].message.content
+
+        parts = []
+        try:
+            for chunk in response:
+                if stop is not None and stop.is_set():
+                    response.close()
+                    raise HedgeLost()
+                if time.monotonic() >= deadline:
+                    response.close()
+                    remaining_time()
+                if chunk.usage:
+                    usage["usage"] = chunk.usage
+                if not chunk.choices:
+                    continue
+                if cancel_event is not None and cancel_event.is_set():
+                    response.close()
+                    raise PrefetchCancelled("Inputs changed")
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        if claim is not None and not claim():
+                            response.close()
+                            raise HedgeLost()
+                        record.ttft_seconds = time.perf_counter() - started
+                    parts.append(delta)
+                    if on_token:
+                        on_token(delta)
+        except (PrefetchCancelled, HedgeLost, DeadlineExceeded):
+            raise
+        except Exception as e:
+            if parts:
+                # Tokens already reached the UI; a retry would duplicate them
+                raise RuntimeError(f"Stream interrupted: {str(e)}") from e
+            raise
+        return "".join(parts)
+
+    def count_retry(attempt, exc):
+        record.retries += 1
+
+    # TPM limits count the prompt plus the whole completion budget
+    call = partial(
+        get_request_scheduler().call,
+        estimated_tokens=prompt_tokens + max_tokens,
+        on_retry=count_retry,
+    )
+    if options.hedge and not options.speculative:
+        outcome = get_hedge_policy().run(
+            (function, model), lambda stop, claim: call(partial(request, stop, claim))
+        )
+        content = outcome.result
+        record.hedged = outcome.hedged
+        record.hedge_won = outcome.hedge_won
+        record.unhedged_ttft_seconds = outcome.unhedged_ttft
+    else:
+        content = call(request)
+
+    reported = usage.get("usage")
+    details = getattr(reported, "prompt_tokens_details", None)
+    record.prompt_tokens = getattr(reported, "prompt_tokens", None) or prompt_tokens
+    record.completion_tokens = getattr(
+        reported, "completion_tokens", None
+    ) or count_tokens(content)
+    record.cached_prompt_tokens = getattr(details, "cached_tokens", None) or 0
+    record.cost_usd = estimate_cost(
+        model,
+        record.prompt_tokens,
+        record.completion_tokens,
+        record.cached_prompt_tokens,
+    )
+
+    if validate:
+        validate(content)
+
+    # Bypassing only skips the lookup; fresh results still refresh the cache
+    get_response_cache().set(key, content, function=function, model=model)
+    return content
+
+
+REACTION_INSTRUCTIONS = """You are an expert in social media marketing and audience analysis for Iraqi remittance segments. Analyze how the audience segment described below would react to the social media post in the user message.
+
+Please provide a detailed analysis in the following format:
+
+ENGAGEMENT LEVEL: [High/Medium/Low]
+EMOTIONAL RESPONSE: [Positive/Neutral/Negative/Mixed]
+
+REACTION ANALYSIS:
+[3-4 sentences explaining how this segment would likely react to the content, considering their motivations and concerns]
+
+KEY TRIGGERS:
+[List 3-4 specific elements that would trigger positive or negative responses for this segment]
+
+SEGMENT-SPECIFIC INSIGHTS:
+[2-3 insights about why this particular Iraqi segment would react this way, considering their cultural and financial context]
+
+IMPROVEMENT SUGGESTIONS:
+[3-4 specific suggestions to make the content more engaging for this segment]
+"""
+
+COMBINED_REACTION_INSTRUCTIONS = """You are an expert in social media marketing and audience analysis for Iraqi remittance segments. Analyze how each of the audience segments described below would react to the social media post in the user message.
+
+Respond with ONLY a JSON object keyed by segment name. Each value must be an object with these fields:
+- "engagement_level": one of "High", "Medium", "Low"
+- "emotional_response": one of "Positive", "Neutral", "Negative", "Mixed"
+- "reaction_analysis": 3-4 sentences explaining how this segment would likely react, considering their motivations and concerns
+- "key_triggers": list of 3-4 specific elements that would trigger positive or negative responses
+- "segment_specific_insights": list of 2-3 insights about why this Iraqi segment would react this way, considering their cultural and financial context
+- "improvement_suggestions": list of 3-4 specific suggestions to make the content more engaging for this segment
+"""
+
+SUBSEGMENT_REACTION_INSTRUCTIONS = """You are an expert in social media marketing and audience analysis for Iraqi remittance segments. Predict how the named subsegment of the audience segment below would react to the social media post in the user message.
+
+Respond with ONLY a JSON object with these fields:
+- "engagement_level": one of "High", "Medium", "Low"
+- "emotional_response": one of "Positive", "Neutral", "Negative", "Mixed"
+- "summary": 1-2 sentences on how this subsegment specifically would react
+- "key_triggers": list of up to 3 short phrases naming what drives the reaction
+"""
+
+VARIANT_SCORE_INSTRUCTIONS = """You are an expert in social media marketing for Iraqi remittance segments. Rate how well the social media post in the user message would perform with the audience segment below.
+
+Respond with ONLY a JSON object with these fields:
+- "score": integer from 1 (ignored or resented) to 10 (eagerly shared)
+- "engagement_level": one of "High", "Medium", "Low"
+- "reason": one short sentence
+"""
+
+SCORES_INSTRUCTIONS = """Rate how the audience segment below would react to the social media post in the user message. Reply with one line of JSON and nothing else:
+{"engagement_level": "High|Medium|Low", "emotional_response": "Positive|Neutral|Negative|Mixed", "engagement_score": 0-100, "sentiment_score": 0-100, "top_trigger": "at most 6 words"}
+"""
+
+# Generation stops at the end of the flat JSON object, before any chatter
+SCORES_STOP = ["}"]
+
+ENHANCEMENT_INSTRUCTIONS = """You are a social media content strategist specializing in Iraqi remittance and financial services. Enhance the content in the user message to better appeal to the target Iraqi segments listed below.
+
+Consider the cultural context of Iraqi communities, remittance behaviors, and financial needs when enhancing the content.
+
+Please provide:
+
+ENHANCED CONTENT:
+[Improved version that appeals to the target segments, incorporating cultural nuances and specific pain points]
+
+ENHANCEMENT RATIONALE:
+[Explain specific changes made and how they address each segment's motivations and concerns]
+
+IRAQI ARABIC HOOKS:
+[3-4 short, catchy phrases in Iraqi Arabic dialect that would resonate with these segments]
+
+PLATFORM-SPECIFIC ADAPTATIONS:
+[Brief suggestions for how to adapt this content for WhatsApp, Instagram, Facebook, and Telegram]
+"""
+
+ARABIC_INSTRUCTIONS = """You are a native Iraqi Arabic speaker and social media expert specializing in remittance services. Create an Iraqi Arabic version of the English content in the user message for the target segment described below.
+
+Consider the cultural context, family values, and specific financial behaviors of this Iraqi segment.
+
+Please provide:
+
+IRAQI ARABIC CONTENT:
+[Content in Iraqi Arabic dialect that authentically resonates with this segment's values and concerns]
+
+CULTURAL ADAPTATION NOTES:
+[Explain specific cultural elements incorporated and why they're important for this audience]
+
+EMOTIONAL TRIGGERS:
+[Identify 2-3 emotional appeals that work specifically for Iraqi culture and this segment]
+
+ENGAGEMENT TIPS:
+[Specific tips for using this content effectively with Iraqi audiences on social media]
+"""
+
+# Headings a cascade draft must contain before it is accepted in place of
+# the large model's answer
+REACTION_SECTIONS = (
+    "REACTION ANALYSIS",
+    "KEY TRIGGERS",
+    "SEGMENT-SPECIFIC INSIGHTS",
+    "IMPROVEMENT SUGGESTIONS",
+)
+ENHANCEMENT_SECTIONS = (
+    "ENHANCED CONTENT",
+    "ENHANCEMENT RATIONALE",
+    "IRAQI ARABIC HOOKS",
+    "PLATFORM-SPECIFIC ADAPTATIONS",
+)
+ARABIC_SECTIONS = (
+    "IRAQI ARABIC CONTENT",
+    "CULTURAL ADAPTATION NOTES",
+    "EMOTIONAL TRIGGERS",
+    "ENGAGEMENT TIPS",
+)
+_ENGAGEMENT_LEVEL = re.compile(r"ENGAGEMENT LEVEL\W*(High|Medium|Low)\b", re.IGNORECASE)
+_EMOTIONAL_RESPONSE = re.compile(
+    r"EMOTIONAL RESPONSE\W*(Positive|Neutral|Negative|Mixed)\b", re.IGNORECASE
+)
+_ARABIC_LETTERS = re.compile("[\u0600-\u06ff]")
+
+
+def require_sections(sections, content):
+    """Raise ValueError naming any section heading missing from content"""
+
+    upper = content.upper()
+    missing = [section for section in sections if section not in upper]
+    if missing:
+        raise ValueError(f"Response is missing {', '.join(missing)}")
+
+
+def _check_reaction(content):
+    if not _ENGAGEMENT_LEVEL.search(content):
+        raise ValueError("Response has no parsable ENGAGEMENT LEVEL")
+    if not _EMOTIONAL_RESPONSE.search(content):
+        raise ValueError("Response has no parsable EMOTIONAL RESPONSE")
+    require_sections(REACTION_SECTIONS, content)
+
+
+def _check_arabic(content):
+    require_sections(ARABIC_SECTIONS, content)
+    if not _ARABIC_LETTERS.search(content):
+        raise ValueError("Response contains no Arabic text")
+
+
+def _segment_persona(segment_name, segment_info):
+    """Full segment profile used by reaction prompts"""
+
+    return (
+        f"AUDIENCE SEGMENT: {segment_name}\n"
+        f"Description: {segment_info['description']}\n"
+        f"Age Range: {segment_info['age_range']}\n"
+        f"Subsegments: {', '.join(segment_info['subsegments'])}\n"
+        f"Key Motivations: {', '.join(segment_info['motivations'])}\n"
+        f"Key Traits: {', '.join(segment_info['traits'])}\n"
+        f"Main Concerns: {', '.join(segment_info['key_concerns'])}\n"
+        f"Preferred Platforms: {', '.join(segment_info['platforms'])}\n"
+    )
+
+
+def _segment_brief(segment_name, segment_info):
+    """Short segment profile used by enhancement and Arabic prompts"""
+
+    return (
+        f"{segment_name}:\n"
+        f"- Description: {segment_info['description']}\n"
+        f"- Key Motivations: {', '.join(segment_info['motivations'][:3])}\n"
+        f"- Key Concerns: {', '.join(segment_info['key_concerns'][:3])}\n"
+    )
+
+
+# Persona blocks are rendered once so every prompt prefix is byte-identical
+SEGMENT_PERSONAS = {
+    name: _segment_persona(name, info) for name, info in AUDIENCE_SEGMENTS.items()
+}
+SEGMENT_BRIEFS = {
+    name: _segment_brief(name, info) for name, info in AUDIENCE_SEGMENTS.items()
+}
+REACTION_PREFIXES = {
+    name: f"{REACTION_INSTRUCTIONS}\n{persona}"
+    for name, persona in SEGMENT_PERSONAS.items()
+}
+ARABIC_PREFIXES = {
+    name: f"{ARABIC_INSTRUCTIONS}\nTARGET SEGMENT:\n{brief}"
+    for name, brief in SEGMENT_BRIEFS.items()
+}
+
+
+def _persona_for(segment_name, segment_info):
+    if AUDIENCE_SEGMENTS.get(segment_name) == segment_info:
+        return SEGMENT_PERSONAS[segment_name]
+    return _segment_persona(segment_name, segment_info)
+
+
+def _brief_for(segment_name, segment_info):
+    if AUDIENCE_SEGMENTS.get(segment_name) == segment_info:
+        return SEGMENT_BRIEFS[segment_name]
+    return _segment_brief(segment_name, segment_info)
+
+
+def build_messages(prefix, variable):
+    """Static instructions and personas first, the variable post text last"""
+
+    return [
+        {"role": "system", "content": prefix},
+        {"role": "user", "content": variable},
+    ]
+
+
+def analyze_segment_reaction(
+    segment_name, segment_info, content, api_key, options=None, on_token=None
+):
+    """Analyze how a specific segment would react to content"""
+
+    if AUDIENCE_SEGMENTS.get(segment_name) == segment_info:
+        prefix = REACTION_PREFIXES[segment_name]
+    else:
+        prefix = (
+            f"{REACTION_INSTRUCTIONS}\n{_segment_persona(segment_name, segment_info)}"
+        )
+
+    messages = build_messages(prefix, f'SOCIAL MEDIA CONTENT TO ANALYZE:\n"{content}"')
+
+    try:
+        return _chat_completion(
+            "analyze_segment_reaction",
+            messages,
+            api_key,
             max_tokens=700,
-            temperature=0.7,
+            options=options,
+            on_token=on_token,
+            accept=_check_reaction,
         )
-        return response.choices[0].message.content
     except Exception as e:
         return f"Error: {str(e)}"
 
 
-def enhance_content_for_segments(original_content, selected_segments, api_key):
-    """Enhance content for selected segments"""
+class SegmentReaction(BaseModel):
+    """Structured reaction verdict for one segment, mirroring the prose sections"""
 
-    segments_info = ""
-    for segment in selected_segments:
-        info = AUDIENCE_SEGMENTS[segment]
-        segments_info += f"\n{segment}:\n- Description: {info['description']}\n- Motivations: {', '.join(info['motivations'][:3])}\n- Key Concerns: {', '.join(info['key_concerns'][:3])}\n"
+    engagement_level: Literal["High", "Medium", "Low"]
+    emotional_response: Literal["Positive", "Neutral", "Negative", "Mixed"]
+    reaction_analysis: str
+    key_triggers: List[str]
+    segment_specific_insights: List[str]
+    improvement_suggestions: List[str]
 
-    prompt = f"""
-    You are a social media content strategist specializing in Iraqi remittance and financial services. Enhance the following content to better appeal to these Iraqi segments:
+    def to_markdown(self):
+        """Render in the same layout as the single-segment prose analysis"""
 
-    ORIGINAL CONTENT:
-    "{original_content}"
+        def bullets(items):
+            return "\n".join(f"- {item}" for item in items)
+
+        return (
+            f"ENGAGEMENT LEVEL: {self.engagement_level}\n\n"
+            f"EMOTIONAL RESPONSE: {self.emotional_response}\n\n"
+            f"**REACTION ANALYSIS:**\n\n{self.reaction_analysis}\n\n"
+            f"**KEY TRIGGERS:**\n\n{bullets(self.key_triggers)}\n\n"
+            f"**SEGMENT-SPECIFIC INSIGHTS:**\n\n{bullets(self.segment_specific_insights)}\n\n"
+            f"**IMPROVEMENT SUGGESTIONS:**\n\n{bullets(self.improvement_suggestions)}"
+        )
+
+
+_COMBINED_REACTIONS = TypeAdapter(Dict[str, SegmentReaction])
 
-    TARGET SEGMENTS:
-    {segments_info}
 
-    Consider the cultural context of Iraqi communities, remittance behaviors, and financial needs when enhancing the content.
+def _extract_json_object(text):
+    """Pull the outermost JSON object out of a completion, ignoring code fences"""
 
-    Please provide:
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("response did not contain a JSON object")
+    return json.loads(text[start : end + 1])
 
-    ENHANCED CONTENT:
-    [Improved version that appeals to the target segments, incorporating cultural nuances and specific pain points]
 
-    ENHANCEMENT RATIONALE:
-    [Explain specific changes made and how they address each segment's motivations and concerns]
+def _parse_combined_reactions(response):
+    return _COMBINED_REACTIONS.validate_python(_extract_json_object(response))
 
-    IRAQI ARABIC HOOKS:
-    [3-4 short, catchy phrases in Iraqi Arabic dialect that would resonate with these segments]
 
-    PLATFORM-SPECIFIC ADAPTATIONS:
-    [Brief suggestions for how to adapt this content for WhatsApp, Instagram, Facebook, and Telegram]
+def analyze_segments_combined(segment_names, content, api_key, options=None):
+    """Analyze several segments' reactions in one request with structured JSON output
+
+    Returns {segment_name: markdown_or_error} so callers can render it exactly
+    like per-segment analyze_segment_reaction results.
     """
 
+    profiles = "\n".join(
+        _persona_for(name, segment_profile(name)) for name in segment_names
+    )
+    prefix = (
+        f"{COMBINED_REACTION_INSTRUCTIONS}\n{profiles}\n"
+        f"Use exactly these segment names as keys: "
+        f"{json.dumps(segment_names, ensure_ascii=False)}\n"
+    )
+    messages = build_messages(prefix, f'SOCIAL MEDIA CONTENT TO ANALYZE:\n"{content}"')
+
     try:
-        client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=800,
-            temperature=0.7,
+        response = _chat_completion(
+            "analyze_segments_combined",
+            messages,
+            api_key,
+            max_tokens=min(4000, 500 * len(segment_names)),
+            options=options,
+            validate=_parse_combined_reactions,
         )
-        return response.choices[0].message.content
+        reactions = _parse_combined_reactions(response)
+    except (ValueError, ValidationError) as e:
+        error = f"Error: Could not parse combined analysis: {str(e)}"
+        return {name: error for name in segment_names}
     except Exception as e:
-        return f"Error: {str(e)}"
+        return {name: f"Error: {str(e)}" for name in segment_names}
 
+    return {
+        name: (
+            reactions[name].to_markdown()
+            if name in reactions
+            else "Error: Combined analysis omitted this segment"
+        )
+        for name in segment_names
+    }
 
-def generate_iraqi_arabic_content(english_content, segment_name, api_key):
-    """Generate Iraqi Arabic version of content"""
 
-    segment_info = AUDIENCE_SEGMENTS[segment_name]
+class SubsegmentReaction(BaseModel):
+    """Compact reaction verdict for one subsegment in deep analysis"""
+
+    engagement_level: Literal["High", "Medium", "Low"]
+    emotional_response: Literal["Positive", "Neutral", "Negative", "Mixed"]
+    summary: str
+    key_triggers: List[str] = []
+
 
-    prompt = f"""
-    You are a native Iraqi Arabic speaker and social media expert specializing in remittance services. Create an Iraqi Arabic version of this content for {segment_name}.
+_SUBSEGMENT_REACTION = TypeAdapter(SubsegmentReaction)
 
-    ENGLISH CONTENT:
-    "{english_content}"
+ENGAGEMENT_SCORES = {"Low": 1, "Medium": 2, "High": 3}
 
-    TARGET SEGMENT: {segment_name}
-    Description: {segment_info['description']}
-    Key Motivations: {', '.join(segment_info['motivations'][:3])}
-    Key Concerns: {', '.join(segment_info['key_concerns'][:3])}
 
-    Consider the cultural context, family values, and specific financial behaviors of this Iraqi segment.
+def _parse_subsegment_reaction(response):
+    return _SUBSEGMENT_REACTION.validate_python(_extract_json_object(response))
 
-    Please provide:
 
-    IRAQI ARABIC CONTENT:
-    [Content in Iraqi Arabic dialect that authentically resonates with this segment's values and concerns]
+def analyze_subsegment_reaction(
+    segment_name, segment_info, subsegment, content, api_key, options=None
+):
+    """Short JSON reaction verdict for one subsegment of a segment"""
 
-    CULTURAL ADAPTATION NOTES:
-    [Explain specific cultural elements incorporated and why they're important for this audience]
+    # Instructions, segment brief and post are shared by every subsegment of
+    # the segment; only the trailing subsegment line differs between calls
+    messages = build_messages(
+        f"{SUBSEGMENT_REACTION_INSTRUCTIONS}\n"
+        f"AUDIENCE SEGMENT:\n{_brief_for(segment_name, segment_info)}",
+        f'SOCIAL MEDIA CONTENT TO ANALYZE:\n"{content}"\n\nSUBSEGMENT: {subsegment}',
+    )
+
+    try:
+        return _chat_completion(
+            "analyze_subsegment_reaction",
+            messages,
+            api_key,
+            max_tokens=200,
+            options=options,
+            validate=_parse_subsegment_reaction,
+        )
+    except Exception as e:
+        return f"Error: {str(e)}"
 
-    EMOTIONAL TRIGGERS:
-    [Identify 2-3 emotional appeals that work specifically for Iraqi culture and this segment]
 
-    ENGAGEMENT TIPS:
-    [Specific tips for using this content effectively with Iraqi audiences on social media]
+def reduce_subsegment_reactions(results, total=None):
+    """Merge {subsegment: result} into one segment verdict, deterministically
+
+    Engagement is the level nearest the mean subsegment score, the emotional
+    response is the clear majority (otherwise Mixed), and subsegments a full
+    engagement level away from the mean or of opposite polarity are flagged
+    as diverging. Returns (markdown, failed_subsegments).
     """
 
+    reactions, failed = {}, []
+    for subsegment, result in results.items():
+        try:
+            if result.startswith("Error:"):
+                raise ValueError(result)
+            reactions[subsegment] = _parse_subsegment_reaction(result)
+        except (ValueError, ValidationError):
+            failed.append(subsegment)
+
+    total = total or len(results)
+    if not reactions:
+        if failed and len(failed) == total:
+            return "Error: Every subsegment analysis failed", failed
+        return "", failed
+
+    scores = {s: ENGAGEMENT_SCORES[r.engagement_level] for s, r in reactions.items()}
+    mean = sum(scores.values()) / len(scores)
+    engagement = min(ENGAGEMENT_SCORES, key=lambda l: abs(ENGAGEMENT_SCORES[l] - mean))
+
+    emotions = Counter(r.emotional_response for r in reactions.values()).most_common()
+    emotion = emotions[0][0]
+    if len(emotions) > 1 and emotions[0][1] == emotions[1][1]:
+        emotion = "Mixed"
+
+    opposite = {"Positive": "Negative", "Negative": "Positive"}.get(emotion)
+    diverging = [
+        s
+        for s, r in reactions.items()
+        if abs(scores[s] - mean) >= 1 or r.emotional_response == opposite
+    ]
+    triggers = Counter(
+        t.strip() for r in reactions.values() for t in r.key_triggers if t.strip()
+    ).most_common(4)
+
+    def cell(text):
+        return text.replace("|", "\\|").replace("\n", " ")
+
+    rows = "\n".join(
+        f"| {cell(s)} | {r.engagement_level} | {r.emotional_response} | {cell(r.summary)} |"
+        for s, r in reactions.items()
+    )
+    sections = [
+        f"ENGAGEMENT LEVEL: {engagement}",
+        f"EMOTIONAL RESPONSE: {emotion}",
+        "**SUBSEGMENT REACTIONS:**",
+        "| Subsegment | Engagement | Emotion | Summary |\n|---|---|---|---|\n" + rows,
+    ]
+    if triggers:
+        sections += [
+            "**KEY TRIGGERS:**",
+            "\n".join(f"- {t} ({n}/{len(reactions)})" for t, n in triggers),
+        ]
+    if diverging:
+        sections += [
+            "**⚠️ DIVERGING SUBSEGMENTS:**",
+            "\n".join(
+                f"- **{s}**: {reactions[s].engagement_level} engagement, "
+                f"{reactions[s].emotional_response} - {reactions[s].summary}"
+                for s in diverging
+            ),
+        ]
+
+    notes = []
+    if len(results) < total:
+        notes.append(f"⏳ {len(results)}/{total} subsegments analyzed")
+    if failed:
+        notes.append(f"Failed subsegments: {', '.join(failed)}")
+    if notes:
+        sections.append(f"_{' · '.join(notes)}_")
+    return "\n\n".join(sections), failed
+
+
+def analyze_segments_deep(
+    segment_names, content, api_key, options=None, max_workers=None
+):
+    """Deep Reaction Analysis: one short call per subsegment, reduced per segment
+
+    Yields (segment_name, markdown, complete, failed_subsegments) every time
+    a subsegment finishes, so callers can render partial verdicts.
+    """
+
+    subsegments = {
+        name: list(segment_profile(name)["subsegments"]) or [name]
+        for name in segment_names
+    }
+    tasks = {
+        (name, subsegment): partial(
+            analyze_subsegment_reaction,
+            name,
+            segment_profile(name),
+            subsegment,
+            content,
+            api_key,
+            options=options,
+        )
+        for name, names in subsegments.items()
+        for subsegment in names
+    }
+
+    results = {name: {} for name in segment_names}
+    for (name, subsegment), result in run_concurrently(
+        tasks,
+        max_workers or SUBSEGMENT_CONCURRENCY,
+        deadline=options.deadline if options else None,
+    ):
+        results[name][subsegment] = result
+        total = len(subsegments[name])
+        markdown, failed = reduce_subsegment_reactions(results[name], total)
+        yield name, markdown, len(results[name]) == total, failed
+
+
+class VariantScore(BaseModel):
+    """Compact verdict used to rank post variants in a tournament"""
+
+    score: int = Field(ge=1, le=10)
+    engagement_level: Literal["High", "Medium", "Low"]
+    reason: str = ""
+
+
+_VARIANT_SCORE = TypeAdapter(VariantScore)
+
+
+def _parse_variant_score(response):
+    return _VARIANT_SCORE.validate_python(_extract_json_object(response))
+
+
+def score_variant(variant, segment_name, segment_info, api_key, options=None):
+    """Short JSON 1-10 score of one post variant for one segment"""
+
+    messages = build_messages(
+        f"{VARIANT_SCORE_INSTRUCTIONS}\n"
+        f"AUDIENCE SEGMENT:\n{_brief_for(segment_name, segment_info)}",
+        f'SOCIAL MEDIA CONTENT TO SCORE:\n"{variant}"',
+    )
+
     try:
-        client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
+        return _chat_completion(
+            "score_variant",
+            messages,
+            api_key,
+            max_tokens=80,
+            temperature=0,
+            options=options,
+            validate=_parse_variant_score,
+        )
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+class ReactionScores(BaseModel):
+    """Scores-only reaction verdict, for ranking many posts cheaply"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    engagement_level: Literal["High", "Medium", "Low"]
+    emotional_response: Literal["Positive", "Neutral", "Negative", "Mixed"]
+    engagement_score: int = Field(ge=0, le=100)
+    sentiment_score: int = Field(ge=0, le=100)
+    top_trigger: str = ""
+
+    def to_markdown(self):
+        """Render with the same verdict lines as the prose analysis"""
+
+        return (
+            f"ENGAGEMENT LEVEL: {self.engagement_level}\n\n"
+            f"EMOTIONAL RESPONSE: {self.emotional_response}\n\n"
+            f"**Engagement score:** {self.engagement_score}/100 · "
+            f"**Sentiment score:** {self.sentiment_score}/100\n\n"
+            f"**Top trigger:** {self.top_trigger}"
+        )
+
+
+_REACTION_SCORES = TypeAdapter(ReactionScores)
+
+
+def parse_reaction_scores(response):
+    """ReactionScores from a scores-only response"""
+
+    # The closing brace is the stop sequence, so it is missing from the text
+    if "}" not in response:
+        response += "}"
+    return _REACTION_SCORES.validate_python(_extract_json_object(response))
+
+
+def score_segment_reaction(segment_name, segment_info, content, api_key, options=None):
+    """Scores-only reaction of one segment, as ReactionScores JSON"""
+
+    messages = build_messages(
+        f"{SCORES_INSTRUCTIONS}\n"
+        f"AUDIENCE SEGMENT:\n{_brief_for(segment_name, segment_info)}",
+        f'SOCIAL MEDIA CONTENT TO ANALYZE:\n"{content}"',
+    )
+
+    try:
+        response = _chat_completion(
+            "score_segment_reaction",
+            messages,
+            api_key,
+            max_tokens=60,
+            temperature=0,
+            options=options,
+            validate=parse_reaction_scores,
+            stop=SCORES_STOP,
+        )
+        return parse_reaction_scores(response).model_dump_json()
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def score_reaction_markdown(
+    segment_name, segment_info, content, api_key, options=None, on_token=None
+):
+    """score_segment_reaction rendered for the results view"""
+
+    result = score_segment_reaction(
+        segment_name, segment_info, content, api_key, options=options
+    )
+    if not result.startswith("Error:"):
+        result = ReactionScores.model_validate_json(result).to_markdown()
+        # Too short to be worth streaming; delivered whole
+        if on_token:
+            on_token(result)
+    return result
+
+
+def enhance_content_for_segments(
+    original_content, selected_segments, api_key, options=None, on_token=None
+):
+    """Enhance content for selected segments"""
+
+    segments_info = "\n".join(
+        _brief_for(segment, segment_profile(segment)) for segment in selected_segments
+    )
+    messages = build_messages(
+        f"{ENHANCEMENT_INSTRUCTIONS}\nTARGET SEGMENTS:\n{segments_info}",
+        f'ORIGINAL CONTENT:\n"{original_content}"',
+    )
+
+    try:
+        return _chat_completion(
+            "enhance_content_for_segments",
+            messages,
+            api_key,
+            max_tokens=800,
+            options=options,
+            on_token=on_token,
+            accept=partial(require_sections, ENHANCEMENT_SECTIONS),
+        )
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def generate_iraqi_arabic_content(
+    english_content, segment_name, api_key, options=None, on_token=None
+):
+    """Generate Iraqi Arabic version of content"""
+
+    try:
+        info = segment_profile(segment_name)
+        if AUDIENCE_SEGMENTS.get(segment_name) == info:
+            prefix = ARABIC_PREFIXES[segment_name]
+        else:
+            prefix = (
+                f"{ARABIC_INSTRUCTIONS}\nTARGET SEGMENT:\n"
+                f"{_segment_brief(segment_name, info)}"
+            )
+        messages = build_messages(prefix, f'ENGLISH CONTENT:\n"{english_content}"')
+
+        return _chat_completion(
+            "generate_iraqi_arabic_content",
+            messages,
+            api_key,
             max_tokens=600,
-            temperature=0.7,
+            options=options,
+            on_token=on_token,
+            accept=_check_arabic,
         )
-        return response.choices[0].message.content
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+def _drain_tokens(tokens, on_token):
+    """Forward queued (key, delta) pairs to on_token, batched per key"""
+
+    batched = {}
+    while True:
+        try:
+            key, delta = tokens.get_nowait()
+        except queue.Empty:
+            break
+        batched[key] = batched.get(key, "") + delta
+
+    for key, text in batched.items():
+        on_token(key, text)
+
+
+def _timed(timings, key, fn, *args, **kwargs):
+    # Records seconds per key when timings is a dict
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        if timings is not None:
+            timings[key] = time.perf_counter() - started
+
+
+def run_concurrently(
+    tasks,
+    max_workers=MAX_CONCURRENT_REQUESTS,
+    on_token=None,
+    deadline=None,
+    timings=None,
+):
+    """Run keyed callables in a thread pool and yield (key, result) as each completes
+
+    With on_token set, each task is called with a streaming on_token callback
+    and on_token(key, delta) is invoked on the calling thread, so it is safe
+    to update Streamlit elements from it. Tasks still running at deadline
+    (a time.monotonic() value) are yielded as timed-out errors, and timings
+    (if given) collects seconds per key.
+    """
+
+    if not tasks:
+        return
+
+    tokens = queue.Queue()
+    workers = max(1, min(max_workers, len(tasks)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {}
+    pending = set()
+    try:
+        for key, task in tasks.items():
+            if on_token is None:
+                futures[executor.submit(_timed, timings, key, task)] = key
+            else:
+                emit = partial(lambda k, delta: tokens.put((k, delta)), key)
+                futures[executor.submit(_timed, timings, key, task, on_token=emit)] = (
+                    key
+                )
+
+        pending = set(futures)
+        while pending:
+            timeout = 0.05 if on_token else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                timeout = min(timeout or remaining, remaining)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if on_token:
+                _drain_tokens(tokens, on_token)
+
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = f"Error: {str(e)}"
+                yield futures[future], result
+
+        for future in pending:
+            yield futures[future], "Error: Timed out at the page deadline"
+    finally:
+        # Timed-out calls stop at the same deadline; nobody waits for them
+        executor.shutdown(wait=not pending, cancel_futures=True)
+
+
+def run_dag(
+    nodes,
+    max_workers=MAX_CONCURRENT_REQUESTS,
+    on_token=None,
+    deadline=None,
+    done=None,
+    timings=None,
+):
+    """Run {key: (dependencies, fn)} as a dependency graph and yield
+    (key, result) as each node finishes
+
+    A node starts as soon as every dependency has a result and is called as
+    fn(results, on_token=...), results holding at least its dependencies.
+    done pre-seeds results; a node whose dependency failed is yielded as an
+    error without running. Tokens, deadline and errors are handled as in
+    run_concurrently, and timings (if given) collects seconds per node.
+    """
+
+    results = dict(done or {})
+    tokens = queue.Queue()
+    waiting = dict(nodes)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(nodes))))
+    futures = {}
+
+    def release():
+        """Start every waiting node whose dependencies are settled"""
+
+        skipped = []
+        for key, (dependencies, fn) in list(waiting.items()):
+            if not all(dependency in results for dependency in dependencies):
+                continue
+            del waiting[key]
+            if any(results[d].startswith("Error:") for d in dependencies):
+                skipped.append(key)
+                continue
+            kwargs = {}
+            if on_token is not None:
+                kwargs["on_token"] = partial(
+                    lambda k, delta: tokens.put((k, delta)), key
+                )
+            futures[
+                executor.submit(_timed, timings, key, fn, dict(results), **kwargs)
+            ] = key
+        return skipped
+
+    pending = set()
+    try:
+        while True:
+            for key in release():
+                results[key] = "Error: Skipped because an earlier step failed"
+                yield key, results[key]
+            pending = {future for future, key in futures.items() if key not in results}
+            if not pending:
+                break
+
+            timeout = 0.05 if on_token else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                timeout = min(timeout or remaining, remaining)
+            finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if on_token:
+                _drain_tokens(tokens, on_token)
+
+            for future in finished:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = f"Error: {str(e)}"
+                results[futures[future]] = result
+                yield futures[future], result
+
+        # Whatever has not finished by the deadline is reported as timed out
+        for key in [futures[future] for future in pending] + list(waiting):
+            yield key, "Error: Timed out at the page deadline"
+    finally:
+        executor.shutdown(wait=not pending, cancel_futures=True)
+
+
+def stream_to_placeholders(placeholders):
+    """Build an on_token callback that grows the text in each keyed placeholder"""
+
+    texts = {}
+
+    def on_token(key, delta):
+        texts[key] = texts.get(key, "") + delta
+        placeholders[key].markdown(texts[key])
+
+    return on_token
+
+
+def render_streamed(container, task):
+    """Run task in a worker thread, streaming its tokens into container"""
+
+    tokens = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(task, on_token=tokens.put)
+
+        def token_stream():
+            while True:
+                try:
+                    yield tokens.get(timeout=0.05)
+                except queue.Empty:
+                    if future.done() and tokens.empty():
+                        return
+
+        container.write_stream(token_stream())
+        result = future.result()
+    finally:
+        # A rerun or stop interrupts the script here; let the call finish in
+        # the background rather than holding the script until it does
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if result.startswith("Error:"):
+        container.error(result)
+    return result
+
+
+def render_result(container, result):
+    """Show a generator result, surfacing errors distinctly"""
+
+    if result.startswith("Error:"):
+        container.error(result)
+    else:
+        container.write(result)
+
+
+def memo_key(content, segment, analysis_type, model):
+    """Session-state key for one remembered analysis result"""
+
+    post_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return (post_hash, segment, analysis_type, model)
+
+
+def _segment_label(segment):
+    # Enhancement results are keyed by the tuple of segments they cover
+    return segment if isinstance(segment, str) else ", ".join(segment)
+
+
+def memo_put(memo, key, result):
+    """Remember one result, forgetting the least recently stored past
+    MAX_REMEMBERED_RESULTS"""
+
+    memo.pop(key, None)
+    memo[key] = result
+    while len(memo) > MAX_REMEMBERED_RESULTS:
+        del memo[next(iter(memo))]
+
+
+def remember_result(memo, key, result, content, seconds=None):
+    """Keep successful results so reruns can redraw them without an API call"""
+
+    if not result.startswith("Error:"):
+        memo_put(memo, key, result)
+        log_result(key, result, content, seconds)
+
+
+def profile_hash(segment):
+    """Fingerprint of the profiles behind a result, so reuse stops once a
+    segment's definition changes; enhancement keys cover several segments"""
+
+    names = [segment] if isinstance(segment, str) else list(segment)
+    profiles = get_segment_catalog().segments
+    fingerprint = json.dumps(
+        [[name, profiles.get(name)] for name in names], sort_keys=True
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+def log_result(key, result, content, seconds=None):
+    """Index a successful result so near-duplicate posts can reuse it later,
+    and add it to the run history"""
+
+    post_hash, segment, analysis_type, model = key
+    get_post_index().add(
+        content,
+        _segment_label(segment),
+        profile_hash(segment),
+        analysis_type,
+        model,
+        result,
+    )
+    engagement = _ENGAGEMENT_LEVEL.search(result)
+    emotion = _EMOTIONAL_RESPONSE.search(result)
+    get_run_history().add(
+        post_hash,
+        content,
+        [segment] if isinstance(segment, str) else list(segment),
+        analysis_type,
+        model,
+        result,
+        engagement_level=engagement and engagement.group(1).capitalize(),
+        emotional_response=emotion and emotion.group(1).capitalize(),
+        seconds=seconds,
+    )
+
+
+def reuse_near_duplicates(memo, memo_keys, missing, content, threshold):
+    """Fill missing results from similar posts analyzed before and return
+    the names that still need an API call"""
+
+    reused = st.session_state.setdefault("reused_results", {})
+    requery = st.session_state.setdefault("requery", set())
+    index = get_post_index()
+
+    remaining = []
+    for name in missing:
+        key = memo_keys[name]
+        _, segment, analysis_type, model = key
+        match = None
+        if key not in requery:
+            match = index.lookup(
+                content,
+                _segment_label(segment),
+                profile_hash(segment),
+                analysis_type,
+                model,
+                threshold,
+            )
+        if match:
+            memo_put(memo, key, match.result)
+            reused[key] = match
+        else:
+            remaining.append(name)
+    return remaining
+
+
+def requery_result(key):
+    """Button callback: drop a reused result so this run queries the API"""
+
+    st.session_state.setdefault("analysis_results", {}).pop(key, None)
+    st.session_state.setdefault("reused_results", {}).pop(key, None)
+    st.session_state.setdefault("requery", set()).add(key)
+
+
+def offer_requery(key):
+    """Say where a reused result came from, with a button to analyze afresh"""
+
+    match = st.session_state.get("reused_results", {}).get(key)
+    if match is None:
+        return
+
+    preview = match.content if len(match.content) <= 80 else match.content[:77] + "..."
+    st.caption(
+        f'♻️ Reused the analysis of a {match.similarity:.0%} similar post: "{preview}"'
+    )
+    st.button(
+        "🔄 Re-analyze this post",
+        key=f"requery-{key}",
+        on_click=requery_result,
+        args=(key,),
+    )
+
+
+def show_memoized(container, memo, key, run, pending_text):
+    """Fill a result slot from memory, or with a pending/prompt message"""
+
+    if key in memo:
+        container.write(memo[key])
+    elif run:
+        container.info(pending_text)
+    else:
+        container.info("👈 Press 🚀 Analyze Content to include this segment")
+
+
+def render_single(task, memo, key, run, stream, spinner_text, content):
+    """Draw a remembered result in the main column, or run task when asked"""
+
+    offer_requery(key)
+    if key in memo or not run:
+        show_memoized(st, memo, key, run, spinner_text)
+        return
+
+    started = time.perf_counter()
+    if stream:
+        result = render_streamed(st, task)
+    else:
+        with st.spinner(spinner_text):
+            result = task()
+            render_result(st, result)
+    remember_result(memo, key, result, content, time.perf_counter() - started)
+
+
+# History and memo label of scores-only reaction results
+SCORES_ANALYSIS = "Reaction Analysis (scores)"
+# ...and of reactions from one combined request for several segments
+COMBINED_ANALYSIS = "Reaction Analysis (combined)"
+
+
+def analysis_tasks(analysis_type, segments, content, api_key, options, scores=False):
+    """{segment, or "enhancement": task} for one standard analysis run
+
+    A Full Campaign starts with the enhancement and the reactions; its
+    Arabic adaptations depend on the enhancement and are built by
+    render_campaign. scores asks reactions for verdicts and scores only.
+    """
+
+    enhancement = {
+        "enhancement": partial(
+            enhance_content_for_segments,
+            content,
+            segments,
+            api_key,
+            options=options,
+        )
+    }
+    if analysis_type == "Content Enhancement":
+        return enhancement
+    if analysis_type == FULL_CAMPAIGN:
+        return {
+            **enhancement,
+            **analysis_tasks("Reaction Analysis", segments, content, api_key, options),
+        }
+    if analysis_type == "Reaction Analysis":
+        return {
+            segment: partial(
+                score_reaction_markdown if scores else analyze_segment_reaction,
+                segment,
+                segment_profile(segment),
+                content,
+                api_key,
+                options=options,
+            )
+            for segment in segments
+        }
+    return {
+        segment: partial(
+            generate_iraqi_arabic_content, content, segment, api_key, options=options
+        )
+        for segment in segments
+    }
+
+
+def analysis_memo_keys(
+    analysis_type,
+    segments,
+    content,
+    high_quality,
+    deep=False,
+    scores=False,
+    combined=False,
+):
+    """{segment, or "enhancement": memo key} matching analysis_tasks
+
+    Keys carry the model route, so results from different routes are
+    remembered separately, and a campaign shares its reaction and
+    enhancement keys with the standalone analyses. Combined-request
+    reactions come from their own prompt and route, so they get their own.
+    """
+
+    router = get_model_router()
+
+    def key(segment, kind, function):
+        return memo_key(content, segment, kind, router.label(function, high_quality))
+
+    keys = {}
+    if analysis_type in ("Content Enhancement", FULL_CAMPAIGN):
+        keys["enhancement"] = key(
+            tuple(segments),
+            "Content Enhancement",
+            ANALYSIS_FUNCTIONS["Content Enhancement"],
+        )
+    if analysis_type == "Content Enhancement":
+        return keys
+
+    for segment in segments:
+        if deep and analysis_type == "Reaction Analysis":
+            # Deep verdicts are a different analysis from the segment-level one
+            keys[segment] = key(
+                segment, f"{analysis_type} (deep)", "analyze_subsegment_reaction"
+            )
+        elif scores and analysis_type == "Reaction Analysis":
+            keys[segment] = key(segment, SCORES_ANALYSIS, "score_segment_reaction")
+        elif combined and analysis_type == "Reaction Analysis":
+            keys[segment] = key(segment, COMBINED_ANALYSIS, "analyze_segments_combined")
+        else:
+            kind = (
+                "Reaction Analysis" if analysis_type == FULL_CAMPAIGN else analysis_type
+            )
+            keys[segment] = key(segment, kind, ANALYSIS_FUNCTIONS[kind])
+    return keys
+
+
+def extract_section(text, heading, headings):
+    """Body of one 'HEADING:' section of a structured response, or None"""
+
+    start = re.search(rf"{re.escape(heading)}[:*\s]*", text, re.IGNORECASE)
+    if not start:
+        return None
+    others = "|".join(re.escape(other) for other in headings if other != heading)
+    end = re.compile(rf"^[\s#*]*(?:{others})", re.IGNORECASE | re.MULTILINE).search(
+        text, start.end()
+    )
+    body = text[start.end() : end.start() if end else len(text)]
+    return body.strip().strip('*"“”').strip() or None
+
+
+def enhanced_post(enhancement, content):
+    """The post an enhancement proposes, or content when none can be parsed"""
+
+    return (
+        extract_section(enhancement, "ENHANCED CONTENT", ENHANCEMENT_SECTIONS)
+        or content
+    )
+
+
+def _run_step(task, results, on_token=None):
+    # run_dag node for a task that depends on nothing
+    return task(on_token=on_token)
+
+
+def render_campaign(
+    segments,
+    content,
+    api_key,
+    options,
+    memo,
+    memo_keys,
+    missing,
+    tasks,
+    run,
+    stream,
+    max_workers,
+):
+    """Full Campaign: reactions and enhancement in parallel, each segment's
+    Arabic adaptation of the enhanced post as soon as that is ready"""
+
+    def arabic_key(enhancement, segment):
+        # The same key a standalone Arabic adaptation of that post would use
+        return analysis_memo_keys(
+            "Iraqi Arabic Adaptation",
+            [segment],
+            enhanced_post(enhancement, content),
+            options.high_quality,
+        )[segment]
+
+    enhancement_key = memo_keys["enhancement"]
+    st.subheader("✨ Enhanced Content")
+    offer_requery(enhancement_key)
+    placeholders = {"enhancement": st.empty()}
+    show_memoized(
+        placeholders["enhancement"],
+        memo,
+        enhancement_key,
+        run,
+        "Enhancing content for selected Iraqi segments...",
+    )
+
+    arabic_missing = []
+    for segment, tab in zip(segments, st.tabs(segments)):
+        with tab:
+            st.subheader(f"👥 {segment} Reaction")
+            offer_requery(memo_keys[segment])
+            placeholders[segment] = st.empty()
+            show_memoized(
+                placeholders[segment],
+                memo,
+                memo_keys[segment],
+                run,
+                f"Analyzing {segment} reaction...",
+            )
+
+            st.subheader(f"🔤 Arabic Version for {segment}")
+            placeholders[("arabic", segment)] = st.empty()
+            key = (
+                arabic_key(memo[enhancement_key], segment)
+                if enhancement_key in memo
+                else None
+            )
+            show_memoized(
+                placeholders[("arabic", segment)],
+                memo,
+                key,
+                run,
+                (
+                    f"Creating Iraqi Arabic version for {segment}..."
+                    if key
+                    else "Waiting for the enhanced content..."
+                ),
+            )
+            if key not in memo and (run or "enhancement" in missing):
+                arabic_missing.append(segment)
+
+    if not (missing or arabic_missing):
+        return
+
+    def adapt(segment, results, on_token=None):
+        enhancement = results["enhancement"]
+        key = arabic_key(enhancement, segment)
+        if key in memo:
+            if on_token:
+                on_token(memo[key])
+            return memo[key]
+        return generate_iraqi_arabic_content(
+            enhanced_post(enhancement, content),
+            segment,
+            api_key,
+            options=options,
+            on_token=on_token,
+        )
+
+    nodes = {name: ((), partial(_run_step, tasks[name])) for name in missing}
+    nodes.update(
+        {
+            ("arabic", segment): (("enhancement",), partial(adapt, segment))
+            for segment in arabic_missing
+        }
+    )
+    done = {}
+    if "enhancement" not in missing and enhancement_key in memo:
+        done["enhancement"] = memo[enhancement_key]
+
+    started = time.perf_counter()
+    timings = {}
+    with st.spinner(f"Running {len(nodes)} campaign steps..."):
+        for key, result in run_dag(
+            nodes,
+            max_workers,
+            on_token=stream_to_placeholders(placeholders) if stream else None,
+            deadline=options.deadline,
+            done=done,
+            timings=timings,
+        ):
+            render_result(placeholders[key], result)
+            if key in memo_keys:
+                remember_result(memo, memo_keys[key], result, content, timings.get(key))
+            else:
+                enhancement = done.get("enhancement") or memo.get(enhancement_key)
+                if enhancement:
+                    remember_result(
+                        memo,
+                        arabic_key(enhancement, key[1]),
+                        result,
+                        enhanced_post(enhancement, content),
+                        timings.get(key),
+                    )
+            if key == "enhancement" and not result.startswith("Error:"):
+                done["enhancement"] = result
+
+    st.caption(
+        f"⏱️ {len(timings)} calls finished in {time.perf_counter() - started:.1f}s; "
+        f"back to back they would take {sum(timings.values()):.1f}s"
+    )
+
+
+def render_deep_reactions(
+    placeholders,
+    segment_names,
+    content,
+    api_key,
+    options,
+    memo,
+    memo_keys,
+    max_workers=None,
+):
+    """Fill each segment's placeholder with its merged subsegment verdict,
+    re-rendered as every subsegment call finishes"""
+
+    count = sum(
+        len(segment_profile(name)["subsegments"]) or 1 for name in segment_names
+    )
+    started = time.perf_counter()
+    with st.spinner(f"Analyzing {count} subsegments..."):
+        for segment, result, complete, failed in analyze_segments_deep(
+            segment_names, content, api_key, options=options, max_workers=max_workers
+        ):
+            if not complete:
+                if result:
+                    placeholders[segment].markdown(result)
+                continue
+
+            render_result(placeholders[segment], result)
+            # A verdict missing subsegments is shown but retried on next Analyze
+            if not failed:
+                remember_result(
+                    memo,
+                    memo_keys[segment],
+                    result,
+                    content,
+                    time.perf_counter() - started,
+                )
+
+
+def _full_engagement(results):
+    """Mean engagement score (Low=1..High=3) over full reaction analyses"""
+
+    levels = [
+        match.group(1).capitalize()
+        for result in results
+        if not result.startswith("Error:")
+        for match in [_ENGAGEMENT_LEVEL.search(result)]
+        if match
+    ]
+    if not levels:
+        return None
+    return round(sum(ENGAGEMENT_SCORES[level] for level in levels) / len(levels), 2)
+
+
+def run_tournament(variants, segments, finalists, api_key, options, max_workers):
+    """Score variants by successive halving, then fully analyze the finalists
+
+    Returns the state render_tournament draws from: every Entry, finalist
+    indexes best first, their mean full-analysis engagement,
+    {(variant_index, segment): full analysis} and the scoring call count.
+    """
+
+    scoring_calls = 0
+
+    def score_pairs(pairs):
+        nonlocal scoring_calls
+        scoring_calls += len(pairs)
+        tasks = {
+            (index, segment): partial(
+                score_variant,
+                variants[index],
+                segment,
+                segment_profile(segment),
+                api_key,
+                options=options,
+            )
+            for index, segment in pairs
+        }
+        for key, result in run_concurrently(
+            tasks, max_workers, deadline=options.deadline
+        ):
+            # Successful results already passed _parse_variant_score
+            if result.startswith("Error:"):
+                yield key, None
+            else:
+                yield key, _parse_variant_score(result).score
+
+    progress = st.empty()
+    for round_number, alive, entries in successive_halving(
+        variants, segments, score_pairs, finalists
+    ):
+        if round_number:
+            progress.info(
+                f"Round {round_number}: {len(alive)} of {len(variants)} variants remain"
+            )
+
+    progress.info(f"Running full analyses for {len(alive)} finalists...")
+    full = dict(
+        run_concurrently(
+            {
+                (entry.index, segment): partial(
+                    analyze_segment_reaction,
+                    segment,
+                    segment_profile(segment),
+                    entry.variant,
+                    api_key,
+                    options=options,
+                )
+                for entry in alive
+                for segment in segments
+            },
+            max_workers,
+            deadline=options.deadline,
+        )
+    )
+    progress.empty()
+
+    engagement = {
+        entry.index: _full_engagement(
+            [full.get((entry.index, segment), "Error:") for segment in segments]
+        )
+        for entry in alive
+    }
+    ranked = sorted(
+        alive,
+        key=lambda entry: (
+            -(engagement[entry.index] or 0),
+            -entry.mean_score,
+            entry.index,
+        ),
+    )
+    return {
+        "entries": entries,
+        "finalists": [entry.index for entry in ranked],
+        "engagement": engagement,
+        "full": full,
+        "scoring_calls": scoring_calls,
+    }
+
+
+def tournament_leaderboard(state, segments):
+    """Ranked DataFrame: finalists by full-analysis engagement, then the rest
+    by the round they survived to and their mean score"""
+
+    import pandas as pd  # only needed once a tournament has run
+
+    engagement = state["engagement"]
+    entries = state["entries"]
+    pruned = sorted(
+        (entry for entry in entries if entry.eliminated_in is not None),
+        key=lambda entry: (-entry.eliminated_in, -entry.mean_score, entry.index),
+    )
+    ranked = [entries[index] for index in state["finalists"]] + pruned
+
+    rows = []
+    for rank, entry in enumerate(ranked, start=1):
+        preview = (
+            entry.variant if len(entry.variant) <= 60 else entry.variant[:57] + "..."
+        )
+        row = {
+            "Rank": rank,
+            "Variant": preview,
+            "Result": (
+                "🏆 Finalist"
+                if entry.eliminated_in is None
+                else f"Out in round {entry.eliminated_in}"
+            ),
+            "Mean score": round(entry.mean_score, 2) if entry.scores else None,
+            "Full engagement": engagement.get(entry.index),
+        }
+        row.update({segment: entry.scores.get(segment) for segment in segments})
+        row["Failed calls"] = entry.failed
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def render_tournament(segments, api_key, options, max_workers, page_deadline):
+    """Variant Tournament: rank many post variants against the selected
+    segments at a fraction of the calls of analyzing every variant fully"""
+
+    variants = split_variants(
+        st.text_area(
+            "Post variants",
+            placeholder="One variant per line, or separate multi-line variants with ---",
+            height=200,
+        )
+    )
+    finalists = st.number_input("Finalists", min_value=1, max_value=5, value=2)
+    if variants and segments:
+        st.caption(
+            f"{len(variants)} variants × {len(segments)} segments; analyzing "
+            f"every pair fully would take {len(variants) * len(segments)} calls"
+        )
+    run = st.button(
+        "🏆 Run Tournament",
+        disabled=not (api_key and len(variants) > 1 and segments),
+    )
+
+    router = get_model_router()
+    key = (
+        tuple(variants),
+        tuple(segments),
+        finalists,
+        router.label("score_variant", options.high_quality),
+        router.label("analyze_segment_reaction", options.high_quality),
+    )
+    state = st.session_state.get("tournament")
+    if run:
+        if page_deadline:
+            options = replace(options, deadline=time.monotonic() + page_deadline)
+        with st.spinner(f"Running a tournament of {len(variants)} variants..."):
+            state = run_tournament(
+                variants, segments, finalists, api_key, options, max_workers
+            )
+        state["key"] = key
+        st.session_state["tournament"] = state
+    elif state is None or state["key"] != key:
+        if len(variants) > 1:
+            st.info("👆 Press 🏆 Run Tournament to rank these variants")
+        return
+
+    st.dataframe(
+        tournament_leaderboard(state, segments),
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption(
+        f"{state['scoring_calls']} compact scoring calls and {len(state['full'])} "
+        f"full analyses instead of {len(variants) * len(segments)} full analyses"
+    )
+    for rank, index in enumerate(state["finalists"], start=1):
+        variant = state["entries"][index].variant
+        with st.expander(f"🏆 Finalist {rank}: {variant[:60]}"):
+            for segment in segments:
+                st.markdown(f"**👥 {segment}**")
+                render_result(st, state["full"].get((index, segment), "Error: Not run"))
+
+
+def _history_page(cursors, before_id=None):
+    """Button callback: open the page older than before_id, or go back one
+    page without it; cursors[-1] is the before_id of the page shown"""
+
+    if before_id is not None:
+        cursors.append(before_id)
+    elif len(cursors) > 1:
+        cursors.pop()
+
+
+def render_history(catalog):
+    """Run History: filter and page through every stored analysis result"""
+
+    col_a, col_b = st.columns(2)
+    segments = col_a.multiselect("Segments", list(catalog.segments))
+    engagement = col_b.selectbox("Engagement level", ["Any", *ENGAGEMENT_LEVELS])
+    analysis_type = col_a.selectbox(
+        "Analysis",
+        [
+            "Any",
+            *ANALYSIS_TYPES,
+            "Reaction Analysis (deep)",
+            SCORES_ANALYSIS,
+            COMBINED_ANALYSIS,
+        ],
+    )
+    dates = col_b.date_input("Date range", value=(), max_value=date.today())
+    keyword = st.text_input(
+        "Search posts and outputs",
+        placeholder="English or Arabic words, e.g. remittance or حوالة",
+    )
+
+    filters = {
+        "segments": segments,
+        "engagement_level": None if engagement == "Any" else engagement,
+        "analysis_type": None if analysis_type == "Any" else analysis_type,
+        "keyword": keyword.strip() or None,
+    }
+    if dates:
+        filters["since"] = datetime.combine(dates[0], datetime.min.time()).timestamp()
+        end = datetime.combine(dates[-1], datetime.min.time()) + timedelta(days=1)
+        filters["until"] = end.timestamp()
+
+    # New filters start again from the newest page
+    if st.session_state.get("history_filters") != filters:
+        st.session_state["history_filters"] = filters
+        st.session_state["history_cursors"] = [None]
+    cursors = st.session_state["history_cursors"]
+
+    history = get_run_history()
+    started = time.perf_counter()
+    total = history.count(**filters)
+    runs = history.search(**filters, before_id=cursors[-1], limit=HISTORY_PAGE_SIZE + 1)
+    elapsed = time.perf_counter() - started
+    more = len(runs) > HISTORY_PAGE_SIZE
+    runs = runs[:HISTORY_PAGE_SIZE]
+
+    first = (len(cursors) - 1) * HISTORY_PAGE_SIZE
+    st.caption(
+        f"{total:,} runs match; showing {first + min(1, len(runs))}–"
+        f"{first + len(runs)} (searched in {elapsed * 1000:.0f} ms)"
+    )
+    if not runs:
+        return
+
+    rows = [
+        {
+            "When": datetime.fromtimestamp(run.created_at).strftime("%Y-%m-%d %H:%M"),
+            "Segment": run.segment,
+            "Analysis": run.analysis_type,
+            "Model": run.model,
+            "Engagement": run.engagement_level,
+            "Emotion": run.emotional_response,
+            "Seconds": None if run.seconds is None else round(run.seconds, 1),
+            "Post": run.content[:80],
+            "Output": run.output[:120],
+        }
+        for run in runs
+    ]
+    import pandas as pd  # only needed once there are runs to tabulate
+
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+    col_a, col_b = st.columns(2)
+    col_a.button(
+        "← Newer",
+        key="history-newer",
+        disabled=len(cursors) == 1,
+        on_click=_history_page,
+        args=(cursors,),
+    )
+    col_b.button(
+        "Older →",
+        key="history-older",
+        disabled=not more,
+        on_click=_history_page,
+        args=(cursors, runs[-1].id),
+    )
+
+    shown = st.selectbox(
+        "Show full output",
+        range(len(runs)),
+        key="history-shown",
+        format_func=lambda i: f"{rows[i]['When']} · {runs[i].segment} · "
+        f"{runs[i].analysis_type}",
+    )
+    st.markdown(f"**Post:** {runs[shown].content}")
+    st.write(runs[shown].output)
+
+
+def job_steps(spec, api_key, options):
+    """{step: (dependencies, fn)} run_dag nodes for a background job"""
+
+    content, segments = spec["content"], spec["segments"]
+    tasks = analysis_tasks(
+        spec["analysis_type"],
+        segments,
+        content,
+        api_key,
+        options,
+        scores=spec.get("scores", False),
+    )
+    nodes = {step: ((), partial(_run_step, task)) for step, task in tasks.items()}
+    if spec["analysis_type"] == FULL_CAMPAIGN:
+
+        def adapt(segment, results, on_token=None):
+            return generate_iraqi_arabic_content(
+                enhanced_post(results["enhancement"], content),
+                segment,
+                api_key,
+                options=options,
+                on_token=on_token,
+            )
+
+        for segment in segments:
+            nodes[ARABIC_STEP + segment] = (("enhancement",), partial(adapt, segment))
+    return nodes
+
+
+def job_memo_key(spec, step, results):
+    """(memo key, analyzed post) of one job step, as the main view keys it"""
+
+    if step.startswith(ARABIC_STEP):
+        segment = step[len(ARABIC_STEP) :]
+        post = enhanced_post(results["enhancement"], spec["content"])
+        keys = analysis_memo_keys(
+            "Iraqi Arabic Adaptation", [segment], post, spec["options"]["high_quality"]
+        )
+        return keys[segment], post
+    keys = analysis_memo_keys(
+        spec["analysis_type"],
+        spec["segments"],
+        spec["content"],
+        spec["options"]["high_quality"],
+        scores=spec.get("scores", False),
+    )
+    return keys[step], spec["content"]
+
+
+def run_job(job, api_key, done, cancel_event):
+    """JobQueue runner: a job's unfinished steps as a dependency graph"""
+
+    spec = job.spec
+    options = replace(
+        DEFAULT_OPTIONS,
+        session_id=f"job-{job.id}",
+        cancel_event=cancel_event,
+        **spec["options"],
+    )
+    nodes = {
+        step: node
+        for step, node in job_steps(spec, api_key, options).items()
+        if step not in done
+    }
+    results = dict(done)
+    timings = {}
+    for step, result in run_dag(
+        nodes, JOB_STEP_CONCURRENCY, done=done, timings=timings
+    ):
+        results[step] = result
+        if not result.startswith("Error:"):
+            key, post = job_memo_key(spec, step, results)
+            log_result(key, result, post, timings.get(step))
+        yield step, result, timings.get(step)
+
+
+def submit_job(analysis_type, segments, content, api_key, options, scores=False):
+    """Queue an analysis to run outside the script thread; returns its id"""
+
+    spec = {
+        "analysis_type": analysis_type,
+        "segments": list(segments),
+        "content": content,
+        "scores": scores,
+        # Only settings that affect the calls; never the API key
+        "options": {
+            "use_cache": options.use_cache,
+            "base_url": options.base_url,
+            "hedge": options.hedge,
+            "call_deadline": options.call_deadline,
+            "high_quality": options.high_quality,
+        },
+    }
+    total = len(job_steps(spec, api_key, options))
+    return get_job_queue().submit(spec, total, api_key)
+
+
+def resume_job(job_id, api_key):
+    """Button callback: rerun a job's unfinished steps"""
+
+    if not get_job_queue().resume(job_id, api_key):
+        st.toast(f"Job {job_id} is still stopping; resume it in a moment")
+
+
+def load_job_results(job_id):
+    """Button callback: copy a job's results into this session's results"""
+
+    queue = get_job_queue()
+    spec = queue.get(job_id).spec
+    results = queue.results(job_id)
+    memo = st.session_state.setdefault("analysis_results", {})
+    for step, result in results.items():
+        if not result.startswith("Error:"):
+            memo_put(memo, job_memo_key(spec, step, results)[0], result)
+
+
+# st.status state for each job status
+_JOB_STATES = {
+    "queued": "running",
+    "running": "running",
+    "done": "complete",
+    "failed": "error",
+    "cancelled": "error",
+}
+
+
+def render_jobs(api_key):
+    """Background Jobs: progress, cancellation and results of this API key's
+    jobs; polls while any of them is still queued or running"""
+
+    queue = get_job_queue()
+    jobs = queue.jobs(owner_of(api_key))
+    if not jobs:
+        st.caption("No background jobs yet; use 📤 Run in Background to queue one")
+        return
+
+    for job in jobs:
+        spec = job.spec
+        kind = SCORES_ANALYSIS if spec.get("scores") else spec["analysis_type"]
+        label = (
+            f"{job.id} · {kind} · {len(spec['segments'])} segments "
+            f"· {job.done}/{job.total} steps · {job.status}"
+        )
+        with st.status(label, state=_JOB_STATES[job.status]):
+            st.progress(min(1.0, job.done / max(1, job.total)))
+            preview = spec["content"][:100]
+            st.caption(f"{preview} → {', '.join(spec['segments'])}")
+            if job.error:
+                st.caption(f"⚠️ {job.error}")
+
+            col_a, col_b = st.columns(2)
+            if job.active:
+                col_a.button(
+                    "✖️ Cancel",
+                    key=f"job-cancel-{job.id}",
+                    on_click=queue.cancel,
+                    args=(job.id,),
+                )
+            if job.status in ("failed", "cancelled") or (
+                job.status == "queued" and queue.waiting_for_key(job.id)
+            ):
+                col_a.button(
+                    "▶️ Resume",
+                    key=f"job-resume-{job.id}",
+                    help="Run the steps that have not finished yet",
+                    on_click=resume_job,
+                    args=(job.id, api_key),
+                )
+            if job.done:
+                col_b.button(
+                    "📥 Show in results",
+                    key=f"job-load-{job.id}",
+                    help="Select the same post, segments and analysis type to see them",
+                    on_click=load_job_results,
+                    args=(job.id,),
+                )
+            for step, result in queue.results(job.id).items():
+                st.markdown(f"**{step}**")
+                render_result(st, result)
+
+
+def render_performance_panel(session_id):
+    """Per-call latency, token, cost and cache figures for this session"""
+
+    history = get_call_metrics().records(session_id)
+    if not history:
+        st.caption("No API calls yet this session")
+        return
+
+    # Speculative prefetches are reported on their own line, not in the totals
+    records = [r for r in history if not r.speculative]
+    speculative = [r for r in history if r.speculative]
+    # Only misses reached the API; coalesced calls waited on another session's
+    misses = [r for r in records if not (r.cache_hit or r.coalesced)]
+    col_a, col_b = st.columns(2)
+    col_a.metric("LLM calls", len(records))
+    col_b.metric("Cache hits", sum(r.cache_hit for r in records))
+    col_a.metric("Retries", sum(r.retries for r in records))
+    col_b.metric("Est. cost", f"${sum(r.cost_usd or 0 for r in misses):.4f}")
+
+    static = sum(r.static_prompt_tokens for r in misses)
+    variable = sum(r.variable_prompt_tokens for r in misses)
+    prompt = sum(r.prompt_tokens or 0 for r in misses)
+    cached = sum(r.cached_prompt_tokens for r in misses)
+    st.write(
+        f"**Static prefix:** {static:,} of {static + variable:,} estimated "
+        f"prompt tokens ({static / max(1, static + variable):.0%})"
+    )
+    st.write(
+        f"**Provider-cached:** {cached:,} of {prompt:,} prompt tokens "
+        f"({cached / max(1, prompt):.0%})"
+    )
+    coalesced = sum(r.coalesced for r in records)
+    flights = get_single_flight()
+    if coalesced or flights.saved:
+        st.write(
+            f"**Coalesced:** {coalesced} calls shared another session's identical "
+            f"request in flight; {flights.saved} of {flights.calls + flights.saved} "
+            f"upstream calls saved across all sessions"
+        )
+    hedged = [r for r in misses if r.hedged]
+    if hedged:
+        st.write(
+            f"**Hedged:** {len(hedged)} of {len(misses)} calls "
+            f"({len(hedged) / len(misses):.0%}), "
+            f"{sum(r.hedge_won for r in hedged)} won by the duplicate"
+        )
+        started = [r for r in misses if r.ttft_seconds is not None and not r.error]
+        if started:
+            # Cancelled first attempts only give a lower bound on their wait
+            unhedged = [r.unhedged_ttft_seconds or r.ttft_seconds for r in started]
+            st.write(
+                f"**p99 TTFT:** {quantile([r.ttft_seconds for r in started], 0.99):.2f}s "
+                f"with hedging, at least {quantile(unhedged, 0.99):.2f}s without"
+            )
+    cascade = [r for r in misses if r.tier]
+    if cascade:
+        tiers = []
+        for tier in ("fast", "large"):
+            calls = [r for r in cascade if r.tier == tier]
+            if calls:
+                median = quantile([r.wall_seconds for r in calls], 0.5)
+                tiers.append(f"{tier} {len(calls)} calls, p50 {median:.2f}s")
+        fast = [r for r in cascade if r.tier == "fast"]
+        escalated = sum(r.escalated for r in fast)
+        st.write(
+            f"**Cascade:** {'; '.join(tiers)}; {escalated} of {len(fast)} fast "
+            f"answers escalated ({escalated / max(1, len(fast)):.0%})"
+        )
+    if speculative:
+        spent = [r for r in speculative if not r.cache_hit]
+        st.write(
+            f"**Speculative prefetch:** {len(spent)} calls, "
+            f"{sum(r.error is not None for r in spent)} cancelled or failed, "
+            f"{sum((r.prompt_tokens or 0) + (r.completion_tokens or 0) for r in spent):,} tokens, "
+            f"${sum(r.cost_usd or 0 for r in spent):.4f}"
+        )
+
+    rows = [
+        {
+            "Function": r.function,
+            "Model": r.model,
+            "Tier": r.tier,
+            "Wall (s)": round(r.wall_seconds, 2),
+            "TTFT (s)": None if r.ttft_seconds is None else round(r.ttft_seconds, 2),
+            "Prompt": r.prompt_tokens,
+            "Completion": r.completion_tokens,
+            "Cached": r.cached_prompt_tokens,
+            "Cost ($)": None if r.cost_usd is None else round(r.cost_usd, 4),
+            "Cache": "hit" if r.cache_hit else "shared" if r.coalesced else "miss",
+            "Retries": r.retries,
+            "Speculative": r.speculative,
+            "Hedged": "won" if r.hedge_won else r.hedged,
+            "Error": r.error,
+            "Escalated": r.escalated,
+        }
+        for r in reversed(history)
+    ]
+    import pandas as pd  # only needed once there are calls to tabulate
+
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+
 def main():
+    # Configure Streamlit page
+    st.set_page_config(
+        page_title="Iraqi Remittance Segments - Social Media Reaction Simulator",
+        page_icon="📱",
+        layout="wide",
+    )
+
+    try:
+        catalog = get_segment_catalog()
+    except (OSError, ValueError) as e:
+        st.error(
+            f"Error: Could not load segment catalog {SEGMENT_CATALOG_PATH}: {str(e)}"
+        )
+        st.stop()
+
     st.title("📱 Iraqi Remittance Segments - Social Media Reaction Simulator")
     st.markdown(
         "**Analyze how different Iraqi remittance segments react to your social media content**"
@@ -435,19 +2905,127 @@ def main():
         else:
             st.warning("Please enter your OpenAI API key")
 
+        max_concurrency = st.slider(
+            "Max concurrent requests",
+            min_value=1,
+            max_value=len(AUDIENCE_SEGMENTS),
+            value=min(MAX_CONCURRENT_REQUESTS, len(AUDIENCE_SEGMENTS)),
+            help="How many segments are analyzed in parallel",
+        )
+        subsegment_concurrency = st.slider(
+            "Max concurrent subsegment requests",
+            min_value=1,
+            max_value=max(
+                SUBSEGMENT_CONCURRENCY,
+                sum(len(s["subsegments"]) for s in AUDIENCE_SEGMENTS.values()),
+            ),
+            value=SUBSEGMENT_CONCURRENCY,
+            help="How many subsegment calls deep analysis runs in parallel",
+        )
+
+        bypass_cache = st.checkbox(
+            "Bypass response cache",
+            help="Always query OpenAI, even if an identical or near-duplicate request was answered before",
+        )
+
+        reuse_threshold = st.slider(
+            "Near-duplicate reuse threshold",
+            min_value=0.5,
+            max_value=1.0,
+            value=NEAR_DUPLICATE_THRESHOLD,
+            step=0.05,
+            disabled=bypass_cache,
+            help="Posts at least this similar to one analyzed before reuse its results",
+        )
+
+        high_quality = st.checkbox(
+            "High quality (large model only)",
+            help="Skip the fast model and send every analysis to the large one",
+        )
+
+        with st.expander("🔌 Connection Settings"):
+            base_url = st.text_input(
+                "API base URL",
+                value=OPENAI_BASE_URL or "",
+                placeholder="https://api.openai.com/v1",
+                help="Point at any OpenAI-compatible server, e.g. a local stand-in",
+            )
+            request_timeout = st.number_input(
+                "Request timeout (seconds)",
+                min_value=5.0,
+                max_value=600.0,
+                value=OPENAI_REQUEST_TIMEOUT,
+                step=5.0,
+            )
+            call_deadline = st.number_input(
+                "Call deadline (seconds)",
+                min_value=5.0,
+                max_value=600.0,
+                value=OPENAI_CALL_DEADLINE,
+                step=5.0,
+                help="Give up on a single call after this long, retries included",
+            )
+            page_deadline = st.number_input(
+                "Page deadline (seconds)",
+                min_value=0.0,
+                max_value=600.0,
+                value=PAGE_DEADLINE_SECONDS,
+                step=5.0,
+                help="Show whatever has finished after this long and mark the rest as timed out; 0 waits for everything",
+            )
+            hedge_requests = st.checkbox(
+                "Hedge slow requests",
+                value=HEDGE_REQUESTS,
+                help="Send a duplicate request when the first token is slower than usual and keep whichever answers first",
+            )
+
+        ctx = get_script_run_ctx()
+        options = LLMOptions(
+            use_cache=not bypass_cache,
+            base_url=base_url.strip() or None,
+            request_timeout=request_timeout,
+            session_id=ctx.session_id if ctx else None,
+            hedge=hedge_requests,
+            call_deadline=call_deadline,
+            high_quality=high_quality,
+        )
+
+        stream_output = st.checkbox(
+            "Stream tokens as they arrive",
+            value=True,
+            help="Render analysis text while it is being generated",
+        )
+
+        speculative_mode = st.checkbox(
+            "Speculative prefetch",
+            help="Start the selected analyses in the background before Analyze is pressed, within an hourly token budget",
+        )
+
+        # Filled in at the end of the run so it includes this run's calls
+        performance_panel = st.expander("⏱️ Performance")
+
         st.header("📊 Iraqi Segments Overview")
-        st.write(f"**Total Segments:** {len(AUDIENCE_SEGMENTS)}")
+        st.write(f"**Total Segments:** {len(catalog)}")
 
-        for name, info in AUDIENCE_SEGMENTS.items():
+        segment_query = st.text_input(
+            "🔎 Search segments", placeholder="Name, keyword, trait or platform"
+        )
+        trait_filter = st.multiselect("Traits", sorted(catalog.by_trait))
+        platform_filter = st.multiselect("Platforms", sorted(catalog.by_platform))
+        matches = catalog.search(segment_query, trait_filter, platform_filter)
+        if segment_query or trait_filter or platform_filter:
+            st.caption(f"{len(matches)} matching segments")
+
+        # Only a page of details is rendered, however large the catalog
+        for name in matches[:SEGMENT_DETAILS_LIMIT]:
+            info = catalog.segments[name]
             with st.expander(f"{name} ({info['age_range']})"):
-                st.write(f"**Description:** {info['description']}")
-                st.write(f"**Subsegments:** {', '.join(info['subsegments'][:3])}...")
-                st.write(
-                    f"**Key Motivations:** {', '.join(info['motivations'][:2])}..."
-                )
-                st.write(
-                    f"**Preferred Platforms:** {', '.join(info['platforms'][:3])}..."
-                )
+                st.markdown(segment_overview_markdown(name, catalog))
+        if len(matches) > SEGMENT_DETAILS_LIMIT:
+            st.caption(
+                f"...and {len(matches) - SEGMENT_DETAILS_LIMIT} more. "
+                "Refine the search to see them."
+            )
 
     # Main interface
     col1, col2 = st.columns([1, 1])
@@ -455,19 +3033,9 @@ def main():
     with col1:
         st.header("📝 Content Input")
 
-        # Sample content suggestions based on Iraqi context
-        sample_posts = [
-            "أرسل فلوس لأهلك بالعراق بسرعة وأمان! رسوم قليلة للطلاب. Send money home instantly! 🇮🇶💙",
-            "Support your family back home while building your future abroad. Fast, secure, affordable. 🏠❤️",
-            "من العراق للعالم - نربط المسافات بكل حوالة. From Iraq to the world - bridging distances. 🌍",
-            "Your success abroad means everything to family back home. Quick remittances for Iraqis worldwide. 🎓",
-            "Pay suppliers instantly. Grow your business. Iraq to global markets made simple. 💼🚀",
-            "Freelancers - get paid faster from international clients. USD to IQD in minutes. 💻💰",
-        ]
-
         st.subheader("💡 Sample Posts")
         selected_sample = st.selectbox(
-            "Choose a sample post or write your own:", ["Custom"] + sample_posts
+            "Choose a sample post or write your own:", ["Custom"] + SAMPLE_POSTS
         )
 
         # Content input
@@ -488,8 +3056,8 @@ def main():
         st.subheader("🎯 Select Iraqi Segments")
         selected_segments = st.multiselect(
             "Choose segments to analyze:",
-            options=list(AUDIENCE_SEGMENTS.keys()),
-            default=["Iraqi Students Abroad", "Iraqi Workers Abroad"],
+            options=list(catalog.segments),
+            default=[name for name in DEFAULT_SEGMENTS if name in catalog],
             help="Select multiple segments to compare reactions across different Iraqi communities",
         )
 
@@ -497,19 +3065,110 @@ def main():
         st.subheader("🔍 Analysis Type")
         analysis_type = st.radio(
             "Choose analysis type:",
-            ["Reaction Analysis", "Content Enhancement", "Iraqi Arabic Adaptation"],
+            ANALYSIS_TYPES + [FULL_CAMPAIGN],
             help="Select what type of analysis you want to perform",
         )
 
+        deep_mode = False
+        scores_mode = False
+        combined_mode = False
+        if analysis_type == "Reaction Analysis":
+            deep_mode = st.checkbox(
+                "Deep analysis (one call per subsegment)",
+                help="Analyze every subsegment separately, then merge them into the segment verdict and flag subsegments that diverge",
+            )
+        if analysis_type == "Reaction Analysis" and not deep_mode:
+            scores_mode = st.checkbox(
+                "Scores only",
+                help="Return just the verdicts, 0-100 engagement and sentiment scores and the top trigger: much faster and cheaper when scoring many posts",
+            )
+        if (
+            analysis_type == "Reaction Analysis"
+            and len(selected_segments) > 1
+            and not (deep_mode or scores_mode)
+        ):
+            combined_mode = st.checkbox(
+                "Combined request (one call for all segments)",
+                help="Analyze every selected segment in a single structured JSON request",
+            )
+
         analyze_button = st.button(
             "🚀 Analyze Content",
             type="primary",
             disabled=not (api_key and content_input and selected_segments),
         )
+        background_button = st.button(
+            "📤 Run in Background",
+            disabled=not (api_key and content_input and selected_segments)
+            or deep_mode
+            or combined_mode,
+            help="Queue this analysis on the server: closing the tab or rerunning does not stop it, and results are kept as each step finishes",
+        )
+        if background_button:
+            job_id = submit_job(
+                analysis_type,
+                selected_segments,
+                content_input,
+                api_key,
+                options,
+                scores=scores_mode,
+            )
+            st.toast(f"Queued job {job_id}; follow it under 🗂️ Background Jobs")
 
     with col2:
         st.header("📊 Analysis Results")
 
+        # Results survive reruns; only segments without one are sent to the API
+        memo = st.session_state.setdefault("analysis_results", {})
+        memo_keys = analysis_memo_keys(
+            analysis_type,
+            selected_segments,
+            content_input,
+            options.high_quality,
+            deep=deep_mode,
+            scores=scores_mode,
+            combined=combined_mode,
+        )
+        requery = st.session_state.setdefault("requery", set())
+        if analyze_button and not options.use_cache:
+            # Bypassing the cache asks the API again, remembered results too
+            for key in memo_keys.values():
+                requery_result(key)
+        has_results = any(key in memo or key in requery for key in memo_keys.values())
+
+        if analyze_button and page_deadline:
+            # The clock starts at the click; every call below shares it
+            options = replace(options, deadline=time.monotonic() + page_deadline)
+        tasks = analysis_tasks(
+            analysis_type,
+            selected_segments,
+            content_input,
+            api_key,
+            options,
+            scores=scores_mode,
+        )
+        prefetcher = get_prefetcher()
+        if (
+            speculative_mode
+            and not analyze_button
+            and api_key
+            and content_input
+            and selected_segments
+            and not (deep_mode or combined_mode)
+        ):
+            # Start what Analyze would run; new inputs cancel the old guesses
+            prefetcher.prefetch(
+                options.session_id,
+                {
+                    memo_keys[name]: task
+                    for name, task in tasks.items()
+                    if memo_keys[name] not in memo
+                },
+                options,
+            )
+        elif not analyze_button:
+            prefetcher.cancel(options.session_id)
+
         if not api_key:
             st.info(
                 "👈 Please enter your OpenAI API key in the sidebar to start analyzing"
@@ -518,19 +3177,40 @@ def main():
             st.info("👈 Please enter some content to analyze")
         elif not selected_segments:
             st.info("👈 Please select at least one Iraqi segment")
-        elif analyze_button:
+        elif analyze_button or has_results:
+            # Seconds per finished call, logged with each result
+            timings = {}
+            # A plain rerun only redraws; API calls wait for the Analyze button
+            missing = [
+                name
+                for name, key in memo_keys.items()
+                if key not in memo and (analyze_button or key in requery)
+            ]
+            if missing and options.use_cache:
+                missing = reuse_near_duplicates(
+                    memo, memo_keys, missing, content_input, reuse_threshold
+                )
+            requery.difference_update(memo_keys[name] for name in missing)
+            if analyze_button:
+                # Calls still running speculatively are awaited, not repeated
+                adopted = prefetcher.adopt(
+                    options.session_id,
+                    {memo_keys[name]: tasks[name] for name in missing},
+                )
+                tasks.update((name, adopted[memo_keys[name]]) for name in missing)
 
             if analysis_type == "Reaction Analysis":
                 # Create tabs for each segment
                 if len(selected_segments) > 1:
                     tabs = st.tabs(selected_segments)
+                    placeholders = {}
 
                     for i, segment in enumerate(selected_segments):
                         with tabs[i]:
                             st.subheader(f"👥 {segment}")
 
                             # Show segment overview
-                            segment_info = AUDIENCE_SEGMENTS[segment]
+                            segment_info = catalog.segments[segment]
                             with st.expander("📋 Segment Details"):
                                 col_a, col_b = st.columns(2)
                                 with col_a:
@@ -546,25 +3226,81 @@ def main():
                                         f"**Top Keywords:** {', '.join(segment_info['keywords'][:2])}"
                                     )
 
-                            with st.spinner(f"Analyzing {segment} reaction..."):
-                                result = analyze_segment_reaction(
-                                    segment,
-                                    AUDIENCE_SEGMENTS[segment],
+                            offer_requery(memo_keys[segment])
+                            placeholders[segment] = st.empty()
+                            show_memoized(
+                                placeholders[segment],
+                                memo,
+                                memo_keys[segment],
+                                analyze_button,
+                                f"Analyzing {segment} reaction...",
+                            )
+
+                    if deep_mode and missing:
+                        render_deep_reactions(
+                            placeholders,
+                            missing,
+                            content_input,
+                            api_key,
+                            options,
+                            memo,
+                            memo_keys,
+                            max_workers=subsegment_concurrency,
+                        )
+                    elif combined_mode and missing:
+                        with st.spinner(
+                            f"Analyzing {len(missing)} segment reactions in one request..."
+                        ):
+                            results = _timed(
+                                timings,
+                                "combined",
+                                analyze_segments_combined,
+                                missing,
+                                content_input,
+                                api_key,
+                                options=options,
+                            )
+                        for segment, result in results.items():
+                            render_result(placeholders[segment], result)
+                            remember_result(
+                                memo,
+                                memo_keys[segment],
+                                result,
+                                content_input,
+                                timings["combined"],
+                            )
+                    elif missing:
+                        # Dispatch every segment at once and fill tabs as they finish
+                        segment_tasks = {segment: tasks[segment] for segment in missing}
+                        with st.spinner(
+                            f"Analyzing {len(missing)} segment reactions..."
+                        ):
+                            for segment, result in run_concurrently(
+                                segment_tasks,
+                                max_concurrency,
+                                on_token=(
+                                    stream_to_placeholders(placeholders)
+                                    if stream_output
+                                    else None
+                                ),
+                                deadline=options.deadline,
+                                timings=timings,
+                            ):
+                                render_result(placeholders[segment], result)
+                                remember_result(
+                                    memo,
+                                    memo_keys[segment],
+                                    result,
                                     content_input,
-                                    api_key,
+                                    timings.get(segment),
                                 )
-
-                                if result.startswith("Error:"):
-                                    st.error(result)
-                                else:
-                                    st.write(result)
                 else:
                     # Single segment analysis
                     segment = selected_segments[0]
                     st.subheader(f"👥 {segment}")
 
                     # Show segment overview
-                    segment_info = AUDIENCE_SEGMENTS[segment]
+                    segment_info = catalog.segments[segment]
                     with st.expander("📋 Segment Details"):
                         col_a, col_b = st.columns(2)
                         with col_a:
@@ -578,61 +3314,140 @@ def main():
                                 f"**Key Platforms:** {', '.join(segment_info['platforms'][:3])}"
                             )
 
-                    with st.spinner(f"Analyzing {segment} reaction..."):
-                        result = analyze_segment_reaction(
-                            segment, AUDIENCE_SEGMENTS[segment], content_input, api_key
+                    if deep_mode:
+                        offer_requery(memo_keys[segment])
+                        placeholders = {segment: st.empty()}
+                        show_memoized(
+                            placeholders[segment],
+                            memo,
+                            memo_keys[segment],
+                            analyze_button,
+                            f"Analyzing {segment} subsegments...",
+                        )
+                        if missing:
+                            render_deep_reactions(
+                                placeholders,
+                                missing,
+                                content_input,
+                                api_key,
+                                options,
+                                memo,
+                                memo_keys,
+                                max_workers=subsegment_concurrency,
+                            )
+                    else:
+                        render_single(
+                            tasks[segment],
+                            memo,
+                            memo_keys[segment],
+                            bool(missing),
+                            stream_output,
+                            f"Analyzing {segment} reaction...",
+                            content_input,
                         )
-
-                        if result.startswith("Error:"):
-                            st.error(result)
-                        else:
-                            st.write(result)
 
             elif analysis_type == "Content Enhancement":
                 st.subheader("✨ Enhanced Content for Iraqi Segments")
 
-                with st.spinner("Enhancing content for selected Iraqi segments..."):
-                    result = enhance_content_for_segments(
-                        content_input, selected_segments, api_key
-                    )
-
-                    if result.startswith("Error:"):
-                        st.error(result)
-                    else:
-                        st.write(result)
+                render_single(
+                    tasks["enhancement"],
+                    memo,
+                    memo_keys["enhancement"],
+                    bool(missing),
+                    stream_output,
+                    "Enhancing content for selected Iraqi segments...",
+                    content_input,
+                )
 
             elif analysis_type == "Iraqi Arabic Adaptation":
                 if len(selected_segments) > 1:
                     tabs = st.tabs(selected_segments)
+                    placeholders = {}
 
                     for i, segment in enumerate(selected_segments):
                         with tabs[i]:
                             st.subheader(f"🔤 Arabic Version for {segment}")
 
-                            with st.spinner(
-                                f"Creating Iraqi Arabic version for {segment}..."
-                            ):
-                                result = generate_iraqi_arabic_content(
-                                    content_input, segment, api_key
-                                )
+                            offer_requery(memo_keys[segment])
+                            placeholders[segment] = st.empty()
+                            show_memoized(
+                                placeholders[segment],
+                                memo,
+                                memo_keys[segment],
+                                analyze_button,
+                                f"Creating Iraqi Arabic version for {segment}...",
+                            )
 
-                                if result.startswith("Error:"):
-                                    st.error(result)
-                                else:
-                                    st.write(result)
+                    segment_tasks = {segment: tasks[segment] for segment in missing}
+                    with st.spinner(
+                        f"Creating Iraqi Arabic versions for {len(missing)} segments..."
+                    ):
+                        for segment, result in run_concurrently(
+                            segment_tasks,
+                            max_concurrency,
+                            on_token=(
+                                stream_to_placeholders(placeholders)
+                                if stream_output
+                                else None
+                            ),
+                            deadline=options.deadline,
+                            timings=timings,
+                        ):
+                            render_result(placeholders[segment], result)
+                            remember_result(
+                                memo,
+                                memo_keys[segment],
+                                result,
+                                content_input,
+                                timings.get(segment),
+                            )
                 else:
                     segment = selected_segments[0]
                     st.subheader(f"🔤 Arabic Version for {segment}")
 
-                    with st.spinner(f"Creating Iraqi Arabic version for {segment}..."):
-                        result = generate_iraqi_arabic_content(
-                            content_input, segment, api_key
-                        )
+                    render_single(
+                        tasks[segment],
+                        memo,
+                        memo_keys[segment],
+                        bool(missing),
+                        stream_output,
+                        f"Creating Iraqi Arabic version for {segment}...",
+                        content_input,
+                    )
 
-                        if result.startswith("Error:"):
-                            st.error(result)
-                        else:
-                            st.write(result)
+            elif analysis_type == FULL_CAMPAIGN:
+                render_campaign(
+                    selected_segments,
+                    content_input,
+                    api_key,
+                    options,
+                    memo,
+                    memo_keys,
+                    missing,
+                    tasks,
+                    analyze_button,
+                    stream_output,
+                    max_concurrency,
+                )
+
+    with st.expander(
+        "🏆 Variant Tournament", expanded="tournament" in st.session_state
+    ):
+        render_tournament(
+            selected_segments, api_key, options, max_concurrency, page_deadline
+        )
+
+    if api_key:
+        jobs = get_job_queue().jobs(owner_of(api_key))
+        active = any(job.active for job in jobs)
+        with st.expander("🗂️ Background Jobs", expanded=active):
+            # Only this panel reruns while it polls
+            st.fragment(render_jobs, run_every=JOB_POLL_SECONDS if active else None)(
+                api_key
+            )
+
+    with st.expander("📚 Run History"):
+        render_history(catalog)
 
     # Segment comparison table
     if selected_segments and len(selected_segments) > 1:
@@ -640,7 +3455,7 @@ def main():
 
         comparison_data = []
         for segment in selected_segments:
-            segment_info = AUDIENCE_SEGMENTS[segment]
+            segment_info = catalog.segments[segment]
             comparison_data.append(
                 {
                     "Segment": segment,
@@ -668,60 +3483,18 @@ def main():
                 }
             )
 
+        # Deferred so everything above renders before pandas is loaded
+        import pandas as pd
+
         df = pd.DataFrame(comparison_data)
         st.dataframe(df, use_container_width=True)
 
+    with performance_panel:
+        render_performance_panel(options.session_id)
+
     # Enhanced tips section for Iraqi context
     with st.expander("💡 Iraqi Remittance Marketing Tips"):
-        st.markdown(
-            """
-        ### Segment-Specific Strategy:
-        
-        **🎓 Iraqi Students Abroad**
-        - Focus on family emotional connection and educational dreams
-        - Highlight fast transfers for tuition deadlines
-        - Use mix of Arabic and English to show cultural bridge
-        - Emphasize security and parental peace of mind
-        
-        **👷 Iraqi Workers Abroad**
-        - Stress reliability and family obligation fulfillment
-        - Show impact on family back home (medical care, education)
-        - Use traditional values and community pride messaging
-        - Highlight low fees and delivery confirmation
-        
-        **🏠 Iraqi Diaspora Community**
-        - Focus on cultural preservation and community events
-        - Emphasize long-term relationships and trust
-        - Show support for cultural institutions and traditions
-        - Use community testimonials and success stories
-        
-        **💻 Freelancers & Remote Workers**
-        - Highlight speed of USD access and conversion
-        - Focus on business growth and global opportunities
-        - Emphasize modern, tech-forward solutions
-        - Show integration with freelance platforms
-        
-        **🏢 Business Owners & Importers**
-        - Stress efficiency and business continuity
-        - Focus on supplier relationships and growth
-        - Highlight compliance and security features
-        - Show cost savings and time benefits
-        
-        **🛒 Digital Entrepreneurs**
-        - Focus on scaling online business and market access
-        - Highlight payment processing and international sales
-        - Emphasize modern solutions for modern businesses
-        - Show integration with e-commerce platforms
-        
-        ### Cultural Considerations:
-        - **Family Values**: Always emphasize family support and connection
-        - **Trust**: Use testimonials from Iraqi community members
-        - **Religious Sensitivity**: Ensure halal/Islamic compliance messaging
-        - **Language**: Mix Arabic phrases with English for authentic feel
-        - **Visuals**: Use Iraqi flag colors, cultural symbols, family imagery
-        - **Timing**: Consider Iraqi holidays, Ramadan, and cultural events
-        """
-        )
+        st.markdown(MARKETING_TIPS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+st = pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+from mock_openai_server import MockOpenAIServer, MockSettings
+
+APP = os.path.join(os.path.dirname(os.path.dirname(__file__)), "streamlit_app.py")
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # The app keeps its caches, index and history under ./.cache
+    monkeypatch.chdir(tmp_path)
+    server = MockOpenAIServer(
+        settings=MockSettings(ttft_median_ms=5, tokens_per_second=5000, seed=1)
+    ).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    yield server
+    server.stop()
+    st.cache_resource.clear()
+
+
+def analyze(at):
+    [button] = [b for b in at.button if "Analyze Content" in b.label]
+    button.click().run()
+    assert not at.exception
+
+
+def test_reanalyzed_enhancement_regenerates_arabic_adaptations(server):
+    at = AppTest.from_file(APP, default_timeout=120).run()
+    at.sidebar.text_input[0].set_value("sk-test").run()
+    at.radio[0].set_value("Full Campaign").run()
+    post = at.selectbox[0].options[1]
+    at.selectbox[0].set_value(post).run()
+    analyze(at)
+
+    # A near-duplicate reuses the first post's enhancement
+    at.text_area[0].set_value(post + "!").run()
+    analyze(at)
+    [requery] = [b for b in at.button if "Content Enhancement" in (b.key or "")]
+    requests = server.stats.snapshot()["requests"]
+
+    requery.click().run()
+
+    assert not at.exception
+    assert server.stats.snapshot()["requests"] > requests
+    pending = [
+        i.value
+        for i in at.info
+        if "Press 🚀 Analyze" in i.value or "Waiting" in i.value
+    ]
+    assert pending == []
@@ -0,0 +1,46 @@
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+import batch_runner
+from batch_runner import SCORE_FIELDS, SCORES_ANALYSIS, _ParquetSink
+
+
+def row(status, **scores):
+    return dict(
+        task_id="t",
+        post_id="p",
+        content="post",
+        analysis_type=SCORES_ANALYSIS,
+        segment="Freelancers",
+        status=status,
+        result="{}",
+        elapsed_seconds=0.5,
+        completed_at="2026-01-01T00:00:00+00:00",
+        **dict(dict.fromkeys(SCORE_FIELDS), **scores),
+    )
+
+
+def test_score_columns_keep_their_types_after_an_all_error_row_group(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(batch_runner, "PARQUET_BATCH_SIZE", 1)
+    path = str(tmp_path / "out.parquet")
+    sink = _ParquetSink(path, scores_only=True)
+
+    sink.write(row("error"))
+    sink.write(
+        row(
+            "ok",
+            engagement_level="High",
+            emotional_response="Positive",
+            engagement_score=80,
+            sentiment_score=70,
+            top_trigger="price",
+        )
+    )
+    sink.close()
+
+    table = pq.read_table(path)
+    assert str(table.schema.field("engagement_score").type) == "int64"
+    assert table.column("engagement_score").to_pylist() == [None, 80]
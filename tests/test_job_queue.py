@@ -0,0 +1,163 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, owner_of
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+class Runner:
+    """Runs a job's spec["steps"]; steps listed in fail error out once. With a
+    gate each step waits for it, giving up on cancellation if stoppable"""
+
+    def __init__(self, fail=(), gate=None, stoppable=True):
+        self.fail = set(fail)
+        self.gate = gate
+        self.stoppable = stoppable
+        self.started = []
+        self.cancel_events = []
+
+    def __call__(self, job, api_key, done, cancel_event):
+        self.cancel_events.append(cancel_event)
+        for step in job.spec["steps"]:
+            if step in done:
+                continue
+            self.started.append(step)
+            if self.gate is not None:
+                while not self.gate.wait(0.01):
+                    if self.stoppable and cancel_event.is_set():
+                        return
+            if step in self.fail:
+                self.fail.discard(step)
+                yield step, "Error: flaky", 0.0
+            else:
+                yield step, f"result of {step} for {api_key}", 0.0
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def submit(queue, steps, api_key="sk-a"):
+    return queue.submit({"steps": steps}, len(steps), api_key)
+
+
+def test_job_runs_every_step_and_drops_its_key(path):
+    queue = JobQueue(Runner(), path=path, max_workers=1)
+    job_id = submit(queue, ["a", "b"])
+
+    wait_for(lambda: queue.get(job_id).status == "done")
+
+    assert queue.results(job_id) == {
+        "a": "result of a for sk-a",
+        "b": "result of b for sk-a",
+    }
+    job = queue.get(job_id)
+    assert (job.done, job.failed, job.total) == (2, 0, 2)
+    assert queue.waiting_for_key(job_id)
+
+
+def test_failed_steps_are_retried_on_resume_only(path):
+    runner = Runner(fail={"b"})
+    queue = JobQueue(runner, path=path, max_workers=1)
+    job_id = submit(queue, ["a", "b", "c"])
+
+    wait_for(lambda: queue.get(job_id).status == "failed")
+    assert queue.get(job_id).failed == 1
+
+    assert queue.resume(job_id, "sk-a")
+    wait_for(lambda: queue.get(job_id).status == "done")
+
+    assert runner.started == ["a", "b", "c", "b"]
+    assert queue.results(job_id)["b"] == "result of b for sk-a"
+
+
+def test_finished_jobs_cannot_be_resumed(path):
+    queue = JobQueue(Runner(), path=path, max_workers=1)
+    job_id = submit(queue, ["a"])
+    wait_for(lambda: queue.get(job_id).status == "done")
+
+    assert not queue.resume(job_id, "sk-a")
+    assert queue.get(job_id).status == "done"
+    assert queue.waiting_for_key(job_id)
+
+
+def test_cancelled_job_resumes_only_after_its_worker_stops(path):
+    gate = threading.Event()
+    # The worker stays inside the job until the gate opens, cancelled or not
+    runner = Runner(gate=gate, stoppable=False)
+    queue = JobQueue(runner, path=path, max_workers=2)
+    job_id = submit(queue, ["a", "b"])
+    wait_for(lambda: runner.started == ["a"])
+
+    queue.cancel(job_id)
+    assert runner.cancel_events[0].is_set()
+    assert queue.get(job_id).status == "cancelled"
+    assert not queue.resume(job_id, "sk-a")
+    assert queue.get(job_id).status == "cancelled"
+
+    gate.set()
+    wait_for(lambda: queue.resume(job_id, "sk-a"))
+    wait_for(lambda: queue.get(job_id).status == "done")
+    # The step finished after the cancel was discarded, then redone once
+    assert runner.started == ["a", "a", "b"]
+    # Only one run ever worked on the job at a time
+    assert len(runner.cancel_events) == 2
+    assert not runner.cancel_events[1].is_set()
+
+
+def test_cancel_reaches_the_resumed_run(path):
+    gate = threading.Event()
+    runner = Runner(gate=gate)
+    queue = JobQueue(runner, path=path, max_workers=2)
+    job_id = submit(queue, ["a"])
+    wait_for(lambda: len(runner.cancel_events) == 1)
+
+    queue.cancel(job_id)
+    wait_for(lambda: queue.resume(job_id, "sk-a"))
+    wait_for(lambda: len(runner.cancel_events) == 2)
+
+    queue.cancel(job_id)
+    assert runner.cancel_events[1].is_set()
+    assert queue.get(job_id).status == "cancelled"
+    wait_for(lambda: queue.resume(job_id, "sk-a"))
+    gate.set()
+    wait_for(lambda: queue.get(job_id).status == "done")
+
+
+def test_restart_requeues_running_jobs_until_a_key_is_supplied(path):
+    gate = threading.Event()
+    first = JobQueue(Runner(gate=gate), path=path, max_workers=1)
+    job_id = submit(first, ["a", "b"])
+    wait_for(lambda: first.get(job_id).status == "running")
+
+    # A second process opening the same file sees the job as interrupted
+    runner = Runner()
+    second = JobQueue(runner, path=path, max_workers=1)
+    assert second.get(job_id).status == "queued"
+    assert second.waiting_for_key(job_id)
+    time.sleep(0.05)
+    assert runner.started == []
+
+    assert second.resume(job_id, "sk-b")
+    wait_for(lambda: second.get(job_id).status == "done")
+    assert second.results(job_id)["a"] == "result of a for sk-b"
+    first.cancel(job_id)
+    gate.set()
+
+
+def test_jobs_are_listed_per_owner(path):
+    queue = JobQueue(Runner(), path=path, max_workers=1)
+    mine = submit(queue, ["a"], api_key="sk-a")
+    submit(queue, ["a"], api_key="sk-b")
+
+    assert [job.id for job in queue.jobs(owner_of("sk-a"))] == [mine]
@@ -0,0 +1,19 @@
+from streamlit_app import (
+    COMBINED_ANALYSIS,
+    analysis_memo_keys,
+    get_model_router,
+)
+
+SEGMENTS = ["Iraqi Students Abroad", "Iraqi Workers Abroad"]
+
+
+def test_combined_reactions_are_keyed_apart_from_per_segment_ones():
+    single = analysis_memo_keys("Reaction Analysis", SEGMENTS, "post", False)
+    combined = analysis_memo_keys(
+        "Reaction Analysis", SEGMENTS, "post", False, combined=True
+    )
+
+    route = get_model_router().label("analyze_segments_combined")
+    for segment in SEGMENTS:
+        assert combined[segment] != single[segment]
+        assert combined[segment][2:] == (COMBINED_ANALYSIS, route)
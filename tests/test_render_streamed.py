@@ -0,0 +1,33 @@
+import threading
+import time
+
+import pytest
+
+from streamlit_app import render_streamed
+
+
+class Interrupted(Exception):
+    pass
+
+
+class Container:
+    """Stands in for a placeholder whose script is stopped mid-stream"""
+
+    def write_stream(self, stream):
+        next(stream)
+        raise Interrupted
+
+
+def test_interrupted_stream_does_not_wait_for_the_model():
+    release = threading.Event()
+
+    def task(on_token):
+        on_token("Hello")
+        release.wait(5)
+        return "Hello world"
+
+    started = time.monotonic()
+    with pytest.raises(Interrupted):
+        render_streamed(Container(), task)
+    assert time.monotonic() - started < 1
+    release.set()
@@ -0,0 +1,179 @@
+import email.utils
+
+import httpx
+import openai
+import pytest
+
+import request_scheduler
+from request_scheduler import (
+    AdaptiveLimiter,
+    RequestScheduler,
+    TokenBucket,
+    is_retryable,
+    retry_after_seconds,
+)
+
+
+class Clock:
+    """Stands in for the time module, moving only when told to"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(request_scheduler, "time", clock)
+    return clock
+
+
+def response(status, headers=None):
+    request = httpx.Request("POST", "https://api.example.test/v1/chat/completions")
+    return httpx.Response(status, headers=headers or {}, request=request)
+
+
+def rate_limited(headers=None):
+    return openai.RateLimitError(
+        "rate limited", response=response(429, headers), body=None
+    )
+
+
+def test_token_bucket_refills_continuously_up_to_capacity(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+
+    assert bucket.try_acquire(10)
+    assert not bucket.try_acquire(1)
+    clock.now += 2.5
+    assert bucket.try_acquire(5)
+    assert not bucket.try_acquire(1)
+    clock.now += 3600
+    assert bucket.try_acquire(10)
+    assert not bucket.try_acquire(1)
+
+
+def test_oversized_request_waits_only_for_a_full_bucket(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+
+    bucket.acquire(50)
+
+    assert not bucket.try_acquire(1)
+
+
+def test_adaptive_limiter_halves_on_throttling_and_grows_back_by_one():
+    limiter = AdaptiveLimiter(max_limit=8, min_limit=1)
+
+    for expected in (4, 2, 1, 1):
+        limiter.acquire()
+        limiter.release(throttled=True)
+        assert limiter.limit == expected
+    for expected in (2, 3):
+        limiter.acquire()
+        limiter.release()
+        assert limiter.limit == expected
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.parametrize(
+    "headers, seconds",
+    [
+        ({"retry-after-ms": "1500"}, 1.5),
+        ({"retry-after": "7"}, 7.0),
+        ({"retry-after-ms": "250", "retry-after": "7"}, 0.25),
+        ({"retry-after": "soon"}, None),
+        ({}, None),
+    ],
+)
+def test_retry_after_headers(clock, headers, seconds):
+    assert retry_after_seconds(rate_limited(headers)) == seconds
+
+
+def test_retry_after_http_date(clock):
+    at = email.utils.formatdate(clock.now + 30, usegmt=True)
+    assert retry_after_seconds(rate_limited({"retry-after": at})) == 30
+    past = email.utils.formatdate(clock.now - 30, usegmt=True)
+    assert retry_after_seconds(rate_limited({"retry-after": past})) == 0
+
+
+def test_retry_after_without_a_response():
+    assert retry_after_seconds(ValueError("no response")) is None
+
+
+def test_only_transient_failures_are_retryable():
+    request = httpx.Request("POST", "https://api.example.test")
+    assert is_retryable(rate_limited())
+    assert is_retryable(openai.APIConnectionError(request=request))
+    assert is_retryable(
+        openai.InternalServerError("down", response=response(503), body=None)
+    )
+    assert not is_retryable(
+        openai.BadRequestError("bad", response=response(400), body=None)
+    )
+    assert not is_retryable(ValueError("bad output"))
+
+
+def scheduler(**kwargs):
+    scheduler = RequestScheduler(rpm=600, tpm=100_000, **kwargs)
+    # Deterministic: only Retry-After decides how long to wait
+    scheduler._backoff = lambda retry_state: 0.0
+    return scheduler
+
+
+def test_retries_honour_retry_after_and_pause_every_caller(clock, monkeypatch):
+    # tenacity sleeps through its own module
+    monkeypatch.setattr("tenacity.nap.time", clock)
+    calls = []
+    retried = []
+
+    def fn():
+        calls.append(clock.now)
+        if len(calls) < 3:
+            raise rate_limited({"retry-after": "2"})
+        return "ok"
+
+    s = scheduler(max_in_flight=8)
+    result = s.call(fn, on_retry=lambda attempt, e: retried.append(attempt))
+
+    assert result == "ok"
+    assert retried == [1, 2]
+    assert (s.retries, s.throttled) == (2, 2)
+    assert calls[1] - calls[0] >= 2
+    assert s._paused_until >= calls[0] + 2
+    # Two throttles halved the cap twice, the success grew it back by one
+    assert s.limiter.limit == 3
+
+
+def test_non_retryable_errors_are_raised_at_once(clock):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise openai.BadRequestError("bad", response=response(400), body=None)
+
+    with pytest.raises(openai.BadRequestError):
+        scheduler().call(fn)
+    assert calls == [1]
+
+
+def test_retries_stop_after_max_retries(clock, monkeypatch):
+    monkeypatch.setattr("tenacity.nap.time", clock)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise rate_limited()
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler(max_retries=2).call(fn)
+    assert len(calls) == 3
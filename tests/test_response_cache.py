@@ -0,0 +1,103 @@
+import pytest
+
+import response_cache
+from response_cache import (
+    ResponseCache,
+    make_cache_key,
+    open_snapshot,
+    write_snapshot,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+def cache(tmp_path, **kwargs):
+    kwargs.setdefault("snapshot_path", None)
+    return ResponseCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_keys_cover_every_request_parameter_and_the_endpoint():
+    base = ("analyze", "gpt-4", 0.7, 500, "prompt")
+    key = make_cache_key(*base)
+
+    assert make_cache_key(*base) == key
+    for changed in [
+        ("other", "gpt-4", 0.7, 500, "prompt"),
+        ("analyze", "gpt-4o-mini", 0.7, 500, "prompt"),
+        ("analyze", "gpt-4", 0.0, 500, "prompt"),
+        ("analyze", "gpt-4", 0.7, 600, "prompt"),
+        ("analyze", "gpt-4", 0.7, 500, "prompt!"),
+    ]:
+        assert make_cache_key(*changed) != key
+    mock = make_cache_key(*base, base_url="http://localhost:8000/v1")
+    assert mock != key
+    assert make_cache_key(*base, base_url="http://localhost:8000/v1/") == mock
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    responses = cache(tmp_path, ttl_seconds=60)
+    responses.set("k", "answer")
+
+    clock.now += 59
+    assert responses.get("k") == "answer"
+    clock.now += 2
+    assert responses.get("k") is None
+    assert len(responses) == 0
+
+
+def test_writes_evict_expired_entries(tmp_path, clock):
+    responses = cache(tmp_path, ttl_seconds=60)
+    responses.set("old", "answer")
+    clock.now += 61
+
+    responses.set("new", "answer")
+
+    assert len(responses) == 1
+
+
+def test_size_limit_evicts_the_least_recently_used(tmp_path, clock):
+    responses = cache(tmp_path, max_entries=2, ttl_seconds=0)
+    responses.set("a", "A")
+    clock.now += 1
+    responses.set("b", "B")
+    clock.now += 1
+    # Reading a makes b the least recently used
+    assert responses.get("a") == "A"
+    clock.now += 1
+
+    responses.set("c", "C")
+
+    assert [responses.get(key) for key in "abc"] == ["A", None, "C"]
+
+
+def test_snapshot_fills_misses_and_is_promoted(tmp_path, clock):
+    snapshot = str(tmp_path / "warm.sqlite3")
+    write_snapshot(snapshot, [("k", "analyze", "gpt-4", "warm")], {"revision": "x"})
+    responses = cache(tmp_path, snapshot_path=snapshot)
+
+    assert responses.get("k") == "warm"
+    assert responses.get("missing") is None
+    assert [row[0] for row in responses.rows()] == ["k"]
+
+
+def test_snapshots_from_another_format_are_ignored(tmp_path, monkeypatch):
+    snapshot = str(tmp_path / "warm.sqlite3")
+    monkeypatch.setattr(response_cache, "SNAPSHOT_FORMAT_VERSION", 1)
+    write_snapshot(snapshot, [("k", "analyze", "gpt-4", "warm")], {})
+    monkeypatch.undo()
+
+    assert open_snapshot(snapshot) is None
+    assert cache(tmp_path, snapshot_path=snapshot).get("k") is None
@@ -0,0 +1,78 @@
+import pytest
+
+from run_history import RunHistory, fold, match_query
+
+
+@pytest.fixture
+def history(tmp_path):
+    return RunHistory(str(tmp_path / "history.sqlite3"))
+
+
+def add(history, content, output="", segments=("Freelancers",), **kwargs):
+    kwargs.setdefault("analysis_type", "Reaction Analysis")
+    kwargs.setdefault("model", "gpt-4")
+    return history.add("hash", content, list(segments), output=output, **kwargs)
+
+
+def test_fold_ignores_case_width_and_arabic_spelling():
+    assert fold("Ｒemittance") == "remittance"
+    # Diacritics and tatweel go; hamza alefs, alef maksura and teh marbuta fold
+    assert fold("حَوَالـــة") == "حواله"
+    assert fold("إرسال أموال إلى") == "ارسال اموال الي"
+
+
+def test_match_query_prefixes_every_word():
+    assert match_query("send Money") == '"send"* "money"*'
+    assert match_query("  ! ") is None
+
+
+@pytest.mark.parametrize(
+    "stored, keyword",
+    [
+        ("حوالة مالية للأهل", "حواله"),
+        ("حوالة مالية للأهل", "حَوالة"),
+        ("إرسال الأموال", "ارسال"),
+        ("ارسال الاموال", "إرسال"),
+        ("Send money home", "MON"),
+    ],
+)
+def test_keyword_search_folds_arabic_spellings(history, stored, keyword):
+    add(history, stored)
+    add(history, "unrelated post")
+
+    assert [run.content for run in history.search(keyword=keyword)] == [stored]
+
+
+def test_keywords_match_outputs_and_every_word(history):
+    add(history, "post one", output="ENGAGEMENT LEVEL: High")
+    add(history, "post two", output="ENGAGEMENT LEVEL: Low")
+
+    assert history.count(keyword="engagement") == 2
+    assert history.count(keyword="engagement high") == 1
+
+
+def test_filters_combine_and_enhancements_match_each_segment(history):
+    add(history, "a", engagement_level="High")
+    add(
+        history,
+        "b",
+        segments=["Students", "Freelancers"],
+        analysis_type="Content Enhancement",
+    )
+    add(history, "c", segments=["Students"], engagement_level="Low")
+
+    assert history.count(segments=["Freelancers"]) == 2
+    assert history.count(segments=["Students"], engagement_level="Low") == 1
+    assert history.count(analysis_type="Content Enhancement") == 1
+    [run] = history.search(segments=["Students"], analysis_type="Content Enhancement")
+    assert run.segment == "Students, Freelancers"
+
+
+def test_pages_run_newest_first(history):
+    ids = [add(history, f"post {i}") for i in range(5)]
+
+    first = history.search(limit=2)
+    second = history.search(limit=2, before_id=first[-1].id)
+    last = history.search(limit=2, before_id=second[-1].id)
+
+    assert [run.id for run in first + second + last] == ids[::-1]
@@ -0,0 +1,83 @@
+import random
+import sqlite3
+
+import numpy as np
+
+from similarity_index import (
+    NUM_PERMUTATIONS,
+    NearDuplicateIndex,
+    minhash,
+    shingles,
+)
+
+
+def exact_jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def estimated_jaccard(a, b):
+    return np.count_nonzero(minhash(a) == minhash(b)) / NUM_PERMUTATIONS
+
+
+def edited_pairs(count, seed=0):
+    """Random posts paired with copies that have some words swapped out"""
+
+    rng = random.Random(seed)
+    words = [
+        "".join(rng.choices("abcdefghij", k=rng.randint(3, 8))) for _ in range(400)
+    ]
+    for _ in range(count):
+        post = rng.choices(words, k=40)
+        edited = list(post)
+        for i in rng.sample(range(len(post)), rng.randint(1, 12)):
+            edited[i] = rng.choice(words)
+        yield " ".join(post), " ".join(edited)
+
+
+def test_estimate_tracks_exact_shingle_jaccard():
+    errors = [
+        estimated_jaccard(a, b) - exact_jaccard(a, b) for a, b in edited_pairs(200)
+    ]
+
+    # 128 independent permutations give a standard error of at most ~0.045
+    assert abs(np.mean(errors)) < 0.02
+    assert np.std(errors) < 0.06
+    assert max(abs(e) for e in errors) < 0.2
+
+
+def test_small_edits_keep_a_high_estimate():
+    post = "Our new budgeting app helps freelancers track invoices and taxes."
+    edited = post + "!! 🎉"
+
+    assert abs(estimated_jaccard(post, edited) - exact_jaccard(post, edited)) < 0.15
+    assert estimated_jaccard(post, post.upper()) == 1.0
+
+
+def test_lookup_returns_near_duplicates_only(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "index.sqlite3"))
+    post = "Launching our remote-work toolkit today: async standups, focus timers and more."
+    index.add(post, "Freelancers", "p1", "reaction", "gpt-4", "stored result")
+
+    match = index.lookup(post + "!", "Freelancers", "p1", "reaction", "gpt-4", 0.8)
+    assert match.result == "stored result"
+    assert match.similarity >= 0.8
+    assert index.lookup(post, "Freelancers", "p2", "reaction", "gpt-4", 0.8) is None
+    assert (
+        index.lookup(
+            "Something else entirely", "Freelancers", "p1", "reaction", "gpt-4", 0.8
+        )
+        is None
+    )
+
+
+def test_signatures_from_an_older_version_are_discarded(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = NearDuplicateIndex(path)
+    index.add("a post", "Freelancers", "p1", "reaction", "gpt-4", "result")
+    index._conn.execute("PRAGMA user_version = 1")
+    index._conn.close()
+
+    assert len(NearDuplicateIndex(path)) == 0
+    (version,) = sqlite3.connect(path).execute("PRAGMA user_version").fetchone()
+    assert version > 1
@@ -0,0 +1,187 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class Personal(Exception):
+    pass
+
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_identical_calls_share_one_upstream_call():
+    flight = SingleFlight(poll_interval=0.01)
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fn(on_token):
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads = [start(lambda: results.append(flight.run("key", fn))) for _ in range(5)]
+    while flight.calls == 0:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 4
+    assert flight.saved == 4
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+
+    assert flight.run("a", lambda on_token: "A") == ("A", False)
+    assert flight.run("b", lambda on_token: "B") == ("B", False)
+    assert flight.calls == 2
+
+
+def test_leader_error_is_shared_with_waiters():
+    flight = SingleFlight(poll_interval=0.01)
+    release = threading.Event()
+    errors = []
+
+    def fn(on_token):
+        release.wait(5)
+        raise RuntimeError("upstream failed")
+
+    def call():
+        try:
+            flight.run("key", fn)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = start(call)
+    while flight.calls == 0:
+        time.sleep(0.01)
+    waiter = start(call)
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert errors == ["upstream failed", "upstream failed"]
+    assert flight.calls == 1
+
+
+def test_late_joiner_gets_streamed_text_once():
+    flight = SingleFlight(poll_interval=0.01)
+    halfway = threading.Event()
+    release = threading.Event()
+    leader_tokens, waiter_tokens = [], []
+
+    def fn(on_token):
+        on_token("Hello ")
+        halfway.set()
+        release.wait(5)
+        on_token("world")
+        return "Hello world"
+
+    leader = start(lambda: flight.run("key", fn, on_token=leader_tokens.append))
+    halfway.wait(5)
+    results = []
+    waiter = start(
+        lambda: results.append(flight.run("key", fn, on_token=waiter_tokens.append))
+    )
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert results == [("Hello world", True)]
+    assert "".join(leader_tokens) == "Hello world"
+    assert "".join(waiter_tokens) == "Hello world"
+
+
+def test_waiter_gets_unstreamed_result_through_on_token():
+    flight = SingleFlight(poll_interval=0.01)
+    release = threading.Event()
+    tokens = []
+
+    def fn(on_token):
+        release.wait(5)
+        return "whole answer"
+
+    leader = start(lambda: flight.run("key", fn))
+    while flight.calls == 0:
+        time.sleep(0.01)
+    waiter = start(lambda: flight.run("key", fn, on_token=tokens.append))
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert "".join(tokens) == "whole answer"
+
+
+def test_waiter_retries_after_personal_error_without_repeating_text():
+    flight = SingleFlight(poll_interval=0.01)
+    streamed = threading.Event()
+    release = threading.Event()
+    tokens = []
+    results = []
+
+    def leader_fn(on_token):
+        on_token("Partial ")
+        streamed.set()
+        release.wait(5)
+        raise Personal("leader cancelled")
+
+    def waiter_fn(on_token):
+        on_token("Partial ")
+        on_token("answer")
+        return "Partial answer"
+
+    def lead():
+        with pytest.raises(Personal):
+            flight.run("key", leader_fn, on_token=lambda delta: None, personal=Personal)
+
+    leader = start(lead)
+    streamed.wait(5)
+    waiter = start(
+        lambda: results.append(
+            flight.run("key", waiter_fn, on_token=tokens.append, personal=Personal)
+        )
+    )
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    # The waiter led the second flight itself
+    assert results == [("Partial answer", False)]
+    assert "".join(tokens) == "Partial answer"
+    assert flight.calls == 2
+
+
+def test_check_lets_a_waiter_give_up():
+    flight = SingleFlight(poll_interval=0.01)
+    release = threading.Event()
+
+    def fn(on_token):
+        release.wait(5)
+        return "late"
+
+    leader = start(lambda: flight.run("key", fn))
+    while flight.calls == 0:
+        time.sleep(0.01)
+
+    def check():
+        raise TimeoutError("deadline")
+
+    with pytest.raises(TimeoutError):
+        flight.run("key", fn, check=check)
+    release.set()
+    leader.join(5)
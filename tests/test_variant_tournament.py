@@ -0,0 +1,71 @@
+import pytest
+
+from variant_tournament import round_budgets, split_variants, successive_halving
+
+
+@pytest.mark.parametrize(
+    "variants, segments, finalists, budgets",
+    [
+        (2, 6, 2, []),
+        (4, 6, 2, [6]),
+        (8, 6, 2, [3, 6]),
+        (10, 6, 2, [2, 4, 6]),
+        (16, 4, 2, [1, 2, 4]),
+        (16, 2, 2, [1, 2, 2]),
+        (9, 6, 3, [3, 6]),
+    ],
+)
+def test_round_budgets_double_up_to_every_segment(
+    variants, segments, finalists, budgets
+):
+    assert round_budgets(variants, segments, finalists) == budgets
+
+
+def test_last_round_always_covers_every_segment():
+    for variants in range(3, 40):
+        for segments in range(1, 12):
+            assert round_budgets(variants, segments, 2)[-1] == segments
+
+
+def test_successive_halving_prunes_on_shared_segments():
+    segments = ["a", "b", "c", "d", "e", "f"]
+    # Variant i scores i on every segment, so higher indexes should win
+    asked = []
+
+    def score_pairs(pairs):
+        asked.append(pairs)
+        return [((index, segment), float(index)) for index, segment in pairs]
+
+    rounds = list(successive_halving(list("vwxyz"), segments, score_pairs))
+
+    final_round, finalists, entries = rounds[-1]
+    assert [entry.index for entry in finalists] == [4, 3]
+    assert [entry.eliminated_in for entry in entries] == [1, 1, 2, None, None]
+    # Survivors are scored on the new segments only, all on the same ones
+    assert asked[0] == [(i, s) for i in range(5) for s in segments[:3]]
+    assert asked[1] == [(i, s) for i in (4, 3, 2) for s in segments[3:]]
+    assert sorted(finalists[0].scores) == segments
+
+
+def test_failed_calls_are_counted_and_ties_keep_the_earlier_variant():
+    def score_pairs(pairs):
+        return [(pair, None if pair[0] == 0 else 1.0) for pair in pairs]
+
+    *_, (_, finalists, entries) = successive_halving(
+        ["p", "q", "r", "s"], ["a", "b"], score_pairs
+    )
+
+    assert [entry.index for entry in finalists] == [1, 2]
+    assert entries[0].failed == 2
+    assert entries[0].mean_score == 0.0
+
+
+def test_too_few_variants_go_straight_to_the_final():
+    rounds = list(successive_halving(["p", "q"], ["a"], lambda pairs: []))
+
+    assert [(number, len(alive)) for number, alive, _ in rounds] == [(0, 2)]
+
+
+def test_split_variants_on_separators_or_lines():
+    assert split_variants("one\n---\ntwo\nlines\n---\none") == ["one", "two\nlines"]
+    assert split_variants("a\n\nb\na") == ["a", "b"]
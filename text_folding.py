@@ -0,0 +1,12 @@
+import re
+import unicodedata
+
+# Arabic diacritics and tatweel, which change neither meaning nor spelling
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+
+
+def strip_marks(text):
+    """Case- and width-folded text without Arabic diacritics or tatweel"""
+
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _ARABIC_MARKS.sub("", text)
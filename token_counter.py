@@ -0,0 +1,52 @@
+import math
+import re
+
+# Pre-tokenizer modelled on the cl100k split: words, short digit runs,
+# punctuation runs and whitespace each become one or more BPE pieces
+_PIECES = re.compile(
+    r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+""", re.UNICODE
+)
+
+_encoding = None
+
+
+def _tiktoken_encoding():
+    """cl100k_base encoder when tiktoken and its cached vocab are available"""
+
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Not installed, or no network to fetch the vocabulary
+            _encoding = False
+    return _encoding or None
+
+
+def _estimate_piece(piece):
+    if piece.isascii():
+        # English words average roughly four characters per token
+        return max(1, math.ceil(len(piece.strip() or piece) / 4))
+    # Arabic script and emoji cost about one token per 2-3 UTF-8 bytes
+    return max(1, math.ceil(len(piece.strip().encode("utf-8")) / 2.5))
+
+
+def count_tokens(text):
+    """Offline token count: exact with tiktoken, otherwise a close estimate"""
+
+    if not text:
+        return 0
+
+    encoding = _tiktoken_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return sum(_estimate_piece(piece) for piece in _PIECES.findall(text))
+
+
+def count_message_tokens(messages):
+    """Token count for a chat message list, including per-message framing"""
+
+    # Each message carries ~4 tokens of role/separator overhead, plus 3 priming
+    return 3 + sum(4 + count_tokens(message["content"]) for message in messages)
@@ -0,0 +1,96 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+# A line holding only dashes separates pasted variants
+_SEPARATOR = re.compile(r"^\s*-{3,}\s*$", re.MULTILINE)
+
+
+def split_variants(text):
+    """Variants from a text box: blocks between --- lines, or else one per line"""
+
+    if _SEPARATOR.search(text):
+        blocks = _SEPARATOR.split(text)
+    else:
+        blocks = text.splitlines()
+    variants = []
+    for block in blocks:
+        block = block.strip()
+        if block and block not in variants:
+            variants.append(block)
+    return variants
+
+
+@dataclass
+class Entry:
+    """One variant's standing in the tournament"""
+
+    index: int
+    variant: str
+    scores: Dict[str, float] = field(default_factory=dict)
+    failed: int = 0
+    # Round the variant was pruned in; None for finalists
+    eliminated_in: Optional[int] = None
+
+    @property
+    def mean_score(self):
+        if not self.scores:
+            return 0.0
+        return sum(self.scores.values()) / len(self.scores)
+
+
+def round_budgets(variant_count, segment_count, finalists):
+    """Cumulative segments each survivor is scored on, per round
+
+    Halving from variant_count down to finalists takes ceil(log2(ratio))
+    rounds; the per-variant budget doubles each round so the last round
+    covers every segment.
+    """
+
+    if variant_count <= finalists:
+        return []
+    rounds = math.ceil(math.log2(variant_count / finalists))
+    # Rounded up, or doubling could stop short of the last segments
+    first = max(1, math.ceil(segment_count / 2 ** (rounds - 1)))
+    return [min(segment_count, first * 2**r) for r in range(rounds)]
+
+
+def successive_halving(variants, segments, score_pairs, finalists=2):
+    """Prune the bottom half of variants each round on compact scores
+
+    score_pairs(pairs) is given [(variant_index, segment), ...] and yields
+    ((variant_index, segment), score) with score None for a failed call.
+    Every survivor is scored on the same segments, so rounds compare like
+    with like. Yields (round, survivors, entries) after each round; the
+    last survivors are the finalists.
+    """
+
+    entries = [Entry(index, variant) for index, variant in enumerate(variants)]
+    alive = list(entries)
+    seen = 0
+    budgets = round_budgets(len(variants), len(segments), finalists)
+    for round_number, budget in enumerate(budgets, start=1):
+        pairs = [
+            (entry.index, segment)
+            for entry in alive
+            for segment in segments[seen:budget]
+        ]
+        for (index, segment), score in score_pairs(pairs):
+            if score is None:
+                entries[index].failed += 1
+            else:
+                entries[index].scores[segment] = score
+        seen = max(seen, budget)
+
+        # Ties keep the earlier variant, so reruns prune identically
+        ranked = sorted(alive, key=lambda entry: (-entry.mean_score, entry.index))
+        keep = max(finalists, math.ceil(len(alive) / 2))
+        for entry in ranked[keep:]:
+            entry.eliminated_in = round_number
+        alive = ranked[:keep]
+        yield round_number, alive, entries
+
+    if not budgets:
+        # Too few variants to prune: all of them go straight to the final
+        yield 0, alive, entries
@@ -0,0 +1,103 @@
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+# Builds use a private cache, so the snapshot holds exactly the sample results
+os.environ["LLM_CACHE_PATH"] = os.path.join(
+    tempfile.mkdtemp(), "warm_start_cache.sqlite3"
+)
+
+import streamlit_app as app  # noqa: E402
+from build_info import git_revision  # noqa: E402
+from response_cache import DEFAULT_SNAPSHOT_PATH, write_snapshot  # noqa: E402
+
+
+def snapshot_tasks(api_key, options, segments):
+    """Every sample-post analysis a first-time user can request in one click
+
+    Reaction and Arabic results are per segment; enhancement runs once per
+    single segment plus once for the preselected DEFAULT_SEGMENTS pair.
+    """
+
+    tasks = {}
+    for index, post in enumerate(app.SAMPLE_POSTS):
+        for analysis_type in app.ANALYSIS_TYPES:
+            if analysis_type == "Content Enhancement":
+                groups = [[segment] for segment in segments]
+                if app.DEFAULT_SEGMENTS not in groups:
+                    groups.append(app.DEFAULT_SEGMENTS)
+                for group in groups:
+                    tasks[(index, analysis_type, ", ".join(group))] = (
+                        app.analysis_tasks(
+                            analysis_type, group, post, api_key, options
+                        )["enhancement"]
+                    )
+            else:
+                for segment, task in app.analysis_tasks(
+                    analysis_type, segments, post, api_key, options
+                ).items():
+                    tasks[(index, analysis_type, segment)] = task
+    return tasks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Precompute sample-post results into a warm-start snapshot"
+    )
+    parser.add_argument("--output", default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"))
+    parser.add_argument("--base-url", default=app.OPENAI_BASE_URL)
+    parser.add_argument(
+        "--segments",
+        nargs="+",
+        default=list(app.AUDIENCE_SEGMENTS),
+        help="Segment names to precompute (default: the built-in six)",
+    )
+    parser.add_argument("--max-workers", type=int, default=app.MAX_CONCURRENT_REQUESTS)
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Recompute everything instead of reusing still-valid entries",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or OPENAI_API_KEY)")
+
+    # Entries whose prompts are unchanged are served from the old snapshot
+    cache = app.get_response_cache()
+    cache.snapshot_path = None if args.fresh else args.output
+
+    options = app.LLMOptions(base_url=args.base_url)
+    tasks = snapshot_tasks(args.api_key, options, args.segments)
+    failed = []
+    for done, (key, result) in enumerate(
+        app.run_concurrently(tasks, args.max_workers), start=1
+    ):
+        if result.startswith("Error:"):
+            failed.append(key)
+        print(f"[{done}/{len(tasks)}] {key[1]} / {key[2]}", file=sys.stderr)
+
+    rows = cache.rows()
+    write_snapshot(
+        args.output,
+        rows,
+        {
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "routes": app.get_model_router().routes,
+            "entries": len(rows),
+        },
+    )
+    print(f"Wrote {len(rows)} responses to {args.output}", file=sys.stderr)
+
+    if failed:
+        print(f"{len(failed)} analyses failed and were left out", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())